@@ -1,8 +1,30 @@
 # Copyright (c) 2020 safexl
 
-from safexl.toolkit import *
+import sys
+from safexl.property_cache import *
+from safexl.formatting import *
+from safexl.mirror import *
+from safexl.xlsx import *
+from safexl.index import *
 import safexl.xl_constants as xl_constants
 import safexl.colors as colors
+import safexl.address as address
+import safexl.metrics as metrics
+
+# Everything that drives Excel needs pywin32, which only exists on Windows. Elsewhere (ex: Linux) only the parts of
+# safexl that don't, like `read_xlsx`, are available, but on Windows a missing pywin32 is an error worth seeing
+if sys.platform == "win32":
+    from safexl.toolkit import *
+    from safexl.transfer import *
+    from safexl.tables import *
+    from safexl.retry import *
+    from safexl.aio import *
+    from safexl.dispid_cache import *
+    from safexl.workbook_cache import *
+    from safexl.health import *
+    from safexl.calculation import *
+    from safexl.watcher import *
+    import safexl.aio as aio
 
 
 __author__ = "Eric Smith"
@@ -0,0 +1,230 @@
+# Copyright (c) 2020 safexl
+import itertools
+from safexl.errors import ExcelError
+
+# Conversions between (row, column) numbers and A1 style addresses, for building the address strings
+# bulk range operations hand to `Worksheet.Range()`. Can be accessed like - `safexl.address.a1(2, 3)`
+
+MAX_ROW = 1048576
+MAX_COLUMN = 16384
+# Longest address string `Worksheet.Range()` accepts
+MAX_ADDRESS_LENGTH = 255
+
+
+def _build_column_letters() -> tuple:
+    alphabet = [chr(65 + i) for i in range(26)]
+    letters = [""]
+    # A..Z, then AA..ZZ, then AAA onward, which is already column order
+    for length in (1, 2, 3):
+        letters.extend("".join(combination) for combination in itertools.product(alphabet, repeat=length))
+    return tuple(letters[:MAX_COLUMN + 1])
+
+
+# column number -> letters, with nothing at index 0 so that COLUMN_LETTERS[1] == 'A'
+COLUMN_LETTERS = _build_column_letters()
+# letters -> column number
+COLUMN_NUMBERS = {letters: column for column, letters in enumerate(COLUMN_LETTERS) if letters}
+
+
+def column_letter(column: int) -> str:
+    """
+    :param column: int - Column number, 1 through 16,384
+    :return: str - Column letters, ex: 28 -> 'AB'
+    """
+    if not 1 <= column <= MAX_COLUMN:
+        raise ValueError(f"Column {column} is outside of 1 to {MAX_COLUMN}")
+    return COLUMN_LETTERS[column]
+
+
+def column_number(letters: str) -> int:
+    """
+    :param letters: str - Column letters, case insensitive, ex: 'AB'
+    :return: int - Column number, ex: 'AB' -> 28
+    """
+    try:
+        return COLUMN_NUMBERS[letters.upper()]
+    except KeyError:
+        raise ValueError(f"{letters!r} is not a column between A and XFD") from None
+
+
+def a1(row: int, column: int, absolute: bool = False) -> str:
+    """
+    :param row: int - Row number, 1 through 1,048,576
+    :param column: int - Column number, 1 through 16,384
+    :param absolute: Optional bool - Defaults to `False`. `True` gives '$B$2' rather than 'B2'
+    :return: str - A1 style address of the cell
+    """
+    if not 1 <= row <= MAX_ROW:
+        raise ValueError(f"Row {row} is outside of 1 to {MAX_ROW}")
+    if absolute:
+        return f"${column_letter(column)}${row}"
+    return f"{column_letter(column)}{row}"
+
+
+def to_a1(rows: iter, columns: iter) -> list:
+    """
+    Converts many cells at once, ex: `to_a1([1, 2], [1, 3]) -> ['A1', 'C2']`. Skips the per cell range checks of `a1`,
+    so out of range numbers come back as wrong addresses (or an IndexError) rather than as a ValueError.
+    :param rows: iterable - Row numbers, including numpy arrays
+    :param columns: iterable - Column numbers, the same length as `rows`
+    :return: list - A1 style addresses
+    """
+    # plain Python ints iterate much faster than numpy scalars
+    rows = rows.tolist() if hasattr(rows, "tolist") else rows
+    columns = columns.tolist() if hasattr(columns, "tolist") else columns
+    letters = COLUMN_LETTERS
+    return [f"{letters[column]}{row}" for row, column in zip(rows, columns)]
+
+
+def area(first_row: int, first_column: int, last_row: int, last_column: int) -> str:
+    """
+    :return: str - A1 style address of the rectangle, ex: (2, 2, 5, 3) -> 'B2:C5', or of the single cell if it is one
+    """
+    if first_row == last_row and first_column == last_column:
+        return a1(first_row, first_column)
+    return f"{a1(first_row, first_column)}:{a1(last_row, last_column)}"
+
+
+def _parse_cell(cell: str) -> tuple:
+    stripped = cell.replace("$", "").upper()
+    split = len(stripped) - len(stripped.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    letters, digits = stripped[:split], stripped[split:]
+    if not letters or not digits.isdigit() or not 1 <= int(digits) <= MAX_ROW:
+        raise ValueError(f"{cell!r} is not an A1 style cell address")
+    return int(digits), column_number(letters)
+
+
+def _parse_line(first: str, last: str):
+    """
+    :return: tuple or None - Bounds of whole columns like 'A:C' or whole rows like '1:3', `None` for anything else
+    """
+    first, last = first.replace("$", "").upper(), last.replace("$", "").upper()
+    if first.isalpha() and last.isalpha():
+        first_column, last_column = column_number(first), column_number(last)
+        return 1, min(first_column, last_column), MAX_ROW, max(first_column, last_column)
+    if first.isdigit() and last.isdigit():
+        first_row, last_row = sorted((int(first), int(last)))
+        if 1 <= first_row and last_row <= MAX_ROW:
+            return first_row, 1, last_row, MAX_COLUMN
+    return None
+
+
+def parse(address: str) -> tuple:
+    """
+    :param address: str - A1 style address of a cell or a rectangle, ex: 'B2' or '$B$2:C5', or of whole columns or rows
+                          ex: '$A:$C' or '1:3', as `Range.Address` gives them
+    :return: tuple - (first_row, first_column, last_row, last_column)
+    """
+    first, colon, last = address.partition(":")
+    if colon:
+        line = _parse_line(first, last)
+        if line is not None:
+            return line
+    first_row, first_column = _parse_cell(first)
+    last_row, last_column = _parse_cell(last) if colon else (first_row, first_column)
+    return (min(first_row, last_row), min(first_column, last_column),
+            max(first_row, last_row), max(first_column, last_column))
+
+
+def coalesce(cells: iter) -> list:
+    """
+    Gathers scattered cells into rectangles, so they can be addressed as a few areas rather than one by one.
+    Cells are first joined into runs along each row, then runs spanning the same columns in consecutive rows are stacked.
+    :param cells: iterable - (row, column) tuples, in any order, duplicates allowed
+    :return: list - (first_row, first_column, last_row, last_column) tuples, covering exactly the given cells
+    """
+    runs_by_row = {}
+    for row, column in sorted(set(cells)):
+        runs = runs_by_row.setdefault(row, [])
+        if runs and runs[-1][1] == column - 1:
+            runs[-1][1] = column
+        else:
+            runs.append([column, column])
+
+    areas = []
+    # (first_column, last_column) -> index in `areas` of the rectangle that ended on the previous row
+    open_areas = {}
+    previous_row = None
+    for row in sorted(runs_by_row):
+        still_open = {}
+        for first_column, last_column in runs_by_row[row]:
+            index = open_areas.get((first_column, last_column)) if previous_row == row - 1 else None
+            if index is None:
+                index = len(areas)
+                areas.append([row, first_column, row, last_column])
+            else:
+                areas[index][2] = row
+            still_open[(first_column, last_column)] = index
+        open_areas = still_open
+        previous_row = row
+    return [tuple(rectangle) for rectangle in areas]
+
+
+def merge_areas(areas: iter) -> list:
+    """
+    Tidies up overlapping rectangles, ex: the ranges touched by a burst of edits. Rectangles inside another one are
+    dropped, and rectangles spanning the same rows (or columns) that overlap or touch are joined, repeatedly, so that
+    ex: (1, 1, 1, 3) and (1, 4, 1, 4) become (1, 1, 1, 4). The result covers exactly the same cells, though rectangles
+    that only partly overlap are both kept.
+    :param areas: iterable - (first_row, first_column, last_row, last_column) tuples
+    :return: list - (first_row, first_column, last_row, last_column) tuples, in row then column order
+    """
+    merged = sorted(set(areas))
+    changed = True
+    while changed:
+        changed = False
+        kept = []
+        for rectangle in merged:
+            first_row, first_column, last_row, last_column = rectangle
+            for i, (other_first_row, other_first_column, other_last_row, other_last_column) in enumerate(kept):
+                same_rows = (first_row, last_row) == (other_first_row, other_last_row)
+                same_columns = (first_column, last_column) == (other_first_column, other_last_column)
+                columns_meet = first_column <= other_last_column + 1 and other_first_column <= last_column + 1
+                rows_meet = first_row <= other_last_row + 1 and other_first_row <= last_row + 1
+                contained = (other_first_row <= first_row and last_row <= other_last_row
+                             and other_first_column <= first_column and last_column <= other_last_column)
+                contains = (first_row <= other_first_row and other_last_row <= last_row
+                            and first_column <= other_first_column and other_last_column <= last_column)
+                if contained or contains or (same_rows and columns_meet) or (same_columns and rows_meet):
+                    kept[i] = (min(first_row, other_first_row), min(first_column, other_first_column),
+                               max(last_row, other_last_row), max(last_column, other_last_column))
+                    changed = True
+                    break
+            else:
+                kept.append(rectangle)
+        merged = sorted(set(kept))
+    return merged
+
+
+def split_addresses(addresses: iter, limit: int = MAX_ADDRESS_LENGTH) -> list:
+    """
+    Joins addresses with commas into as few multi-area address strings as fit under `limit` characters each,
+    ex: ['A1', 'C3:D4'] -> ['A1,C3:D4']. Each string can be passed to `Worksheet.Range()` as is.
+    :param addresses: iterable - A1 style addresses
+    :param limit: Optional int - Defaults to 255, the most `Worksheet.Range()` accepts
+    :return: list - Multi-area address strings
+    """
+    chunks = []
+    current = ""
+    for address in addresses:
+        if current and len(current) + 1 + len(address) > limit:
+            chunks.append(current)
+            current = ""
+        current = f"{current},{address}" if current else address
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def worksheet_name_sanitization(worksheet_name: str) -> str:
+    """
+    Tool to cleanse worksheet names of common problems
+    :param worksheet_name: str - String of name you're about to assign to a worksheet
+    :return: str - String that won't cause an error when assigned to a worksheet. Note this function will throw an error
+                   itself if the result of removing the invalid worksheet name characters leaves you with an empty string only
+    """
+    for char in ("\\", "/", "*", "[", "]", ":", "?"):
+        worksheet_name = worksheet_name.replace(char, "")
+    if not worksheet_name:
+        raise ExcelError("Worksheet name cannot be empty string")
+    return worksheet_name[:31]
@@ -0,0 +1,322 @@
+# Copyright (c) 2020 safexl
+import asyncio
+import contextlib
+import itertools
+import queue
+import threading
+from safexl.toolkit import application, ExcelError
+
+__all__ = [
+    'async_application',
+    'AsyncDispatch',
+]
+
+_STOP = object()
+
+
+class _STAWorker(threading.Thread):
+    """
+    Dedicated thread that owns the single-threaded apartment, the `safexl.application()` block and every
+    COM object created inside it. COM objects never leave this thread; the event loop only ever sees
+    integer handles to them, wrapped in `AsyncDispatch` proxies.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, app_kwargs: dict):
+        super().__init__(name="safexl-sta", daemon=True)
+        self.loop = loop
+        self.app_kwargs = app_kwargs
+        self.jobs = queue.Queue()
+        self.ready = threading.Event()
+        self.exit_error = None
+        self.body_error = None
+        self.alive = False
+        self.pending = set()
+        self._objects = {}
+        self._refs = {}
+        self._lock = threading.Lock()
+        self._handles = itertools.count(1)
+
+    def run(self):
+        try:
+            with application(**self.app_kwargs) as app:
+                self._objects[0] = app
+                self.alive = True
+                self.ready.set()
+                try:
+                    while True:
+                        job = self.jobs.get()
+                        if job is _STOP:
+                            break
+                        job()
+                finally:
+                    self.alive = False
+                    # release every COM object on the thread that created it, before the application cleanup runs
+                    self._objects.clear()
+                if self.body_error is not None:
+                    raise self.body_error
+        except Exception as e:
+            self.exit_error = e
+        finally:
+            self.ready.set()
+
+    def keep(self, value):
+        """ Runs on the STA thread, swaps COM objects for handles before they are handed to the event loop """
+        if hasattr(value, "_oleobj_"):
+            handle = _Handle(next(self._handles))
+            self._objects[handle] = value
+            return handle
+        return value
+
+    def lookup(self, handle: int):
+        return self._objects[handle]
+
+    def retain(self, handle: int) -> None:
+        with self._lock:
+            self._refs[handle] = self._refs.get(handle, 0) + 1
+
+    def release(self, handle: int) -> None:
+        with self._lock:
+            self._refs[handle] -= 1
+            unreferenced = self._refs[handle] == 0
+        if unreferenced and self.alive:
+            # the COM object itself is dropped on the STA thread, never on the thread that garbage collected the proxy
+            self.jobs.put(lambda: self._forget(handle))
+
+    def _forget(self, handle: int) -> None:
+        with self._lock:
+            if self._refs.get(handle) == 0:
+                del self._refs[handle]
+                self._objects.pop(handle, None)
+
+    def submit(self, func) -> asyncio.Future:
+        """
+        Queues `func` to run on the STA thread and returns a future for its result. Jobs run in the order they
+        were submitted, so many calls can be queued back to back without waiting on each other.
+        """
+        if not self.alive:
+            raise ExcelError("The async_application block has already ended")
+        future = self.loop.create_future()
+
+        def job():
+            try:
+                result = ("result", self.keep(func()))
+            except Exception as e:
+                result = ("error", e)
+            self.loop.call_soon_threadsafe(_settle, future, result, self)
+
+        self.jobs.put(job)
+        return future
+
+    def track(self, future: asyncio.Future) -> None:
+        # failed assignments and calls stay in `pending` so that `drain()` can raise their errors
+        self.pending.add(future)
+        future.add_done_callback(lambda f: f.cancelled() or f.exception() or self.pending.discard(f))
+
+    def stop(self, body_error: Exception = None) -> None:
+        self.body_error = body_error
+        self.jobs.put(_STOP)
+
+
+class _Handle(int):
+    pass
+
+
+class _Slot:
+    """
+    Result of a queued method call, shared by the `AsyncDispatch` returned from the call and anything chained off of it.
+    Holds a reference on the resulting COM object until the last of those is garbage collected.
+    """
+    _empty = object()
+
+    def __init__(self, worker: _STAWorker):
+        self.worker = worker
+        self.result = self._empty
+
+    def __del__(self):
+        if isinstance(self.result, _Handle):
+            self.worker.release(self.result)
+
+
+def _settle(future: asyncio.Future, result: tuple, worker: _STAWorker) -> None:
+    if future.cancelled():
+        return
+    kind, value = result
+    if kind == "error":
+        future.set_exception(value)
+    elif isinstance(value, _Handle):
+        future.set_result(AsyncDispatch(worker, value))
+    else:
+        future.set_result(value)
+
+
+def _resolve_arg(arg):
+    if isinstance(arg, AsyncDispatch):
+        return object.__getattribute__(arg, "_resolve")()
+    return arg
+
+
+class AsyncDispatch:
+    """
+    Awaitable stand-in for a COM object living on the STA thread of an `async_application` block.
+        * Attribute access is lazy: `app.ActiveWorkbook.Name` builds a path without touching Excel
+        * Awaiting resolves the path on the STA thread: `name = await app.ActiveWorkbook.Name`
+        * Calling a method queues it immediately and returns another `AsyncDispatch` that can be awaited or
+          chained off of, ex: `ws = app.Workbooks.Add().ActiveSheet`
+        * Setting an attribute queues the assignment immediately, without waiting for it to complete
+        * Errors from calls and assignments that are never awaited are raised by `safexl.aio.drain(app)`, or when the
+          block ends
+    Because everything is queued in order on one thread, independent calls can be issued back to back and
+    awaited together with `asyncio.gather`, rather than paying a round trip to the event loop for each one.
+    """
+    def __init__(self, worker: _STAWorker, handle: int = None, resolve=None, future: asyncio.Future = None):
+        object.__setattr__(self, "_worker", worker)
+        object.__setattr__(self, "_handle", handle)
+        object.__setattr__(self, "_future", future)
+        if handle:
+            worker.retain(handle)
+        if resolve is None:
+            def resolve():
+                return worker.lookup(handle)
+        object.__setattr__(self, "_resolve", resolve)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            # keeps introspection (asyncio, copy, pickle, IDEs) from queueing COM calls by accident
+            raise AttributeError(name)
+        parent_resolve = object.__getattribute__(self, "_resolve")
+        return AsyncDispatch(
+            object.__getattribute__(self, "_worker"),
+            resolve=lambda: getattr(parent_resolve(), name),
+        )
+
+    def __setattr__(self, name, value):
+        worker = object.__getattribute__(self, "_worker")
+        parent_resolve = object.__getattribute__(self, "_resolve")
+        future = worker.submit(lambda: setattr(parent_resolve(), name, _resolve_arg(value)))
+        # errors surface the next time the block awaits `drain()`, or when the block ends
+        worker.track(future)
+
+    def __call__(self, *args, **kwargs):
+        worker = object.__getattribute__(self, "_worker")
+        parent_resolve = object.__getattribute__(self, "_resolve")
+        slot = _Slot(worker)
+
+        def call():
+            result = worker.keep(parent_resolve()(
+                *[_resolve_arg(arg) for arg in args],
+                **{key: _resolve_arg(arg) for key, arg in kwargs.items()}
+            ))
+            if isinstance(result, _Handle):
+                # held for as long as the slot lives, so calls chained off of this one keep working
+                worker.retain(result)
+            slot.result = result
+            return result
+
+        def resolve():
+            # jobs run in order on the STA thread, so by the time anything chained off of this call resolves,
+            # the call itself has already run
+            result = slot.result
+            if result is _Slot._empty:
+                raise ExcelError("The call this object depends on failed")
+            return worker.lookup(result) if isinstance(result, _Handle) else result
+
+        future = worker.submit(call)
+        # a call nobody awaits, ex: `app.Workbooks.Open(path)`, still has its error raised by `drain()` or the block's end
+        worker.track(future)
+        return AsyncDispatch(worker, resolve=resolve, future=future)
+
+    def __await__(self):
+        worker = object.__getattribute__(self, "_worker")
+        future = object.__getattribute__(self, "_future")
+        if future is None:
+            future = worker.submit(object.__getattribute__(self, "_resolve"))
+        else:
+            # whoever awaits the call gets its error, so it isn't raised a second time by `drain()`
+            worker.pending.discard(future)
+        return future.__await__()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        worker = object.__getattribute__(self, "_worker")
+        resolve = object.__getattribute__(self, "_resolve")
+        handles = await worker.submit(lambda: [worker.keep(item) for item in resolve()])
+        items = [AsyncDispatch(worker, handle) if isinstance(handle, _Handle) else handle for handle in handles]
+        for item in items:
+            yield item
+
+    def __del__(self):
+        handle = object.__getattribute__(self, "_handle")
+        if handle:
+            object.__getattribute__(self, "_worker").release(handle)
+
+    def __repr__(self):
+        return f"<AsyncDispatch handle={object.__getattribute__(self, '_handle')}>"
+
+
+async def drain(app: AsyncDispatch) -> None:
+    """
+    Waits for every attribute assignment and method call queued so far in the block to complete, raising the first error
+    among those that were not awaited
+    :param app: AsyncDispatch - Yielded by `async_application`
+    :return: None
+    """
+    worker = object.__getattribute__(app, "_worker")
+    # a no-op job queued after the pending ones, so that the queue is flushed even if nothing was tracked
+    await worker.submit(lambda: None)
+    pending = list(worker.pending)
+    worker.pending.clear()
+    if pending:
+        await asyncio.gather(*pending)
+
+
+@contextlib.asynccontextmanager
+async def async_application(
+        kill_after: bool,
+        maximize: bool = True,
+        include_addins: bool = False,
+        retry_deadline: float = None,
+) -> AsyncDispatch:
+    """
+    Asyncio counterpart to `safexl.application`, with the same parameters and the same cleanup behavior.
+    A dedicated thread initializes its own COM apartment and runs the `safexl.application()` block, and every
+    attribute access and method call made through the yielded `AsyncDispatch` is queued to run on that thread,
+    so Excel never blocks your event loop:
+        async with safexl.async_application(kill_after=False) as app:
+            ws = app.Workbooks.Add().ActiveSheet
+            await asyncio.gather(*[ws.Range(f"A{i}").Formula for i in range(1, 101)])
+            ws.Range("B1").Value = "Hello, World!"
+    :param kill_after: bool - See `safexl.application`
+    :param maximize: Optional bool - See `safexl.application`
+    :param include_addins: Optional bool - See `safexl.application`
+    :param retry_deadline: Optional float - See `safexl.application`
+    :return: AsyncDispatch - Awaitable proxy for the Excel application object
+    """
+    loop = asyncio.get_running_loop()
+    worker = _STAWorker(loop, dict(
+        kill_after=kill_after,
+        maximize=maximize,
+        include_addins=include_addins,
+        retry_deadline=retry_deadline,
+    ))
+    worker.start()
+    await loop.run_in_executor(None, worker.ready.wait)
+    if worker.exit_error is not None:
+        raise worker.exit_error
+
+    app = AsyncDispatch(worker, 0)
+    try:
+        yield app
+        await drain(app)
+    except BaseException as e:
+        # `application()` only cleans up after `Exception`s, so cancellations are passed along as an ExcelError
+        worker.stop(e if isinstance(e, Exception) else ExcelError(f"{type(e).__name__} inside async_application block"))
+        await loop.run_in_executor(None, worker.join)
+        if worker.exit_error is not None and isinstance(e, Exception):
+            raise worker.exit_error from e
+        raise
+    else:
+        worker.stop()
+        await loop.run_in_executor(None, worker.join)
+        if worker.exit_error is not None:
+            raise worker.exit_error
@@ -0,0 +1,147 @@
+# Copyright (c) 2020 safexl
+import time
+import pythoncom
+import safexl.metrics as metrics
+import safexl.xl_constants as xl_constants
+from safexl.events import AppEvents, DISPID_AFTER_CALCULATE
+
+__all__ = [
+    'CalculationReport',
+    'calculate',
+    'wait_for_calculation',
+]
+
+# Seconds between `CalculationState` checks while waiting, doubling from the first up to the second
+POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 0.5
+
+CALCULATION_DURATION = metrics.Histogram(
+    "safexl_calculation_seconds", "Seconds taken by `safexl.calculate`, until Excel reported the calculation complete.",
+    labelnames=("scope",), registry=metrics.REGISTRY)
+
+
+class CalculationReport:
+    """
+    How long a calculation took, as returned by `calculate` and `wait_for_calculation`
+    """
+    def __init__(self, scope: str, seconds: float, calculate_seconds: float, completed_by: str, polls: int):
+        """
+        :param scope: str - 'application' when everything was calculated, 'targets' when only some sheets or ranges were
+        :param seconds: float - From the first `Calculate()` call until Excel reported the calculation complete
+        :param calculate_seconds: float - Of which spent inside the `Calculate()` calls themselves
+        :param completed_by: str - How completion was noticed: 'event' (`AfterCalculate`), 'polling' (`CalculationState`)
+        :param polls: int - `CalculationState` round trips made while waiting
+        """
+        self.scope = scope
+        self.seconds = seconds
+        self.calculate_seconds = calculate_seconds
+        self.completed_by = completed_by
+        self.polls = polls
+
+    def __repr__(self) -> str:
+        return (f"CalculationReport(scope={self.scope!r}, seconds={self.seconds:.3f}, "
+                f"calculate_seconds={self.calculate_seconds:.3f}, completed_by={self.completed_by!r}, polls={self.polls})")
+
+
+class _CalculationEvents(AppEvents):
+    """
+    Sink for the Application's `AfterCalculate` event, which Excel raises once every pending calculation, including
+    asynchronous functions and data tables, has finished
+    """
+    _dispid_to_func_ = {DISPID_AFTER_CALCULATE: "OnAfterCalculate"}
+
+    def __init__(self, app):
+        self.calculated = False
+        super().__init__(app)
+
+    def OnAfterCalculate(self):
+        self.calculated = True
+
+
+def _subscribe(app):
+    try:
+        return _CalculationEvents(app)
+    except Exception:
+        # ex: Excel refused the connection, or the object is not a live Application, so waiting falls back to
+        # polling `CalculationState` alone
+        return None
+
+
+def _unsubscribe(events) -> None:
+    if events is not None:
+        events.close()
+
+
+def _wait(app, events, timeout: float, start: float) -> tuple:
+    interval = POLL_INTERVAL
+    polls = 0
+    next_poll = time.perf_counter()
+    while True:
+        if events is not None:
+            # delivers the `AfterCalculate` event to this thread, without a round trip to Excel
+            pythoncom.PumpWaitingMessages()
+            if events.calculated:
+                return "event", polls
+        now = time.perf_counter()
+        if now >= next_poll:
+            polls += 1
+            if app.CalculationState == xl_constants.xlDone:
+                return "polling", polls
+            next_poll = now + interval
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+        if timeout is not None and now - start > timeout:
+            raise TimeoutError(f"Excel was still calculating after {timeout} seconds")
+        time.sleep(min(POLL_INTERVAL, max(0.0, next_poll - now)))
+
+
+def wait_for_calculation(app: 'win32com.client.Dispatch("Excel.Application")', timeout: float = 300.0) -> CalculationReport:
+    """
+    Waits for a calculation already underway (ex: one started by editing cells with automatic calculation on) to finish.
+    Listens for the `AfterCalculate` event where Excel offers it, and checks `CalculationState` at a growing
+    interval, from 10ms up to half a second, so that short calculations are noticed quickly and long ones are not
+    hammered with round trips.
+    :param app: Excel Application COM object
+    :param timeout: Optional float - Defaults to 300. Seconds to wait before raising a `TimeoutError`, `None` waits forever
+    :return: CalculationReport
+    """
+    events = _subscribe(app)
+    try:
+        start = time.perf_counter()
+        completed_by, polls = _wait(app, events, timeout, start)
+    finally:
+        _unsubscribe(events)
+    return CalculationReport("application", time.perf_counter() - start, 0.0, completed_by, polls)
+
+
+def calculate(*targets, timeout: float = 300.0) -> CalculationReport:
+    """
+    Recalculates only what is asked for and waits until Excel has finished, for workbooks kept in manual calculation:
+        app.Calculation = safexl.xl_constants.xlCalculationManual
+        ...
+        report = safexl.calculate(ws.Range("D2:D5000"), wb.Worksheets("Summary"))
+        print(report.seconds)
+    Ranges are calculated with `Range.Calculate` and worksheets with `Worksheet.Calculate`, both far cheaper than
+    `Application.Calculate` on a large workbook. Passing the Application object itself calculates every open workbook.
+    Completion is then waited for the same way as `wait_for_calculation` does, as asynchronous functions and data tables
+    can still be calculating after `Calculate()` returns.
+    Every call is timed into the `safexl_calculation_seconds` metric.
+    :param targets: Range, Worksheet or Application COM objects - What to calculate, at least one
+    :param timeout: Optional float - Defaults to 300. Seconds to wait before raising a `TimeoutError`, `None` waits forever
+    :return: CalculationReport
+    """
+    if not targets:
+        raise ValueError("Nothing to calculate, pass the ranges or worksheets to recalculate")
+    app = targets[0].Application
+    scope = "application" if any(target == app for target in targets) else "targets"
+    events = _subscribe(app)
+    try:
+        start = time.perf_counter()
+        for target in targets:
+            target.Calculate()
+        calculate_seconds = time.perf_counter() - start
+        completed_by, polls = _wait(app, events, timeout, start)
+    finally:
+        _unsubscribe(events)
+    seconds = time.perf_counter() - start
+    CALCULATION_DURATION.observe(seconds, scope=scope)
+    return CalculationReport(scope, seconds, calculate_seconds, completed_by, polls)
@@ -149,3 +149,20 @@ rgbWhite = 16777215
 rgbWhiteSmoke = 16119285
 rgbYellow = 65535
 rgbYellowGreen = 3329434
+
+
+def to_color(value) -> int:
+    """
+    Accepts everything Excel does for a color property, plus the names in this module (ex: 'rgbRed') and (r, g, b) tuples
+    :param value: int, str or tuple - ex: `safexl.colors.rgbRed`, 'rgbRed' or (255, 0, 0)
+    :return: int - The color as Excel stores it, 0xBBGGRR
+    """
+    if isinstance(value, str):
+        color = globals().get(value) if value.startswith("rgb") else None
+        if color is None:
+            raise ValueError(f"{value!r} is not a color in safexl.colors")
+        return color
+    if isinstance(value, tuple):
+        red, green, blue = value
+        return red + green * 256 + blue * 256 ** 2
+    return value
@@ -0,0 +1,278 @@
+# Copyright (c) 2020 safexl
+import json
+import os
+import tempfile
+import threading
+import pythoncom
+import pywintypes
+import win32com.client
+
+__all__ = [
+    'DispidCache',
+    'DISPID_CACHE',
+    'FastDispatch',
+    'fast_dispatch',
+]
+
+LCID = 0x0
+DISP_E_MEMBERNOTFOUND = -2147352573  # 0x80020003
+DISPID_VALUE = 0
+PARAMFLAG_FLCID = 0x4
+PARAMFLAG_FRETVAL = 0x8
+PARAMFLAG_FOPT = 0x10
+
+# Kinds of member, as stored in the cache
+PROPERTY = 0
+METHOD = 1
+
+
+def _is_dispatch(value) -> bool:
+    return hasattr(value, "GetTypeInfo") and hasattr(value, "Invoke")
+
+
+class DispidCache:
+    """
+    Cache of member name -> DISPID (plus how to call it) for each COM interface, keyed by the interface's IID.
+    The cache is shared by every object of that interface, and can be saved to disk so that later runs start warm.
+    Each cached member is stored as [dispid, kind, required_argument_count, returned_interface_iid, argument_names].
+    Only that plain data is kept, never COM objects, as those belong to one EXCEL.EXE process and one thread's apartment
+    while the cache outlives both.
+    """
+    def __init__(self, path: str = None):
+        """
+        :param path: Optional str - JSON file to load the cache from, if it exists, and to save it to by default
+        """
+        self.path = path
+        self.members = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            members = json.load(f)
+        with self._lock:
+            for iid, type_members in members.items():
+                self.members.setdefault(iid, {}).update(type_members)
+
+    def save(self, path: str = None) -> None:
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given to save the DISPID cache to")
+        with self._lock:
+            payload = json.dumps(self.members, indent=1, sort_keys=True)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def type_of(self, oleobj) -> str:
+        """
+        Asks the object itself which interface it implements, costs one round trip
+        :param oleobj: PyIDispatch
+        :return: str - IID of the interface, or None if the object has no type information
+        """
+        try:
+            return str(oleobj.GetTypeInfo().GetTypeAttr().iid)
+        except pywintypes.com_error:
+            return None
+
+    def lookup(self, iid: str, oleobj, name: str) -> list:
+        """
+        :param iid: str - IID of the interface `oleobj` implements
+        :param oleobj: PyIDispatch - Only used on a cache miss, to read the type information
+        :param name: str - Member name, case insensitive like VBA
+        :return: list - [dispid, kind, required_argument_count, returned_interface_iid, argument_names]
+        """
+        key = name.lower()
+        type_members = self.members.get(iid)
+        if type_members is not None:
+            member = type_members.get(key)
+            if member is not None:
+                self.hits += 1
+                return member
+        self.misses += 1
+        member = self._describe(iid, oleobj, name)
+        with self._lock:
+            self.members.setdefault(iid, {})[key] = member
+        return member
+
+    def forget(self, iid: str, name: str) -> None:
+        with self._lock:
+            self.members.get(iid, {}).pop(name.lower(), None)
+
+    def _describe(self, iid: str, oleobj, name: str) -> list:
+        # asked of the object in hand on every miss, a type info kept from an earlier object could belong to an Excel
+        # that has since exited, or to another thread
+        typeinfo = oleobj.GetTypeInfo()
+        typecomp = typeinfo.GetTypeComp()
+        for invkind in (pythoncom.INVOKE_PROPERTYGET, pythoncom.INVOKE_FUNC):
+            try:
+                desckind, desc = typecomp.Bind(name, invkind)
+            except pywintypes.com_error:
+                continue
+            if desckind == pythoncom.DESCKIND_FUNCDESC:
+                argument_flags = [arg[1] for arg in desc.args]
+                required = sum(1 for flags in argument_flags
+                               if not flags & (PARAMFLAG_FOPT | PARAMFLAG_FLCID | PARAMFLAG_FRETVAL))
+                kind = PROPERTY if desc.invkind == pythoncom.INVOKE_PROPERTYGET and not required else METHOD
+                argument_names = list(typeinfo.GetNames(desc.memid)[1:])
+                return [desc.memid, kind, required, self._returned_iid(typeinfo, desc.rettype[0]), argument_names]
+            if desckind == pythoncom.DESCKIND_VARDESC:
+                return [desc.memid, PROPERTY, 0, self._returned_iid(typeinfo, desc.elemdescVar[0]), []]
+        # Not described by the type information, ask the object itself like a bare `Dispatch` would
+        return [oleobj.GetIDsOfNames(name), PROPERTY, 0, None, []]
+
+    def _returned_iid(self, typeinfo, typedesc) -> str:
+        """
+        Resolves the declared return type of a member to an interface IID, so objects it returns can skip `GetTypeInfo`.
+        Members declared as returning a plain IDispatch or VARIANT (ex: `Workbook.ActiveSheet`) resolve to None.
+        """
+        while isinstance(typedesc, tuple) and typedesc[0] == pythoncom.VT_PTR:
+            typedesc = typedesc[1]
+        if not (isinstance(typedesc, tuple) and typedesc[0] == pythoncom.VT_USERDEFINED):
+            return None
+        try:
+            ref_typeinfo = typeinfo.GetRefTypeInfo(typedesc[1])
+            typeattr = ref_typeinfo.GetTypeAttr()
+        except pywintypes.com_error:
+            return None
+        if typeattr.typekind not in (pythoncom.TKIND_DISPATCH, pythoncom.TKIND_INTERFACE):
+            return None
+        return str(typeattr.iid)
+
+
+DISPID_CACHE = DispidCache()
+
+
+def _unwrap(value):
+    if isinstance(value, FastDispatch):
+        return object.__getattribute__(value, "_oleobj_")
+    if hasattr(value, "_oleobj_"):
+        return value._oleobj_
+    return value
+
+
+class FastDispatch:
+    """
+    Late-bound wrapper around a COM object, like `win32com.client.Dispatch`, that looks member names up in a
+    shared `DispidCache` instead of asking Excel with `GetIDsOfNames` (or `GetTypeInfo`) for every new object.
+    Objects returned from a `FastDispatch` are wrapped in turn, carrying the interface they were declared as, so
+    a loop like `for i in range(1, 10001): ws.Range(f"A{i}").Value` pays one round trip per call instead of two or three.
+    """
+    def __init__(self, oleobj, iid: str = None, cache: DispidCache = DISPID_CACHE):
+        object.__setattr__(self, "_oleobj_", oleobj)
+        object.__setattr__(self, "_iid", iid)
+        object.__setattr__(self, "_cache", cache)
+
+    def _member(self, name: str) -> list:
+        cache = object.__getattribute__(self, "_cache")
+        oleobj = object.__getattribute__(self, "_oleobj_")
+        iid = object.__getattribute__(self, "_iid")
+        if iid is None:
+            iid = cache.type_of(oleobj)
+            if iid is None:
+                return None
+            object.__setattr__(self, "_iid", iid)
+        return cache.lookup(iid, oleobj, name)
+
+    def _wrap(self, value, iid: str = None):
+        if _is_dispatch(value):
+            return FastDispatch(value, iid, object.__getattribute__(self, "_cache"))
+        return value
+
+    def _invoke(self, name: str, member: list, invkind: int, args: tuple, kwargs: dict):
+        dispid, kind, required, returned_iid, argument_names = member
+        args = [_unwrap(arg) for arg in args]
+        if kwargs:
+            # IDispatch::Invoke is positional here, so named arguments are slotted in by position
+            args.extend([pythoncom.Missing] * (len(argument_names) - len(args)))
+            lowered = [arg_name.lower() for arg_name in argument_names]
+            for key, value in kwargs.items():
+                if key.lower() not in lowered:
+                    raise TypeError(f"{name}() got an unexpected keyword argument '{key}'")
+                args[lowered.index(key.lower())] = _unwrap(value)
+        oleobj = object.__getattribute__(self, "_oleobj_")
+        try:
+            result = oleobj.Invoke(dispid, LCID, invkind, 1, *args)
+        except pywintypes.com_error as e:
+            if e.hresult != DISP_E_MEMBERNOTFOUND:
+                raise
+            # cache loaded from disk for a different version of the interface, describe the member again
+            iid = object.__getattribute__(self, "_iid")
+            object.__getattribute__(self, "_cache").forget(iid, name)
+            dispid = self._member(name)[0]
+            result = oleobj.Invoke(dispid, LCID, invkind, 1, *args)
+        return self._wrap(result, returned_iid)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        member = self._member(name)
+        if member is None:
+            # no type information at all, fall back on pywin32's own late binding
+            return getattr(win32com.client.Dispatch(object.__getattribute__(self, "_oleobj_")), name)
+        if member[1] == PROPERTY:
+            return self._invoke(name, member, pythoncom.DISPATCH_PROPERTYGET, (), {})
+
+        def method(*args, **kwargs):
+            return self._invoke(name, member, pythoncom.DISPATCH_METHOD | pythoncom.DISPATCH_PROPERTYGET, args, kwargs)
+        method.__name__ = name
+        return method
+
+    def __setattr__(self, name, value):
+        member = self._member(name)
+        if member is None:
+            setattr(win32com.client.Dispatch(object.__getattribute__(self, "_oleobj_")), name, value)
+            return
+        oleobj = object.__getattribute__(self, "_oleobj_")
+        oleobj.Invoke(member[0], LCID, pythoncom.DISPATCH_PROPERTYPUT, 0, _unwrap(value))
+
+    def __call__(self, *args):
+        # default member, ex: `wb.Worksheets(1)` or `ws.Cells(1, 1)`
+        oleobj = object.__getattribute__(self, "_oleobj_")
+        result = oleobj.Invoke(DISPID_VALUE, LCID, pythoncom.DISPATCH_METHOD | pythoncom.DISPATCH_PROPERTYGET, 1,
+                               *[_unwrap(arg) for arg in args])
+        return self._wrap(result)
+
+    def __iter__(self):
+        oleobj = object.__getattribute__(self, "_oleobj_")
+        enum = oleobj.Invoke(pythoncom.DISPID_NEWENUM, LCID, pythoncom.DISPATCH_METHOD | pythoncom.DISPATCH_PROPERTYGET, 1)
+        for item in enum.QueryInterface(pythoncom.IID_IEnumVARIANT):
+            yield self._wrap(item)
+
+    def __len__(self):
+        return self.Count
+
+    def __bool__(self):
+        # like pywin32's own CDispatch, so that `if fast_app:` doesn't fall through to `__len__` and ask for `Count`
+        return True
+
+    def __eq__(self, other):
+        return object.__getattribute__(self, "_oleobj_") == _unwrap(other)
+
+    def __hash__(self):
+        return hash(object.__getattribute__(self, "_oleobj_"))
+
+    def __repr__(self):
+        return f"<FastDispatch iid={object.__getattribute__(self, '_iid')}>"
+
+
+def fast_dispatch(obj, cache: DispidCache = DISPID_CACHE) -> FastDispatch:
+    """
+    Wraps a COM object, such as the application yielded by `safexl.application`, in a `FastDispatch`.
+    This stays late bound like `win32com.client.Dispatch` (no makepy cache or `EnsureDispatch` involved, see the
+    `application` docstring for why that matters), it only remembers the DISPIDs it has already looked up.
+    :param obj: win32com.client.Dispatch object or bare PyIDispatch
+    :param cache: Optional DispidCache - Defaults to the one shared by the whole process. Pass `DispidCache(path)`
+                                         to load and later `.save()` a cache on disk, so the next run starts warm
+    :return: FastDispatch
+    """
+    return FastDispatch(_unwrap(obj), cache=cache)
@@ -0,0 +1,5 @@
+# Copyright (c) 2020 safexl
+
+
+class ExcelError(Exception):
+    pass
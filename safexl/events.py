@@ -0,0 +1,59 @@
+# Copyright (c) 2020 safexl
+import pythoncom
+import win32com.server.util
+from win32com.server.policy import EventHandlerPolicy
+
+__all__ = [
+    'AppEvents',
+]
+
+# Excel's `AppEvents` dispinterface and the DISPIDs of the events safexl listens to, as listed in Excel's type library.
+# Knowing them up front is what lets `AppEvents` connect without `win32com.client.WithEvents`, which first generates the
+# makepy wrapper for Excel, and from then on every `win32com.client.Dispatch("Excel.Application")` in the process hands
+# back early bound objects, which behave differently (see the Dispatch vs EnsureDispatch links in the README)
+IID_APP_EVENTS = pythoncom.MakeIID("{00024413-0000-0000-C000-000000000046}")
+DISPID_SHEET_CALCULATE = 0x61B
+DISPID_SHEET_CHANGE = 0x61C
+DISPID_AFTER_CALCULATE = 0xA34
+
+
+class AppEvents:
+    """
+    Listens to an Excel Application's events through its connection point, with late bound arguments like everything
+    else in safexl. Subclass it and map the DISPIDs above to handler names in `_dispid_to_func_`, ex:
+        class Calculated(AppEvents):
+            _dispid_to_func_ = {DISPID_AFTER_CALCULATE: "OnAfterCalculate"}
+
+            def OnAfterCalculate(self):
+                ...
+    Events are delivered on the thread that connected, while it pumps messages (`pythoncom.PumpWaitingMessages`).
+    Events without a handler are turned down, which Excel ignores.
+    """
+    _public_methods_ = []
+    _com_interfaces_ = [IID_APP_EVENTS]
+    _dispid_to_func_ = {}
+
+    def __init__(self, app):
+        """
+        :param app: Excel Application COM object, or its `_oleobj_`
+        """
+        self._connection_point = None
+        container = getattr(app, "_oleobj_", app).QueryInterface(pythoncom.IID_IConnectionPointContainer)
+        connection_point = container.FindConnectionPoint(IID_APP_EVENTS)
+        # the policy wraps the worksheets and ranges Excel passes to handlers in `win32com.client.Dispatch` objects
+        self._cookie = connection_point.Advise(win32com.server.util.wrap(self, usePolicy=EventHandlerPolicy))
+        self._connection_point = connection_point
+
+    def _query_interface_(self, iid):
+        if iid == IID_APP_EVENTS:
+            return win32com.server.util.wrap(self, usePolicy=EventHandlerPolicy)
+        return None
+
+    def close(self) -> None:
+        """
+        Stops listening, safe to call more than once
+        :return: None
+        """
+        connection_point, self._connection_point = self._connection_point, None
+        if connection_point is not None:
+            connection_point.Unadvise(self._cookie)
@@ -0,0 +1,127 @@
+# Copyright (c) 2020 safexl
+import safexl.address as address
+import safexl.colors as colors
+
+__all__ = [
+    'apply_formats',
+]
+
+
+def _target(target) -> tuple:
+    """
+    :param target: str or tuple - An A1 style address like 'B2' or 'B2:C5', or a (row, column) tuple of ints
+    :return: tuple - (first_row, first_column, last_row, last_column)
+    """
+    if isinstance(target, tuple):
+        row, column = target
+        return row, column, row, column
+    return address.parse(target)
+
+
+class _FormatGroup:
+    """
+    One property set to one value, and the single cells and rectangles it is set on
+    """
+    def __init__(self, path: str, value):
+        self.path = path
+        self.value = value
+        self.cells = set()
+        self.areas = {}
+        self.bounds = None
+
+    def add(self, rectangle: tuple) -> None:
+        first_row, first_column, last_row, last_column = rectangle
+        if first_row == last_row and first_column == last_column:
+            self.cells.add((first_row, first_column))
+        else:
+            self.areas[rectangle] = None
+        if self.bounds is None:
+            self.bounds = rectangle
+        else:
+            self.bounds = (min(self.bounds[0], first_row), min(self.bounds[1], first_column),
+                           max(self.bounds[2], last_row), max(self.bounds[3], last_column))
+
+    def overlaps(self, rectangle: tuple) -> bool:
+        if not _intersect(self.bounds, rectangle):
+            return False
+        if any(_intersect(area, rectangle) for area in self.areas):
+            return True
+        first_row, first_column, last_row, last_column = rectangle
+        if first_row == last_row and first_column == last_column:
+            return (first_row, first_column) in self.cells
+        return any(first_row <= row <= last_row and first_column <= column <= last_column for row, column in self.cells)
+
+    def addresses(self) -> tuple:
+        # neighbouring cells are addressed as one area, ex: 'A1:A10' rather than 'A1,A2,...,A10'
+        return tuple(address.area(*rectangle) for rectangle in list(self.areas) + address.coalesce(self.cells))
+
+
+def _intersect(a: tuple, b: tuple) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def apply_formats(worksheet, spec: dict) -> None:
+    """
+    Applies many cell formats at once, with as few COM calls as possible. Rather than formatting cell by cell,
+    cells that get the same value for the same property are gathered into multi-area ranges (ex: 'A1:A10,C3,E5:F6', with
+    neighbouring cells joined into rectangles and split to stay under Excel's 255 character limit on addresses) and each
+    property is set once per range:
+        safexl.apply_formats(ws, {
+            "A1:D1": {"Font.Bold": True, "Interior.Color": safexl.colors.rgbLightGray},
+            "D2:D100": {"NumberFormat": "$#,##0.00"},
+            (5, 4): {"Interior.Color": "rgbRed", "Font.Color": (255, 255, 255)},
+        })
+    :param worksheet: Worksheet COM object
+    :param spec: dict - Maps each target to the formats to apply to it. Targets are A1 style addresses of cells or
+                        rectangular ranges, or (row, column) tuples. Formats map a property path, as you would write it after
+                        `rng.` in code (ex: 'Interior.Color', 'Font.Bold', 'NumberFormat'), to its value. Color properties
+                        also accept the names in `safexl.colors` (ex: 'rgbRed') and (red, green, blue) tuples.
+                        Where targets overlap, a later entry wins over an earlier one, as if they were applied one by one.
+    :return: None
+    """
+    # every (property path, value) and the targets that get it, in the order they are applied
+    groups = []
+    # property path -> value -> index in `groups` of the latest group setting the path to that value
+    latest_groups = {}
+    for target, formats in spec.items():
+        rectangle = _target(target)
+        for path, value in formats.items():
+            if path.split(".")[-1].endswith("Color"):
+                value = colors.to_color(value)
+            by_value = latest_groups.setdefault(path, {})
+            i = by_value.get(value)
+            if i is None or any(group.path == path and group.overlaps(rectangle) for group in groups[i + 1:]):
+                # joining the earlier group would let a later one overwrite this target, ex: with 'A1:D1' red,
+                # then 'B1' blue, then 'B1:C1' red again, 'B1:C1' is set after 'B1' and not along with 'A1:D1'
+                i = by_value[value] = len(groups)
+                groups.append(_FormatGroup(path, value))
+            groups[i].add(rectangle)
+
+    # formats applied to exactly the same cells share their ranges, ex: a bold red header row
+    batches = []
+    # addresses -> index in `batches` of the latest batch for them, property path -> index of the latest batch setting it
+    latest_batches, latest_batch_for_path = {}, {}
+    for group in groups:
+        addresses = group.addresses()
+        j = latest_batches.get(addresses)
+        if j is None or latest_batch_for_path.get(group.path, -1) > j:
+            # moving this value ahead of a later one for the same property would change which of them wins
+            j = latest_batches[addresses] = len(batches)
+            batches.append((addresses, []))
+        batches[j][1].append((group.path, group.value))
+        latest_batch_for_path[group.path] = max(j, latest_batch_for_path.get(group.path, -1))
+
+    for addresses, formats in batches:
+        for multi_area_address in address.split_addresses(addresses):
+            rng = worksheet.Range(multi_area_address)
+            # intermediate objects like `rng.Font` are fetched once per range, not once per property
+            parents = {"": rng}
+            for path, value in formats:
+                parent_path, _, name = path.rpartition(".")
+                parent = parents.get(parent_path)
+                if parent is None:
+                    parent = rng
+                    for part in parent_path.split("."):
+                        parent = getattr(parent, part)
+                    parents[parent_path] = parent
+                setattr(parent, name, value)
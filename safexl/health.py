@@ -0,0 +1,333 @@
+# Copyright (c) 2020 safexl
+from contextlib import contextmanager
+import logging
+import threading
+import time
+import psutil
+import pywintypes
+import win32process
+import safexl.metrics as metrics
+from safexl.errors import ExcelError
+from safexl.toolkit import (
+    application,
+    close_workbooks,
+    excel_pid,
+    release_application,
+    workbooks_currently_open,
+    _cached_application,
+    _forget_instance,
+    _opened_by_sessions,
+)
+
+__all__ = [
+    'HealthThresholds',
+    'InstanceHealth',
+    'instance_health',
+    'recycle_instance',
+    'healthy_application',
+]
+
+# pid -> InstanceHealth, for every instance used through `healthy_application` in this process
+_instance_health = {}
+_instance_health_lock = threading.Lock()
+_log = logging.getLogger(__name__)
+
+RECYCLES = metrics.Counter(
+    "safexl_instance_recycles_total", "Excel instances closed and replaced by `healthy_application`, by reason.",
+    labelnames=("reason",), registry=metrics.REGISTRY)
+RECYCLES_SKIPPED = metrics.Counter(
+    "safexl_instance_recycles_skipped_total",
+    "Worn out Excel instances `healthy_application` left running because they held workbooks safexl did not open, "
+    "by reason.", labelnames=("reason",), registry=metrics.REGISTRY)
+
+
+class HealthThresholds:
+    """
+    Limits past which an Excel instance is considered worn out and is recycled. Any limit can be set to `None` to ignore it.
+    """
+    def __init__(
+            self,
+            max_jobs: int = 500,
+            max_rss: int = 1_500_000_000,
+            max_handles: int = 10_000,
+            max_probe_latency: float = 0.25,
+            max_age: float = None,
+    ):
+        """
+        :param max_jobs: Optional int - Defaults to 500. `with` blocks run against the instance
+        :param max_rss: Optional int - Defaults to 1.5GB. Bytes of resident memory used by the EXCEL.EXE process
+        :param max_handles: Optional int - Defaults to 10,000. Windows handles held by the EXCEL.EXE process
+        :param max_probe_latency: Optional float - Defaults to 0.25. Seconds, moving average of the single `app.Hwnd`
+                                                  round trip made at the start of each job, as a cheap sign of how
+                                                  responsive the instance still is. The job's own calls are not timed.
+        :param max_age: Optional float - Defaults to `None`. Seconds since safexl first saw the instance
+        """
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.max_handles = max_handles
+        self.max_probe_latency = max_probe_latency
+        self.max_age = max_age
+
+
+class InstanceHealth:
+    """
+    Running record of how worn out a single EXCEL.EXE process is. Excel leaks memory and handles and slows down over
+    hundreds of automation jobs, and this is what `healthy_application` uses to decide when to start over with a fresh one.
+    """
+    # weight of the newest probe in the moving average probe latency
+    latency_smoothing = 0.1
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.jobs = 0
+        self.rss = 0
+        self.handles = 0
+        self.probe_latency = None
+        self.first_seen = time.monotonic()
+        # set once a recycle has been skipped, so that it is only logged the first time
+        self.recycle_skipped = False
+        self._process = psutil.Process(pid)
+        self._lock = threading.Lock()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.first_seen
+
+    def record_probe_latency(self, seconds: float) -> None:
+        with self._lock:
+            if self.probe_latency is None:
+                self.probe_latency = seconds
+            else:
+                self.probe_latency += self.latency_smoothing * (seconds - self.probe_latency)
+
+    def job_finished(self) -> None:
+        with self._lock:
+            self.jobs += 1
+
+    @property
+    def running(self) -> bool:
+        # also `False` once the PID has been reused by another process, as psutil compares creation times
+        return self._process.is_running()
+
+    def sample(self) -> bool:
+        """
+        Refreshes `rss` and `handles` from psutil, no round trip to Excel involved
+        :return: bool - `False` if the process has exited, in which case nothing was refreshed
+        """
+        try:
+            self.rss = self._process.memory_info().rss
+            self.handles = self._process.num_handles()
+        except psutil.NoSuchProcess:
+            return False
+        metrics.record_excel_process(self._process)
+        return True
+
+    def score(self, thresholds: HealthThresholds) -> tuple:
+        """
+        :param thresholds: HealthThresholds
+        :return: tuple - (score, reason) where score is the largest fraction of any limit used so far, so 1.0 or more means
+                         the instance should be recycled, and reason is the name of that limit ('jobs', 'rss', etc.)
+        """
+        ratios = [
+            ("jobs", self.jobs, thresholds.max_jobs),
+            ("rss", self.rss, thresholds.max_rss),
+            ("handles", self.handles, thresholds.max_handles),
+            ("probe_latency", self.probe_latency or 0.0, thresholds.max_probe_latency),
+            ("age", self.age, thresholds.max_age),
+        ]
+        score, reason = 0.0, None
+        for name, value, limit in ratios:
+            if limit is None:
+                continue
+            ratio = value / limit if limit else float("inf")
+            if ratio > score:
+                score, reason = ratio, name
+        return score, reason
+
+    def __repr__(self):
+        latency = f"{self.probe_latency * 1000:.1f}ms" if self.probe_latency is not None else "n/a"
+        return (f"<InstanceHealth pid={self.pid} jobs={self.jobs} rss={self.rss} "
+                f"handles={self.handles} probe_latency={latency} age={self.age:.0f}s>")
+
+
+def instance_health(app: 'win32com.client.Dispatch("Excel.Application")') -> InstanceHealth:
+    """
+    :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
+    :return: InstanceHealth - Record for the instance behind `app`, created on first use
+    """
+    return _health_for(excel_pid(app))
+
+
+def _health_for(pid: int) -> InstanceHealth:
+    with _instance_health_lock:
+        health = _instance_health.get(pid)
+        if health is None or not health.running:
+            # a PID left behind by an instance that was killed may have been handed to a new one
+            health = _instance_health[pid] = InstanceHealth(pid)
+        return health
+
+
+def _forget_health(pid: int) -> None:
+    with _instance_health_lock:
+        _instance_health.pop(pid, None)
+
+
+def _foreign_workbooks(app: 'win32com.client.Dispatch("Excel.Application")') -> list:
+    """
+    :return: list - Workbooks open in `app` that were not opened by this thread's `keep_alive` blocks, ex: the user's own
+    """
+    opened = _opened_by_sessions()
+    foreign = [wb for wb in workbooks_currently_open(app) if wb not in opened]
+    if foreign:
+        # the workbooks Excel opens from its StartupPath on its own, ex: PERSONAL.XLSB, are no one's work in progress
+        startup_path = app.StartupPath
+        foreign = [wb for wb in foreign if startup_path not in wb.FullName]
+    return foreign
+
+
+def recycle_instance(app: 'win32com.client.Dispatch("Excel.Application")', timeout: float = 5.0,
+                     force: bool = False) -> None:
+    """
+    Closes every workbook in the instance behind `app` without saving and asks it to quit, then kills that one
+    EXCEL.EXE process if it is still running after `timeout` seconds. Other Excel instances are left alone,
+    unlike `kill_all_instances_of_excel`. Drop your own references to `app` afterwards, as it no longer works.
+    :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
+    :param timeout: Optional float - Defaults to 5. Seconds to wait for Excel to exit on its own
+    :param force: Optional bool - Defaults to `False`, raising an `ExcelError` instead if any open workbook was not opened
+                                  by this thread's `application(keep_alive=True)` blocks, as it may hold unsaved work
+    :return: None
+    """
+    if not force:
+        foreign = _foreign_workbooks(app)
+        if foreign:
+            raise ExcelError(f"Excel has {len(foreign)} workbook(s) open that safexl did not open, "
+                             "pass force=True to close them without saving")
+    hwnd = app.Hwnd
+    pid = excel_pid(app)
+    quit_started = _quit(app)
+    del app
+    _release(pid, hwnd)
+    _reap(pid, timeout if quit_started else 0.0)
+
+
+def _quit(app: 'win32com.client.Dispatch("Excel.Application")') -> bool:
+    """
+    :return: bool - Whether Excel accepted `Quit`, rather than being too busy or already gone
+    """
+    try:
+        close_workbooks(app, workbooks_currently_open(app))
+        app.Quit()
+    except pywintypes.com_error:
+        # hung or already on its way out, `_reap` takes care of it
+        return False
+    return True
+
+
+def _release(pid: int, hwnd: int) -> None:
+    """
+    Drops every reference this thread keeps to the instance, which must happen on this thread and before Excel can exit
+    """
+    cached_app = _cached_application()
+    if cached_app is not None and cached_app.Hwnd == hwnd:
+        # Excel won't exit while this thread's `keep_alive` session still holds a reference to it
+        release_application()
+    del cached_app
+    _forget_instance(hwnd)
+    _forget_health(pid)
+
+
+def _reap(pid: int, timeout: float) -> None:
+    try:
+        process = psutil.Process(pid)
+        try:
+            process.wait(timeout)
+        except psutil.TimeoutExpired:
+            process.kill()
+            metrics.KILLS.inc()
+    except psutil.NoSuchProcess:
+        pass
+    metrics.EXCEL_RSS.remove(pid=pid)
+
+
+@contextmanager
+def healthy_application(thresholds: HealthThresholds = None, respawn: bool = True, **application_kwargs):
+    """
+    Long running counterpart to `safexl.application(kill_after=False, keep_alive=True)`, for services that run one job
+    after another against the same Excel instance. Every block records a job, the latency of one `app.Hwnd` probe, and
+    the memory and handle count of the EXCEL.EXE process against that instance, and once any of those crosses its limit in
+    `thresholds` the instance is recycled after the block ends: workbooks closed, Excel quit, and a fresh instance
+    started, so that a day-long run doesn't slow down as Excel wears out:
+        for job in jobs:
+            with safexl.healthy_application() as app:
+                job.run(app)
+    Note that `win32com.client.Dispatch` attaches to an instance that is already running, so a fresh instance is only
+    started if no other Excel is open on the machine. An instance is only ever recycled if every workbook open in it was
+    opened by these blocks, so a worn out instance that is also someone's own Excel session is left running (and the skip
+    logged) rather than having their unsaved workbooks closed. The recycled EXCEL.EXE is given 5 seconds to exit on a
+    background thread, and killed if it hasn't, so the block itself doesn't wait for it.
+    :param thresholds: Optional HealthThresholds - Defaults to `HealthThresholds()`
+    :param respawn: Optional bool - Defaults to `True`. Start the replacement instance right after recycling, rather than
+                                    leaving that cost to the next block
+    :param application_kwargs: Optional keyword arguments passed on to `safexl.application`, ex: `retry_deadline=30`
+    :return: win32com.client.Dispatch("Excel.Application") - Same as `safexl.application`
+    """
+    thresholds = thresholds or HealthThresholds()
+    health = None
+    app = None
+    try:
+        with application(kill_after=False, keep_alive=True, **application_kwargs) as app:
+            probe_start = time.perf_counter()
+            hwnd = app.Hwnd
+            probe_latency = time.perf_counter() - probe_start
+            thread_id, pid = win32process.GetWindowThreadProcessId(hwnd)
+            health = _health_for(pid)
+            health.record_probe_latency(probe_latency)
+            yield app
+    finally:
+        # the reference held by this generator would keep a recycled instance from exiting on its own
+        app = None
+        if health is not None:
+            health.job_finished()
+            if not health.sample():
+                # killed by `safexl.application` after an error in the block, a new instance starts from scratch
+                _forget_health(health.pid)
+            else:
+                score, reason = health.score(thresholds)
+                if score >= 1.0:
+                    _recycle_cached(health, reason, respawn, application_kwargs)
+
+
+def _recycle_cached(health: InstanceHealth, reason: str, respawn: bool, application_kwargs: dict) -> None:
+    pid = health.pid
+    app = _cached_application()
+    if app is None or excel_pid(app) != pid:
+        # the instance has already gone away on its own
+        _forget_health(pid)
+        return
+    try:
+        foreign = len(_foreign_workbooks(app))
+    except pywintypes.com_error:
+        # too busy to say what it has open, which could be someone's unsaved work
+        foreign = None
+    if foreign != 0:
+        RECYCLES_SKIPPED.inc(reason=reason)
+        if not health.recycle_skipped:
+            health.recycle_skipped = True
+            _log.warning("Not recycling Excel (pid %s, %s limit reached) as it has workbooks open that safexl did not "
+                         "open (%s)", pid, reason, "unknown" if foreign is None else foreign)
+        return
+    hwnd = app.Hwnd
+    quit_started = _quit(app)
+    del app
+    _release(pid, hwnd)
+    if quit_started:
+        # Excel has stopped taking new clients by the time `Quit` returns, so waiting for the process to exit is left to
+        # a background thread rather than holding up the job
+        threading.Thread(target=_reap, args=(pid, 5.0), name="safexl-reap", daemon=True).start()
+    else:
+        # a hung instance would otherwise be what the respawn below attaches to
+        _reap(pid, 0.0)
+    RECYCLES.inc(reason=reason)
+    if respawn:
+        with application(kill_after=False, keep_alive=True, **application_kwargs):
+            pass
@@ -0,0 +1,230 @@
+# Copyright (c) 2020 safexl
+import bisect
+import safexl.address as address
+
+__all__ = [
+    'index_sheet',
+    'SheetIndex',
+]
+
+
+def _column(column) -> int:
+    return column if isinstance(column, int) else address.column_number(column)
+
+
+class SheetIndex:
+    """
+    The key columns of a worksheet, read once and indexed in Python, so that lookups, joins and duplicate checks
+    cost a dictionary access rather than a `Range.Find` or `MATCH` round trip through COM each. Like those, text keys
+    are matched case insensitively by default. Build one with `safexl.index_sheet`.
+    Keys are whatever the key columns hold: the cell value for a single key column, a tuple of values for several.
+    """
+    def __init__(self, worksheet, key_columns, first_row: int = 1, last_row: int = None, case_sensitive: bool = False):
+        """
+        :param worksheet: Worksheet COM object
+        :param key_columns: str, int or list - Column(s) holding the key, as letters or numbers, ex: 'A' or ['A', 'C']
+        :param first_row: Optional int - Defaults to 1. First row to index, ex: 2 to skip a header row
+        :param last_row: Optional int - Defaults to the last row of the used range
+        :param case_sensitive: Optional bool - Defaults to `False`, matching text keys the way `Range.Find` does
+        """
+        self.worksheet = worksheet
+        if isinstance(key_columns, (str, int)):
+            self.key_columns = (_column(key_columns),)
+        else:
+            self.key_columns = tuple(_column(column) for column in key_columns)
+        self.first_row = first_row
+        self.case_sensitive = case_sensitive
+        # neighbouring key columns are read together, ex: A:B and E rather than A, B and E
+        self._column_runs = [(first_column, last_column) for _, first_column, _, last_column
+                             in address.coalesce((1, column) for column in set(self.key_columns))]
+        # key of each row, in sheet order
+        self._keys = []
+        # key -> row numbers holding it, in ascending order
+        self._rows = {}
+        self._extend(self._read(first_row, self._last_row() if last_row is None else last_row))
+
+    @property
+    def last_row(self) -> int:
+        return self.first_row + len(self._keys) - 1
+
+    def _last_row(self) -> int:
+        used = self.worksheet.UsedRange
+        return used.Row + used.Rows.Count - 1
+
+    def _normalize(self, value):
+        if isinstance(value, str) and not self.case_sensitive:
+            return value.casefold()
+        return value
+
+    def _key(self, key):
+        if isinstance(key, tuple):
+            return tuple(self._normalize(value) for value in key)
+        return self._normalize(key)
+
+    def _read(self, first_row: int, last_row: int) -> list:
+        """
+        :return: list - Key of every row from `first_row` to `last_row`, one bulk read per run of key columns
+        """
+        if last_row < first_row:
+            return []
+        values_by_column = {}
+        for first_column, last_column in self._column_runs:
+            values = self.worksheet.Range(address.area(first_row, first_column, last_row, last_column)).Value
+            if not isinstance(values, tuple):
+                # a single cell comes back as a bare value
+                values = ((values,),)
+            for offset, column in enumerate(range(first_column, last_column + 1)):
+                values_by_column[column] = [row[offset] for row in values]
+        columns = [values_by_column[column] for column in self.key_columns]
+        if len(columns) == 1:
+            return [self._normalize(value) for value in columns[0]]
+        return [tuple(self._normalize(value) for value in key) for key in zip(*columns)]
+
+    def _extend(self, keys: list) -> None:
+        row = self.last_row
+        for key in keys:
+            row += 1
+            self._keys.append(key)
+            self._rows.setdefault(key, []).append(row)
+
+    def _truncate(self, count: int) -> list:
+        """
+        Forgets every row past the first `count`
+        :return: list - Row numbers forgotten
+        """
+        removed = list(range(self.first_row + count, self.last_row + 1))
+        for row, key in zip(removed, self._keys[count:]):
+            rows = self._rows[key]
+            rows.remove(row)
+            if not rows:
+                del self._rows[key]
+        del self._keys[count:]
+        return removed
+
+    def _replace(self, row: int, key) -> bool:
+        i = row - self.first_row
+        previous = self._keys[i]
+        if previous == key:
+            return False
+        rows = self._rows[previous]
+        rows.remove(row)
+        if not rows:
+            del self._rows[previous]
+        bisect.insort(self._rows.setdefault(key, []), row)
+        self._keys[i] = key
+        return True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return self._key(key) in self._rows
+
+    def find(self, key):
+        """
+        :param key: The value to look for, or a tuple of values with several key columns
+        :return: int or None - Row number of the first row holding `key`, like `Range.Find`, or `None` if no row does
+        """
+        rows = self._rows.get(self._key(key))
+        return rows[0] if rows else None
+
+    def find_all(self, key) -> list:
+        """
+        :param key: The value to look for, or a tuple of values with several key columns
+        :return: list - Row numbers of every row holding `key`, in ascending order
+        """
+        return list(self._rows.get(self._key(key), ()))
+
+    def key(self, row: int):
+        """
+        :param row: int - Row number
+        :return: The key held in that row, as indexed (text lower cased unless `case_sensitive`)
+        """
+        return self._keys[row - self.first_row]
+
+    def duplicates(self, include_blank: bool = False) -> dict:
+        """
+        :param include_blank: Optional bool - Defaults to `False`, ignoring rows with nothing in the key columns
+        :return: dict - Key -> row numbers, for every key found in more than one row
+        """
+        return {key: list(rows) for key, rows in self._rows.items()
+                if len(rows) > 1 and (include_blank or not self._is_blank(key))}
+
+    def join(self, other: "SheetIndex", how: str = "inner") -> list:
+        """
+        Pairs up the rows of two indexed sheets that hold the same key, ex: to reconcile a ledger against a bank statement
+        :param other: SheetIndex - Index over the other sheet, with the same number of key columns
+        :param how: Optional str - 'inner' (the default) for matching rows only, 'left' to also include the rows of this
+                                   sheet without a match, paired with `None`
+        :return: list - (row, other_row) tuples, in the row order of this sheet, one per matching pair
+        """
+        if how not in ("inner", "left"):
+            raise ValueError(f"how must be 'inner' or 'left', not {how!r}")
+        pairs = []
+        for row, key in enumerate(self._keys, self.first_row):
+            if self._is_blank(key):
+                continue
+            other_rows = other._rows.get(other._key(key))
+            if other_rows:
+                pairs.extend((row, other_row) for other_row in other_rows)
+            elif how == "left":
+                pairs.append((row, None))
+        return pairs
+
+    @staticmethod
+    def _is_blank(key) -> bool:
+        if isinstance(key, tuple):
+            return all(value is None for value in key)
+        return key is None
+
+    def refresh(self, rows=None) -> list:
+        """
+        Brings the index up to date after the sheet has changed
+        :param rows: Optional iterable - Row numbers known to have changed (ex: from your own writes), only those are
+                                         re-read. Defaults to re-reading the key columns in one bulk read down to the
+                                         current end of the used range, and updating only the rows whose key differs.
+                                         Rows past the new end of the used range are dropped from the index.
+        :return: list - Row numbers whose key changed, including rows added below the indexed block or dropped from it
+        """
+        if rows is None:
+            keys = self._read(self.first_row, self._last_row())
+            changed = [row for row, key in enumerate(keys[:len(self._keys)], self.first_row) if self._replace(row, key)]
+            if len(keys) > len(self._keys):
+                changed.extend(range(self.last_row + 1, self.first_row + len(keys)))
+                self._extend(keys[len(self._keys):])
+            elif len(keys) < len(self._keys):
+                # the sheet got shorter, ex: rows deleted
+                changed.extend(self._truncate(len(keys)))
+            return changed
+
+        changed = []
+        # contiguous rows are re-read as one block
+        for first_row, _, last_row, _ in address.coalesce((row, 1) for row in rows if row >= self.first_row):
+            keys = self._read(first_row, last_row)
+            for row, key in enumerate(keys, first_row):
+                if row > self.last_row:
+                    # a gap between the indexed block and this row is read too, so that rows stay contiguous
+                    gap = self._read(self.last_row + 1, row - 1)
+                    changed.extend(range(self.last_row + 1, row + 1))
+                    self._extend(gap + [key])
+                elif self._replace(row, key):
+                    changed.append(row)
+        return changed
+
+
+def index_sheet(worksheet, key_columns, first_row: int = 1, last_row: int = None, case_sensitive: bool = False) -> SheetIndex:
+    """
+    Reads the key columns of a worksheet in bulk and indexes them in Python, to replace repeated `Range.Find` or `MATCH`
+    calls through COM:
+        orders = safexl.index_sheet(orders_ws, "A", first_row=2)
+        row = orders.find("ORD-1042")  # -> 57, without a round trip to Excel
+        payments = safexl.index_sheet(payments_ws, "C", first_row=2)
+        unpaid = [row for row, other_row in orders.join(payments, how="left") if other_row is None]
+    :param worksheet: Worksheet COM object
+    :param key_columns: str, int or list - Column(s) holding the key, as letters or numbers, ex: 'A' or ['A', 'C']
+    :param first_row: Optional int - Defaults to 1. First row to index, ex: 2 to skip a header row
+    :param last_row: Optional int - Defaults to the last row of the used range
+    :param case_sensitive: Optional bool - Defaults to `False`, matching text keys the way `Range.Find` does
+    :return: SheetIndex
+    """
+    return SheetIndex(worksheet, key_columns, first_row, last_row, case_sensitive)
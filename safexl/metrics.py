@@ -0,0 +1,311 @@
+# Copyright (c) 2020 safexl
+import http.server
+import os
+import tempfile
+import threading
+
+__all__ = [
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'Registry',
+    'REGISTRY',
+    'generate_latest',
+    'write_textfile',
+    'start_http_server',
+]
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: tuple = ()) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Shared plumbing for the metric types below: a name, a help string, a fixed tuple of label names
+    and a dict of label values -> state, all guarded by a single lock so the metrics can be updated
+    from any thread running an `application()` block.
+    """
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: iter = (), registry: 'Registry' = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def remove(self, **labels) -> None:
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def label_values(self) -> list:
+        """
+        :return: list - Label values of every series, as dicts of label name -> value
+        """
+        with self._lock:
+            return [dict(zip(self.labelnames, key)) for key in self._values]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items: list) -> list:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, such as the number of sessions started
+    """
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down, such as the resident memory of an Excel process
+    """
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """
+    Cumulative bucketed observations, such as the duration of each `with safexl.application()` block
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: iter = (), registry: 'Registry' = None,
+                 buckets: iter = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != float("inf"))) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state["count"] if state else 0
+
+    def _render_samples(self, items: list) -> list:
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, state["counts"]):
+                cumulative += bucket_count
+                le = (("le", _format_value(upper_bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metrics rendered together in the Prometheus text exposition format
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> _Metric:
+        return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SESSIONS_STARTED = Counter(
+    "safexl_sessions_started_total", "Number of `safexl.application()` blocks entered.", registry=REGISTRY)
+SESSIONS_FAILED = Counter(
+    "safexl_sessions_failed_total", "Number of `safexl.application()` blocks that failed to start or ended in an error.", registry=REGISTRY)
+SESSION_DURATION = Histogram(
+    "safexl_session_duration_seconds", "Wall time spent inside `safexl.application()` blocks, cleanup included.",
+    registry=REGISTRY)
+KILLS = Counter(
+    "safexl_excel_kills_total", "Number of Excel processes killed by `kill_all_instances_of_excel`.", registry=REGISTRY)
+WORKBOOKS_CLOSED = Counter(
+    "safexl_workbooks_closed_total", "Number of workbooks closed without saving by `close_workbooks`.", registry=REGISTRY)
+COM_ERRORS = Counter(
+    "safexl_com_errors_total", "COM errors raised starting or inside `safexl.application()` blocks, by HRESULT.",
+    labelnames=("hresult",), registry=REGISTRY)
+EXCEL_RSS = Gauge(
+    "safexl_excel_resident_memory_bytes", "Resident memory of each EXCEL.EXE process last seen by safexl.",
+    labelnames=("pid",), registry=REGISTRY)
+
+
+def format_hresult(hresult: int) -> str:
+    """
+    Formats an HRESULT the way Microsoft documents them, ex: -2147418111 -> '0x80010001'
+    :param hresult: int - Signed HRESULT, as found on `pywintypes.com_error.hresult`
+    :return: str - Unsigned 8 digit hexadecimal representation
+    """
+    return f"0x{hresult & 0xFFFFFFFF:08X}"
+
+
+def record_excel_process(proc) -> None:
+    """
+    Updates the resident memory gauge for a single EXCEL.EXE process
+    :param proc: psutil.Process - Process already confirmed to be EXCEL.EXE
+    :return: None
+    """
+    try:
+        EXCEL_RSS.set(proc.memory_info().rss, pid=proc.pid)
+    except Exception:
+        # metrics should never be the reason an Excel helper fails, so psutil errors are ignored here
+        pass
+
+
+def record_excel_processes(procs: list) -> None:
+    """
+    Updates the resident memory gauge for every running EXCEL.EXE process, and drops the series of processes that
+    have exited since, however they went (killed, `Quit()`, closed by the user), so they don't pile up in long-running services
+    :param procs: list - Every EXCEL.EXE process currently running, as psutil.Process objects
+    :return: None
+    """
+    for proc in procs:
+        record_excel_process(proc)
+    running = {str(proc.pid) for proc in procs}
+    for labels in EXCEL_RSS.label_values():
+        if labels["pid"] not in running:
+            EXCEL_RSS.remove(**labels)
+
+
+def generate_latest(registry: Registry = REGISTRY) -> str:
+    """
+    Renders every metric in the registry in the Prometheus text exposition format
+    :param registry: Optional Registry - Defaults to the safexl registry
+    :return: str - Text ready to be served to a Prometheus scraper
+    """
+    return registry.render()
+
+
+def write_textfile(path: str, registry: Registry = REGISTRY) -> None:
+    """
+    Writes the current metrics to `path` for use with the node_exporter textfile collector. The file is written
+    to a temporary file in the same directory first and then moved into place, so a scrape never sees half a file.
+    :param path: str - Filepath ending in `.prom` inside the textfile collector's directory
+    :param registry: Optional Registry - Defaults to the safexl registry
+    :return: None
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".safexl-", suffix=".prom.tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(generate_latest(registry))
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def start_http_server(port: int, addr: str = "127.0.0.1", registry: Registry = REGISTRY) -> http.server.HTTPServer:
+    """
+    Serves the metrics on `http://addr:port/metrics` from a daemon thread
+    :param port: int - Port to listen on, 0 picks a free port (see `server.server_port`)
+    :param addr: Optional str - Defaults to localhost only
+    :param registry: Optional Registry - Defaults to the safexl registry
+    :return: http.server.HTTPServer - Call `.shutdown()` on it to stop serving
+    """
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = generate_latest(registry).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # keep scrapes from flooding stderr
+            pass
+
+    server = http.server.ThreadingHTTPServer((addr, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="safexl-metrics", daemon=True)
+    thread.start()
+    return server
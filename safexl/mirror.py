@@ -0,0 +1,138 @@
+# Copyright (c) 2020 safexl
+import safexl.address as address
+
+__all__ = [
+    'SheetMirror',
+]
+
+
+def _as_rows(data) -> list:
+    # numpy arrays and pandas frames (`.values`) come in as nested lists, everything else as lists of lists
+    if hasattr(data, "tolist"):
+        data = data.tolist()
+    return [list(row) for row in data]
+
+
+def _differs(value, previous_value) -> bool:
+    # `True == 1 == 1.0` in Python, but Excel keeps a boolean apart from a number, so the type has to match too
+    return value != previous_value or type(value) is not type(previous_value)
+
+
+class SheetMirror:
+    """
+    Remembers the block of values last written to a worksheet, so that the next write only sends Excel the cells
+    that changed. Meant for dashboards that refresh a large block of data where only a few cells differ each time:
+        mirror = safexl.SheetMirror(ws, "A1")
+        while True:
+            mirror.write(fetch_data())  # the first write sends everything, later writes only the differences
+    Changed cells are joined into rectangles (see `safexl.address.coalesce`), each written with a single `Value2`
+    assignment. When so much has changed that a full write would be cheaper, the whole block is written instead.
+    Cells edited in Excel since the last write are not noticed, call `invalidate()` to force a full write.
+    When a write has fewer rows or columns than the one before, the cells the old block covered beyond the new one are
+    cleared, so no stale values are left around the block.
+    """
+    def __init__(self, worksheet, top_left="A1", full_write_ratio: float = 0.3, max_areas: int = 100):
+        """
+        :param worksheet: Worksheet COM object
+        :param top_left: Optional str or tuple - Defaults to 'A1'. Top left cell of the block, as an A1 style address
+                                                 or a (row, column) tuple
+        :param full_write_ratio: Optional float - Defaults to 0.3. Fraction of changed cells above which the whole block is
+                                                  written instead of the differences
+        :param max_areas: Optional int - Defaults to 100. Most separate rectangles written before a single full write
+                                         is cheaper, as each one is a round trip to Excel
+        """
+        self.worksheet = worksheet
+        if isinstance(top_left, tuple):
+            self.first_row, self.first_column = top_left
+        else:
+            self.first_row, self.first_column, _, _ = address.parse(top_left)
+        self.full_write_ratio = full_write_ratio
+        self.max_areas = max_areas
+        self.last_areas = []
+        self._rows = None
+        # (rows, columns) of the block last written, kept by `invalidate` so that a smaller block still clears the rest
+        self._shape = (0, 0)
+
+    def invalidate(self) -> None:
+        """
+        Forgets what was last written, so that the next `write` sends the whole block
+        :return: None
+        """
+        self._rows = None
+
+    def write(self, data) -> None:
+        """
+        :param data: Rows of values, as a list of lists (or tuples), numpy array, etc. All rows must be the same length.
+        :return: None - The addresses written to or cleared are left in `last_areas`
+        """
+        rows = _as_rows(data)
+        if not rows or not rows[0]:
+            self.last_areas = []
+            self._clear_outside(0, 0)
+            self._rows = None
+            return
+        width = len(rows[0])
+        if any(len(row) != width for row in rows):
+            raise ValueError("All rows must be the same length")
+
+        previous = self._rows
+        if previous is None or len(previous) != len(rows) or len(previous[0]) != width:
+            self._write_full(rows)
+            return
+
+        changed_cells = []
+        for i, (row, previous_row) in enumerate(zip(rows, previous)):
+            # comparing whole rows first keeps the unchanged majority of rows out of the Python level loop
+            if row != previous_row or list(map(type, row)) != list(map(type, previous_row)):
+                changed_cells.extend((i, j) for j, (value, previous_value) in enumerate(zip(row, previous_row))
+                                     if _differs(value, previous_value))
+
+        if len(changed_cells) > self.full_write_ratio * len(rows) * width:
+            self._write_full(rows)
+            return
+        areas = address.coalesce(changed_cells)
+        if len(areas) > self.max_areas:
+            self._write_full(rows)
+            return
+
+        self.last_areas = []
+        for first_i, first_j, last_i, last_j in areas:
+            block = tuple(tuple(row[first_j:last_j + 1]) for row in rows[first_i:last_i + 1])
+            self._write_block(first_i, first_j, last_i, last_j, block)
+        self._rows = rows
+
+    def _write_full(self, rows: list) -> None:
+        self.last_areas = []
+        self._rows = None
+        self._write_block(0, 0, len(rows) - 1, len(rows[0]) - 1, tuple(tuple(row) for row in rows))
+        self._clear_outside(len(rows), len(rows[0]))
+        self._rows = rows
+
+    def _clear_outside(self, height: int, width: int) -> None:
+        """
+        Clears what is left of the previous block to the right of and below a new block of `height` rows and `width` columns
+        """
+        previous_height, previous_width = self._shape
+        self._shape = (height, width)
+        if previous_width > width:
+            self._clear_block(0, width, min(height, previous_height) - 1, previous_width - 1)
+        if previous_height > height:
+            self._clear_block(height, 0, previous_height - 1, previous_width - 1)
+
+    def _clear_block(self, first_i: int, first_j: int, last_i: int, last_j: int) -> None:
+        if last_i < first_i or last_j < first_j:
+            return
+        area = self._area(first_i, first_j, last_i, last_j)
+        self.worksheet.Range(area).ClearContents()
+        self.last_areas.append(area)
+
+    def _area(self, first_i: int, first_j: int, last_i: int, last_j: int) -> str:
+        return address.area(
+            self.first_row + first_i, self.first_column + first_j,
+            self.first_row + last_i, self.first_column + last_j,
+        )
+
+    def _write_block(self, first_i: int, first_j: int, last_i: int, last_j: int, block: tuple) -> None:
+        area = self._area(first_i, first_j, last_i, last_j)
+        self.worksheet.Range(area).Value2 = block
+        self.last_areas.append(area)
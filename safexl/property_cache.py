@@ -0,0 +1,219 @@
+# Copyright (c) 2020 safexl
+import threading
+
+__all__ = [
+    'CachingDispatch',
+    'PropertyCacheStats',
+    'CACHED_PROPERTIES',
+]
+
+# Properties that don't change over the life of a `with` block, short of one of the mutators below being called
+CACHED_PROPERTIES = frozenset((
+    "FullName",
+    "Name",
+    "Path",
+    "CodeName",
+    "StartupPath",
+    "Version",
+    "Hwnd",
+    "OperatingSystem",
+    "PathSeparator",
+    "LibraryPath",
+    "UserLibraryPath",
+    "TemplatesPath",
+    "DefaultFilePath",
+))
+
+# Method name -> properties that calling it invalidates, on the object it was called on
+MUTATING_METHODS = {
+    "SaveAs": ("FullName", "Name", "Path"),
+}
+
+# Assigning one of these properties invalidates the others listed with it, on the same object
+MUTATING_PROPERTIES = {
+    "Name": ("Name", "FullName"),
+    "DefaultFilePath": ("DefaultFilePath",),
+}
+
+
+class PropertyCacheStats:
+    """
+    Hit and miss counts shared by every `CachingDispatch` created from the same root object
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def invalidated(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self):
+        return (f"<PropertyCacheStats hits={self.hits} misses={self.misses} "
+                f"invalidations={self.invalidations} hit_rate={self.hit_rate:.1%}>")
+
+
+def _identity(obj):
+    return getattr(obj, "_oleobj_", obj)
+
+
+class _ValueStore:
+    """
+    Cached values of every COM object reached from the same root `CachingDispatch`. Objects are told apart with `==`,
+    which pywin32 answers by comparing their IUnknown pointers, without a round trip to Excel. Their hash isn't based on
+    that identity, so they can't simply be dict keys. Only objects that had a cached property read are kept, so ranges
+    merely passed through in a loop are not held on to for the life of the root proxy.
+    """
+    def __init__(self):
+        self._entries = []
+
+    def get(self, obj, create: bool = False):
+        """
+        :param obj: The underlying COM object
+        :param create: Optional bool - Defaults to `False`. Whether to start an empty entry for an object not seen yet
+        :return: dict or None - Property name -> cached value, or `None` for an object without an entry
+        """
+        key = _identity(obj)
+        for other, values in self._entries:
+            if other == key:
+                return values
+        if not create:
+            return None
+        values = {}
+        self._entries.append((key, values))
+        return values
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _unwrap(value):
+    if isinstance(value, CachingDispatch):
+        return object.__getattribute__(value, "_obj")
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+
+class CachingDispatch:
+    """
+    Read-through proxy around a `win32com.client.Dispatch` object that remembers the value of effectively immutable
+    properties like `FullName` and `StartupPath` after the first read, so that reading them again through the same
+    proxy costs no round trip to Excel. Any COM object returned through the proxy is proxied in turn, sharing the same
+    statistics, so hold on to `wb = app.Workbooks.Add()` rather than reaching for `app.ActiveWorkbook` every time.
+    Calling a known mutator (`SaveAs`, assigning `Name`, etc.) forgets the affected values on that object. Values are
+    kept per underlying COM object rather than per proxy, so renaming a sheet through `wb.Worksheets(1)` is also seen
+    through a proxy for the same sheet reached as `wb.ActiveSheet`.
+    Note that changes made behind the proxy's back, by VBA or by the user, are not seen, which is why this is opt-in.
+    """
+    def __init__(self, obj, cached_properties: iter = CACHED_PROPERTIES, stats: PropertyCacheStats = None,
+                 store: _ValueStore = None):
+        object.__setattr__(self, "_obj", obj)
+        object.__setattr__(self, "_cached_properties", frozenset(cached_properties))
+        object.__setattr__(self, "_stats", stats if stats is not None else PropertyCacheStats())
+        # shared by every proxy created from the same root
+        object.__setattr__(self, "_store", store if store is not None else _ValueStore())
+        # this object's entry in the store, looked up on the first cached read rather than for every proxy
+        object.__setattr__(self, "_values", None)
+
+    @property
+    def cache_stats(self) -> PropertyCacheStats:
+        return object.__getattribute__(self, "_stats")
+
+    def _wrap(self, value):
+        if hasattr(value, "_oleobj_"):
+            return CachingDispatch(
+                value,
+                object.__getattribute__(self, "_cached_properties"),
+                object.__getattribute__(self, "_stats"),
+                object.__getattribute__(self, "_store"),
+            )
+        return value
+
+    def _values_for(self, create: bool):
+        values = object.__getattribute__(self, "_values")
+        if values is None:
+            values = object.__getattribute__(self, "_store").get(object.__getattribute__(self, "_obj"), create)
+            object.__setattr__(self, "_values", values)
+        return values
+
+    def _invalidate(self, names: iter) -> None:
+        values = self._values_for(create=False)
+        if values is None:
+            # nothing was ever cached for this object
+            return
+        for name in names:
+            if values.pop(name, None) is not None:
+                object.__getattribute__(self, "_stats").invalidated()
+
+    def __getattr__(self, name):
+        obj = object.__getattribute__(self, "_obj")
+        if name in object.__getattribute__(self, "_cached_properties"):
+            values = self._values_for(create=True)
+            stats = object.__getattribute__(self, "_stats")
+            if name in values:
+                stats.hit()
+                return values[name]
+            stats.miss()
+            value = values[name] = self._wrap(getattr(obj, name))
+            return value
+
+        value = getattr(obj, name)
+        if name in MUTATING_METHODS and callable(value) and not hasattr(value, "_oleobj_"):
+            invalidates = MUTATING_METHODS[name]
+
+            def mutator(*args, **kwargs):
+                try:
+                    return self._wrap(value(*_unwrap(args), **{key: _unwrap(arg) for key, arg in kwargs.items()}))
+                finally:
+                    self._invalidate(invalidates)
+            return mutator
+        if callable(value) and not hasattr(value, "_oleobj_"):
+            def method(*args, **kwargs):
+                return self._wrap(value(*_unwrap(args), **{key: _unwrap(arg) for key, arg in kwargs.items()}))
+            return method
+        return self._wrap(value)
+
+    def __setattr__(self, name, value):
+        setattr(object.__getattribute__(self, "_obj"), name, _unwrap(value))
+        self._invalidate(MUTATING_PROPERTIES.get(name, (name,)))
+
+    def __call__(self, *args, **kwargs):
+        # default member, ex: `app.Workbooks("Book1")`
+        obj = object.__getattribute__(self, "_obj")
+        return self._wrap(obj(*_unwrap(args), **{key: _unwrap(arg) for key, arg in kwargs.items()}))
+
+    def __iter__(self):
+        for item in object.__getattribute__(self, "_obj"):
+            yield self._wrap(item)
+
+    def __len__(self):
+        return len(object.__getattribute__(self, "_obj"))
+
+    def __bool__(self):
+        # like pywin32's own CDispatch, so that `if app:` doesn't fall through to `__len__` and ask for a `Count` property
+        return True
+
+    def __eq__(self, other):
+        return object.__getattribute__(self, "_obj") == _unwrap(other)
+
+    def __hash__(self):
+        return hash(_identity(object.__getattribute__(self, "_obj")))
+
+    def __repr__(self):
+        return f"<CachingDispatch {object.__getattribute__(self, '_obj')!r}>"
@@ -0,0 +1,153 @@
+# Copyright (c) 2020 safexl
+import random
+import threading
+import time
+import pywintypes
+import safexl.metrics as metrics
+
+__all__ = [
+    'RetryPolicy',
+    'RetryingDispatch',
+]
+
+# "Call was rejected by callee." - Excel is busy (a modal dialog, a cell in edit mode, a long recalc, etc.)
+RPC_E_CALL_REJECTED = -2147418111  # 0x80010001
+# "The message filter indicated that the application is busy."
+RPC_E_SERVERCALL_RETRYLATER = -2147417846  # 0x8001010A
+RETRYABLE_HRESULTS = frozenset((RPC_E_CALL_REJECTED, RPC_E_SERVERCALL_RETRYLATER))
+
+COM_CALL_RETRIES = metrics.Counter(
+    "safexl_com_call_retries_total", "COM calls retried because Excel rejected them as busy, by HRESULT.",
+    labelnames=("hresult",), registry=metrics.REGISTRY)
+
+
+class RetryPolicy:
+    """
+    Bounded exponential backoff with jitter for COM calls that Excel rejects while it is busy.
+    A rejected call was never executed by Excel, so retrying it is safe even for methods with side effects.
+    """
+    def __init__(self, deadline: float = 30.0, base_delay: float = 0.05, max_delay: float = 2.0, jitter: float = 0.5):
+        """
+        :param deadline: Optional float - Defaults to 30. Seconds after the first rejection of a call to give up and
+                                          let the `pywintypes.com_error` propagate as usual
+        :param base_delay: Optional float - Defaults to 0.05. Seconds to wait before the first retry, doubled each retry after
+        :param max_delay: Optional float - Defaults to 2. Upper bound on the wait between any two retries
+        :param jitter: Optional float - Defaults to 0.5. Fraction of each wait that is randomized, so that many workers
+                                        hitting the same busy instance don't all retry in lockstep
+        """
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retries = 0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def delay(self, attempt: int) -> float:
+        """
+        :param attempt: int - Number of retries already made for this call
+        :return: float - Seconds to sleep before the next retry
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay * (1 - self.jitter * random.random())
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls `func(*args, **kwargs)`, retrying while Excel rejects it as busy and the deadline has not passed
+        :return: Whatever `func` returns
+        """
+        started = None
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except pywintypes.com_error as e:
+                if e.hresult not in RETRYABLE_HRESULTS:
+                    raise
+                now = time.monotonic()
+                if started is None:
+                    started = now
+                remaining = self.deadline - (now - started)
+                if remaining <= 0:
+                    with self._lock:
+                        self.gave_up += 1
+                    raise
+                with self._lock:
+                    self.retries += 1
+                COM_CALL_RETRIES.inc(hresult=metrics.format_hresult(e.hresult))
+                time.sleep(min(self.delay(attempt), remaining))
+                attempt += 1
+
+
+def _unwrap(value):
+    if isinstance(value, RetryingDispatch):
+        return object.__getattribute__(value, "_obj")
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+
+def _wrap(value, policy: RetryPolicy):
+    if hasattr(value, "_oleobj_"):
+        return RetryingDispatch(value, policy)
+    if callable(value):
+        # bound methods of a Dispatch object, ex: `app.Workbooks.Add`
+        def retrying_method(*args, **kwargs):
+            args = [_unwrap(arg) for arg in args]
+            kwargs = {key: _unwrap(arg) for key, arg in kwargs.items()}
+            return _wrap(policy.call(value, *args, **kwargs), policy)
+        return retrying_method
+    return value
+
+
+class RetryingDispatch:
+    """
+    Thin proxy around a `win32com.client.Dispatch` object that sends every attribute get, attribute set and
+    method call through a `RetryPolicy`. Any COM object returned from the proxy is wrapped in turn, so
+    `app.Workbooks.Add().ActiveSheet.Range("A1").Value = 1` is retried at every step.
+    """
+    def __init__(self, obj, policy: RetryPolicy):
+        object.__setattr__(self, "_obj", obj)
+        object.__setattr__(self, "_policy", policy)
+
+    def __getattr__(self, name):
+        policy = object.__getattribute__(self, "_policy")
+        return _wrap(policy.call(getattr, object.__getattribute__(self, "_obj"), name), policy)
+
+    def __setattr__(self, name, value):
+        policy = object.__getattribute__(self, "_policy")
+        policy.call(setattr, object.__getattribute__(self, "_obj"), name, _unwrap(value))
+
+    def __call__(self, *args, **kwargs):
+        # default member, ex: `wb.Windows(1)` or `app.Workbooks("Book1")`
+        policy = object.__getattribute__(self, "_policy")
+        args = [_unwrap(arg) for arg in args]
+        kwargs = {key: _unwrap(arg) for key, arg in kwargs.items()}
+        return _wrap(policy.call(object.__getattribute__(self, "_obj"), *args, **kwargs), policy)
+
+    def __iter__(self):
+        policy = object.__getattribute__(self, "_policy")
+        iterator = policy.call(iter, object.__getattribute__(self, "_obj"))
+        while True:
+            try:
+                item = policy.call(next, iterator)
+            except StopIteration:
+                return
+            yield _wrap(item, policy)
+
+    def __len__(self):
+        return object.__getattribute__(self, "_policy").call(len, object.__getattribute__(self, "_obj"))
+
+    def __bool__(self):
+        # like pywin32's own CDispatch, so that `if app:` doesn't fall through to `__len__` and ask for a `Count` property
+        return True
+
+    def __eq__(self, other):
+        return object.__getattribute__(self, "_obj") == _unwrap(other)
+
+    def __hash__(self):
+        obj = object.__getattribute__(self, "_obj")
+        return hash(getattr(obj, "_oleobj_", obj))
+
+    def __repr__(self):
+        return f"<RetryingDispatch {object.__getattribute__(self, '_obj')!r}>"
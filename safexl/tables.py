@@ -0,0 +1,129 @@
+# Copyright (c) 2020 safexl
+import safexl.address as address
+import safexl.xl_constants as xl_constants
+from safexl.transfer import write_range, _as_rows
+
+__all__ = [
+    'list_tables',
+    'read_table',
+    'append_rows',
+    'replace_rows',
+]
+
+
+def list_tables(workbook) -> dict:
+    """
+    :param workbook: Workbook COM object
+    :return: dict - Table name -> ListObject COM object, for every table (`Insert > Table`) on every worksheet, in sheet order
+    """
+    tables = {}
+    for worksheet in workbook.Worksheets:
+        for table in worksheet.ListObjects:
+            tables[table.Name] = table
+    return tables
+
+
+def _rows(values) -> tuple:
+    if not isinstance(values, tuple):
+        # a single cell comes back as a bare value, ex: the header of a one column table
+        return ((values,),)
+    return values
+
+
+def _column_names(table, header_values=None) -> list:
+    if not table.ShowHeaders:
+        return [column.Name for column in table.ListColumns]
+    if header_values is None:
+        header_values = _rows(table.HeaderRowRange.Value)
+    return list(header_values[0])
+
+
+def read_table(table) -> dict:
+    """
+    Reads a table's header and data rows in a single round trip
+    :param table: ListObject COM object, ex: from `list_tables(wb)["Sales"]` or `ws.ListObjects("Sales")`
+    :return: dict - Column name -> list of values, one per data row, in column order. The totals row is left out
+    """
+    values = _rows(table.Range.Value)
+    row_count = table.ListRows.Count
+    if table.ShowHeaders:
+        names, body = _column_names(table, values[:1]), values[1:1 + row_count]
+    else:
+        names, body = _column_names(table), values[:row_count]
+    columns = list(zip(*body)) if body else [()] * len(names)
+    return {name: list(column) for name, column in zip(names, columns)}
+
+
+def _blocks(table, data, width: int) -> list:
+    """
+    :return: list - (column offset, rows) of each block of neighbouring columns to write
+    """
+    if not hasattr(data, "items"):
+        rows = _as_rows(data)
+        if rows and any(len(row) != width for row in rows):
+            raise ValueError(f"Rows must have one value for each of the table's {width} columns")
+        return [(0, rows)] if rows else []
+
+    positions = {name: i for i, name in enumerate(_column_names(table))}
+    unknown = [name for name in data if name not in positions]
+    if unknown:
+        raise KeyError(f"Not columns of table {table.Name!r}: {unknown}")
+    columns = {positions[name]: list(values) for name, values in data.items()}
+    if len({len(values) for values in columns.values()}) > 1:
+        raise ValueError("All columns must be the same length")
+    if not columns or not next(iter(columns.values())):
+        return []
+    blocks = []
+    # neighbouring columns are written together, columns left out (ex: calculated columns) are not touched
+    for _, first, _, last in address.coalesce((1, position) for position in columns):
+        blocks.append((first, list(zip(*(columns[position] for position in range(first, last + 1))))))
+    return blocks
+
+
+def append_rows(table, data) -> str:
+    """
+    Adds rows to the bottom of a table, growing the table once for all of them rather than row by row. Cells below the
+    table are moved down to make room, as when adding a row to a table by hand, rather than being taken into it.
+    :param table: ListObject COM object
+    :param data: Rows of values in the table's column order, as a list of lists (or tuples), numpy array, etc.
+                 or a dict of column name -> list of values, like `read_table` returns. With a dict, columns left out are
+                 not written to, so calculated columns keep their formulas.
+    :return: str - A1 style address of the rows added, or an empty string if there were none
+    """
+    rng = table.Range
+    top, first_column, width = rng.Row, rng.Column, rng.Columns.Count
+    first_row = top + 1 if table.ShowHeaders else top
+    start = first_row + table.ListRows.Count
+    blocks = _blocks(table, data, width)
+    if not blocks:
+        return ""
+    last = start + len(blocks[0][1]) - 1
+    new_rows = address.area(start, first_column, last, first_column + width - 1)
+
+    worksheet = table.Parent
+    show_totals = table.ShowTotals
+    if show_totals:
+        # the totals row would otherwise sit where the new rows go, it comes back below them afterwards
+        table.ShowTotals = False
+    try:
+        # `Resize` alone would take in, and the writes below overwrite, whatever is below the table
+        worksheet.Range(new_rows).Insert(Shift=xl_constants.xlShiftDown)
+        table.Resize(worksheet.Range(address.area(top, first_column, last, first_column + width - 1)))
+        for offset, rows in blocks:
+            write_range(worksheet, rows, (start, first_column + offset))
+    finally:
+        if show_totals:
+            table.ShowTotals = True
+    return new_rows
+
+
+def replace_rows(table, data) -> str:
+    """
+    Replaces all of a table's data rows, keeping its header, formatting and totals row
+    :param table: ListObject COM object
+    :param data: Rows of values, or a dict of column name -> list of values, as for `append_rows`
+    :return: str - A1 style address of the new rows, or an empty string if there were none
+    """
+    if table.ListRows.Count:
+        table.DataBodyRange.Delete()
+    return append_rows(table, data)
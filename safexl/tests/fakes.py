@@ -0,0 +1,169 @@
+# Copyright (c) 2020 safexl
+import safexl.address
+
+
+class FakeCount:
+    def __init__(self, count):
+        self.Count = count
+
+
+class FakeFormat:
+    """
+    Stand-in for objects like `Range.Font` or `Range.Interior`, which only hold properties
+    """
+    pass
+
+
+class FakeRange:
+    """
+    Stand-in for a Range COM object over one rectangle of `sheet`, or several with a multi-area address like 'A1:B2,D4'.
+    Reading `Value` or `Value2` reads from `sheet.cells` and writing them stores into it, setting any other property is
+    logged to `sheet.log`.
+    """
+    def __init__(self, sheet, address: str):
+        object.__setattr__(self, "sheet", sheet)
+        object.__setattr__(self, "address", address)
+        object.__setattr__(self, "Font", FakeFormat())
+        object.__setattr__(self, "Interior", FakeFormat())
+        if "," not in address:
+            first_row, first_column, last_row, last_column = safexl.address.parse(address)
+            object.__setattr__(self, "bounds", (first_row, first_column, last_row, last_column))
+            object.__setattr__(self, "Row", first_row)
+            object.__setattr__(self, "Column", first_column)
+            object.__setattr__(self, "Rows", FakeCount(last_row - first_row + 1))
+            object.__setattr__(self, "Columns", FakeCount(last_column - first_column + 1))
+            object.__setattr__(self, "CountLarge", self.Rows.Count * self.Columns.Count)
+
+    def _read(self):
+        self.sheet.reads.append(self.address)
+        first_row, first_column, last_row, last_column = self.bounds
+        values = tuple(tuple(self.sheet.cells.get((row, column)) for column in range(first_column, last_column + 1))
+                       for row in range(first_row, last_row + 1))
+        # a single cell comes back as a bare value, like it does from Excel
+        return values[0][0] if self.CountLarge == 1 else values
+
+    def _write(self, value):
+        self.sheet.writes.append((self.address, value))
+        first_row, first_column, last_row, last_column = self.bounds
+        # a bare value fills every cell of the range, like it does in Excel
+        nested = isinstance(value, (tuple, list))
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                cell = value[row - first_row][column - first_column] if nested else value
+                if cell is None:
+                    self.sheet.cells.pop((row, column), None)
+                else:
+                    self.sheet.cells[row, column] = cell
+
+    Value = Value2 = property(_read, _write)
+
+    def SpecialCells(self, cell_type):
+        import pywintypes
+        import safexl.xl_constants
+        if self.sheet.protected:
+            raise pywintypes.com_error("SpecialCells method of Range class failed")
+        first_row, first_column, last_row, last_column = self.bounds
+        formulas = cell_type == safexl.xl_constants.xlCellTypeFormulas
+        matches = [(row, column) for row, column in self.sheet.cells
+                   if first_row <= row <= last_row and first_column <= column <= last_column
+                   and ((row, column) in self.sheet.formulas) == formulas]
+        if not matches:
+            # Excel raises rather than returning nothing
+            raise pywintypes.com_error("No cells were found.")
+        special = FakeRange(self.sheet, self.address)
+        object.__setattr__(special, "Areas", [FakeRange(self.sheet, safexl.address.area(*rectangle))
+                                              for rectangle in safexl.address.coalesce(matches)])
+        return special
+
+    def Insert(self, Shift):
+        import safexl.xl_constants
+        assert Shift == safexl.xl_constants.xlShiftDown
+        self.sheet.inserts.append(self.address)
+        first_row, first_column, last_row, last_column = self.bounds
+        moved = {(row, column): self.sheet.cells.pop((row, column)) for row, column in list(self.sheet.cells)
+                 if row >= first_row and first_column <= column <= last_column}
+        for (row, column), value in moved.items():
+            self.sheet.cells[row + last_row - first_row + 1, column] = value
+
+    def ClearContents(self):
+        self.sheet.clears.append(self.address)
+        first_row, first_column, last_row, last_column = self.bounds
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                self.sheet.cells.pop((row, column), None)
+
+    def __setattr__(self, name, value):
+        if name not in ("Value", "Value2"):
+            self.sheet.log.append((self.address, name, value))
+        object.__setattr__(self, name, value)
+
+
+class FakeWorksheet:
+    """
+    Stand-in for a Worksheet COM object holding a dict of (row, column) -> value, that records every `Range()` made on it,
+    and every block of values read from, written to, cleared on or inserted into it
+    """
+    def __init__(self, cells: dict = None, formulas=(), protected: bool = False):
+        """
+        :param cells: Optional dict - (row, column) -> value
+        :param formulas: Optional iterable - (row, column) of the cells that hold formulas, for `SpecialCells`
+        :param protected: Optional bool - Defaults to `False`. `True` makes `SpecialCells` fail, as on a protected sheet
+        """
+        self.cells = dict(cells or {})
+        self.formulas = set(formulas)
+        self.protected = protected
+        self.Application = self
+        self.WorksheetFunction = self
+        self.ListObjects = []
+        self.ranges = []
+        self.reads = []
+        self.writes = []
+        self.clears = []
+        self.inserts = []
+        self.log = []
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> 'FakeWorksheet':
+        """
+        :param columns: dict - Column letter -> values from row 1 down
+        """
+        return cls({(row, safexl.address.column_number(letter)): value
+                    for letter, values in columns.items() for row, value in enumerate(values, 1)})
+
+    def CountA(self, rng):
+        first_row, first_column, last_row, last_column = rng.bounds
+        return sum(first_row <= row <= last_row and first_column <= column <= last_column for row, column in self.cells)
+
+    @property
+    def UsedRange(self):
+        rows = [row for row, _ in self.cells] or [1]
+        columns = [column for _, column in self.cells] or [1]
+        return FakeRange(self, safexl.address.area(min(rows), min(columns), max(rows), max(columns)))
+
+    def Range(self, address):
+        rng = FakeRange(self, address)
+        self.ranges.append(rng)
+        return rng
+
+
+class FakeConnectionPoint:
+    """
+    Stand-in for both the Application's `IConnectionPointContainer` and its `AppEvents` connection point
+    """
+    def __init__(self):
+        self.sink = None
+        self.unadvised = []
+
+    def QueryInterface(self, iid):
+        return self
+
+    def FindConnectionPoint(self, iid):
+        self.iid = iid
+        return self
+
+    def Advise(self, sink):
+        self.sink = sink
+        return 7
+
+    def Unadvise(self, cookie):
+        self.unadvised.append(cookie)
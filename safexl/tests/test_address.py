@@ -0,0 +1,89 @@
+# Copyright (c) 2020 safexl
+import unittest
+import safexl
+
+
+class test_column_letters(unittest.TestCase):
+    def test_column_letter(self):
+        self.assertEqual("A", safexl.address.column_letter(1))
+        self.assertEqual("Z", safexl.address.column_letter(26))
+        self.assertEqual("AA", safexl.address.column_letter(27))
+        self.assertEqual("ZZ", safexl.address.column_letter(702))
+        self.assertEqual("AAA", safexl.address.column_letter(703))
+        self.assertEqual("XFD", safexl.address.column_letter(16384))
+        with self.assertRaises(ValueError):
+            safexl.address.column_letter(16385)
+        with self.assertRaises(ValueError):
+            safexl.address.column_letter(0)
+
+    def test_round_trip_for_every_column(self):
+        for column in range(1, safexl.address.MAX_COLUMN + 1):
+            self.assertEqual(column, safexl.address.column_number(safexl.address.column_letter(column)))
+
+    def test_column_number(self):
+        self.assertEqual(28, safexl.address.column_number("ab"))
+        with self.assertRaises(ValueError):
+            safexl.address.column_number("XFE")
+
+
+class test_addresses(unittest.TestCase):
+    def test_a1(self):
+        self.assertEqual("C2", safexl.address.a1(2, 3))
+        self.assertEqual("$C$2", safexl.address.a1(2, 3, absolute=True))
+        with self.assertRaises(ValueError):
+            safexl.address.a1(0, 3)
+
+    def test_to_a1(self):
+        self.assertEqual(["A1", "C2", "XFD1048576"], safexl.address.to_a1([1, 2, 1048576], [1, 3, 16384]))
+        self.assertEqual([], safexl.address.to_a1([], []))
+
+    def test_area(self):
+        self.assertEqual("B2:C5", safexl.address.area(2, 2, 5, 3))
+        self.assertEqual("B2", safexl.address.area(2, 2, 2, 2))
+
+    def test_parse(self):
+        self.assertEqual((2, 2, 2, 2), safexl.address.parse("B2"))
+        self.assertEqual((2, 2, 5, 3), safexl.address.parse("$b$2:C5"))
+        self.assertEqual((2, 2, 5, 3), safexl.address.parse("C5:B2"))
+        self.assertEqual((1, 1, safexl.address.MAX_ROW, 3), safexl.address.parse("$C:$A"))
+        self.assertEqual((2, 1, 4, safexl.address.MAX_COLUMN), safexl.address.parse("2:4"))
+        for bad_address in ("", "B", "2", "2B", "B2:", "B0", "A:3", "0:4"):
+            with self.assertRaises(ValueError):
+                safexl.address.parse(bad_address)
+
+
+class test_merge_areas(unittest.TestCase):
+    def test_touching_and_contained_areas(self):
+        areas = [(1, 1, 1, 3), (1, 4, 1, 4), (2, 1, 2, 4), (1, 2, 1, 2), (5, 5, 6, 6), (5, 5, 5, 5), (5, 5, 6, 6)]
+        self.assertEqual([(1, 1, 2, 4), (5, 5, 6, 6)], safexl.address.merge_areas(areas))
+
+    def test_partly_overlapping_areas_are_kept(self):
+        self.assertEqual([(1, 1, 2, 2), (2, 2, 3, 3)], safexl.address.merge_areas([(2, 2, 3, 3), (1, 1, 2, 2)]))
+        self.assertEqual([], safexl.address.merge_areas([]))
+
+
+class test_coalesce(unittest.TestCase):
+    def test_block_of_cells_becomes_one_area(self):
+        cells = [(row, column) for row in range(1, 11) for column in range(2, 5)]
+        self.assertEqual([(1, 2, 10, 4)], safexl.address.coalesce(reversed(cells)))
+
+    def test_scattered_cells(self):
+        cells = [(1, 1), (1, 2), (2, 1), (2, 2), (3, 1), (5, 5), (1, 4), (1, 4)]
+        areas = safexl.address.coalesce(cells)
+        self.assertEqual([(1, 1, 2, 2), (1, 4, 1, 4), (3, 1, 3, 1), (5, 5, 5, 5)], areas)
+
+    def test_gap_between_rows_starts_a_new_area(self):
+        self.assertEqual([(1, 1, 1, 1), (3, 1, 3, 1)], safexl.address.coalesce([(1, 1), (3, 1)]))
+
+
+class test_split_addresses(unittest.TestCase):
+    def test_under_limit(self):
+        self.assertEqual(["A1,C3:D4"], safexl.address.split_addresses(["A1", "C3:D4"]))
+
+    def test_over_limit(self):
+        addresses = safexl.address.to_a1(range(1, 1001), [1] * 1000)
+        chunks = safexl.address.split_addresses(addresses)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 255)
+        self.assertEqual(addresses, ",".join(chunks).split(","))
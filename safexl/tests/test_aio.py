@@ -0,0 +1,97 @@
+# Copyright (c) 2020 safexl
+import asyncio
+import unittest
+import safexl
+
+
+class test_async_application(unittest.TestCase):
+    def setUp(self):
+        safexl.kill_all_instances_of_excel()
+        self.assertFalse(safexl.is_excel_open())
+
+    def tearDown(self):
+        safexl.kill_all_instances_of_excel()
+        self.assertFalse(safexl.is_excel_open())
+
+    def test_no_error_kill_after(self):
+        async def main():
+            async with safexl.async_application(kill_after=True) as app:
+                ws = app.Workbooks.Add().ActiveSheet
+                ws.Range("A1").Value = 555
+                self.assertEqual(555, await ws.Range("A1").Value)
+                self.assertEqual("Sheet1", await ws.Name)
+                self.assertTrue(safexl.is_excel_open())
+
+        asyncio.run(main())
+        self.assertFalse(safexl.is_excel_open())
+
+    def test_many_calls_can_be_queued_and_gathered(self):
+        async def main():
+            async with safexl.async_application(kill_after=True) as app:
+                ws = app.Workbooks.Add().ActiveSheet
+                for i in range(1, 51):
+                    ws.Range(f"A{i}").Value = i
+                values = await asyncio.gather(*[ws.Range(f"A{i}").Value for i in range(1, 51)])
+                self.assertEqual(list(range(1, 51)), values)
+
+        asyncio.run(main())
+
+    def test_iterating_a_collection(self):
+        async def main():
+            async with safexl.async_application(kill_after=True) as app:
+                await app.Workbooks.Add()
+                await app.Workbooks.Add()
+                names = [await wb.Name async for wb in app.Workbooks]
+                self.assertEqual(["Book1", "Book2"], names)
+
+        asyncio.run(main())
+
+    def test_error_cleans_up_like_application(self):
+        async def main():
+            async with safexl.async_application(kill_after=False) as app:
+                ws = app.Workbooks.Add().ActiveSheet
+                # None of the following characters are allowed in sheet names
+                # ["\\", "/", "*", "[", "]", ":", "?"]
+                ws.Name = "a*b*c"
+                await safexl.aio.drain(app)
+
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            asyncio.run(main())
+        self.assertFalse(safexl.is_excel_open())
+
+    def test_error_from_a_call_that_is_not_awaited_is_raised(self):
+        async def main():
+            async with safexl.async_application(kill_after=False) as app:
+                app.Workbooks.Add()
+                app.Workbooks.Open(r"C:\does\not\exist.xlsx")
+
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            asyncio.run(main())
+        self.assertFalse(safexl.is_excel_open())
+
+    def test_error_from_an_awaited_call_is_raised_once(self):
+        async def main():
+            async with safexl.async_application(kill_after=True) as app:
+                with self.assertRaises(Exception):
+                    await app.Workbooks.Open(r"C:\does\not\exist.xlsx")
+                await safexl.aio.drain(app)
+
+        asyncio.run(main())
+
+    def test_event_loop_is_not_blocked(self):
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            task = asyncio.ensure_future(ticker())
+            async with safexl.async_application(kill_after=True) as app:
+                wb = await app.Workbooks.Add()
+                await wb.ActiveSheet.Range("A1:Z1000").Value
+            task.cancel()
+
+        asyncio.run(main())
+        self.assertGreater(len(ticks), 1)
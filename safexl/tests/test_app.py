@@ -1,5 +1,6 @@
 # Copyright (c) 2020 safexl
 import unittest
+from unittest import mock
 import safexl
 
 
@@ -137,3 +138,114 @@ class test_app_when_excel_is_running_at_onset(unittest.TestCase):
                 # ["\\", "/", "*", "[", "]", ":", "?"]
         self.assertEqual(len(safexl.toolkit.excel_open_files()), current_openfile_count)
         self.assertTrue(safexl.is_excel_open())
+
+
+class test_com_apartment(unittest.TestCase):
+    def tearDown(self):
+        safexl.kill_all_instances_of_excel()
+        self.assertFalse(safexl.is_excel_open())
+
+    def test_nested_sessions_do_not_tear_down_outer_session(self):
+        with safexl.application(kill_after=True) as outer_app:
+            wb = outer_app.Workbooks.Add()
+            with safexl.application(kill_after=False) as inner_app:
+                self.assertEqual(2, safexl.toolkit._com_state.count)
+                self.assertEqual("Microsoft Excel", inner_app.Name)
+            self.assertEqual(1, safexl.toolkit._com_state.count)
+            # would raise a pywintypes.com_error if COM had been uninitialized by the inner block
+            self.assertEqual("Book1", wb.Name)
+        self.assertEqual(0, safexl.toolkit._com_state.count)
+
+    def test_apartment_is_kept_alive_across_sessions(self):
+        with safexl.com_apartment():
+            for i in range(3):
+                with safexl.application(kill_after=False) as app:
+                    self.assertEqual(2, safexl.toolkit._com_state.count)
+                    app.Workbooks.Add()
+                self.assertEqual(1, safexl.toolkit._com_state.count)
+        self.assertEqual(0, safexl.toolkit._com_state.count)
+
+    def test_count_is_restored_after_an_error(self):
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            with safexl.application(kill_after=True) as app:
+                raise ValueError("oops")
+        self.assertEqual(0, safexl.toolkit._com_state.count)
+
+    def test_count_is_restored_when_dispatch_fails(self):
+        failed = safexl.metrics.SESSIONS_FAILED.value()
+        with mock.patch("win32com.client.Dispatch", side_effect=RuntimeError("no Excel")):
+            with self.assertRaises(RuntimeError):
+                with safexl.application(kill_after=True):
+                    pass
+        self.assertEqual(0, safexl.toolkit._com_state.count)
+        # a session that never got going is still a failed one
+        self.assertEqual(failed + 1, safexl.metrics.SESSIONS_FAILED.value())
+
+
+class test_keep_alive(unittest.TestCase):
+    def setUp(self):
+        safexl.kill_all_instances_of_excel()
+        self.assertFalse(safexl.is_excel_open())
+
+    def tearDown(self):
+        safexl.release_application()
+        safexl.kill_all_instances_of_excel()
+        self.assertFalse(safexl.is_excel_open())
+
+    def test_application_object_is_reused(self):
+        with safexl.application(kill_after=False, keep_alive=True) as app1:
+            app1.Workbooks.Add()
+        with safexl.application(kill_after=False, keep_alive=True) as app2:
+            self.assertIs(app1, app2)
+            self.assertEqual(1, len(safexl.toolkit._session_cache.workbooks))
+        self.assertIs(app1, safexl.toolkit._session_cache.app)
+
+    def test_cleanup_still_applies_per_block(self):
+        with safexl.application(kill_after=False, keep_alive=True) as app:
+            wb1 = app.Workbooks.Add()
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            with safexl.application(kill_after=False, keep_alive=True) as app:
+                wb2 = app.Workbooks.Add()
+                self.assertEqual(2, app.Workbooks.Count)
+                raise ValueError("oops")
+        self.assertTrue(safexl.is_excel_open())
+        with safexl.application(kill_after=False, keep_alive=True) as app:
+            self.assertEqual(1, app.Workbooks.Count)
+            self.assertEqual(wb1.Name, app.Workbooks(1).Name)
+
+    def test_stale_snapshot_is_refreshed(self):
+        with safexl.application(kill_after=False, keep_alive=True) as app:
+            app.Workbooks.Add()
+        # a workbook opened outside of any `with` block
+        safexl.toolkit._session_cache.app.Workbooks.Add()
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            with safexl.application(kill_after=False, keep_alive=True) as app:
+                app.Workbooks.Add()
+                raise ValueError("oops")
+        with safexl.application(kill_after=False, keep_alive=True) as app:
+            self.assertEqual(2, app.Workbooks.Count)
+
+    def test_workbook_swapped_by_hand_is_not_closed(self):
+        with safexl.application(kill_after=False, keep_alive=True) as app:
+            app.Workbooks.Add()
+            app.Workbooks.Add()
+        # one workbook closed and another opened outside of any `with` block, leaving the count unchanged
+        kept_app = safexl.toolkit._session_cache.app
+        kept_app.Workbooks(1).Close(SaveChanges=False)
+        by_hand = kept_app.Workbooks.Add()
+        by_hand_name = by_hand.Name
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            with safexl.application(kill_after=False, keep_alive=True) as app:
+                raise ValueError("oops")
+        with safexl.application(kill_after=False, keep_alive=True) as app:
+            self.assertEqual(2, app.Workbooks.Count)
+            self.assertEqual(by_hand_name, app.Workbooks(by_hand_name).Name)
+
+    def test_release_application(self):
+        with safexl.application(kill_after=False, keep_alive=True) as app:
+            app.Workbooks.Add()
+        self.assertEqual(1, safexl.toolkit._com_state.count)
+        safexl.release_application()
+        self.assertIsNone(safexl.toolkit._session_cache.app)
+        self.assertEqual(0, safexl.toolkit._com_state.count)
+        self.assertTrue(safexl.is_excel_open())
@@ -1,6 +1,7 @@
 # Copyright (c) 2020 safexl
 import unittest
 import tempfile
+import threading
 import pythoncom
 import pywintypes
 import win32com.client
@@ -115,6 +116,65 @@ class test_new_workbooks(unittest.TestCase):
         pythoncom.CoUninitialize()
 
 
+class test_workbook_snapshot(unittest.TestCase):
+    def test_new_workbook_is_found_without_reading_paths(self):
+        pythoncom.CoInitialize()
+        application = win32com.client.Dispatch("Excel.Application")
+
+        wb1 = application.Workbooks.Add()
+        snapshot = safexl.WorkbookSnapshot.take(application)
+        self.assertEqual(1, snapshot.count)
+        self.assertIn(wb1, snapshot)
+
+        wb2 = application.Workbooks.Add()
+        new_workbook_list = safexl.toolkit.new_workbooks(application, snapshot)
+        self.assertEqual([wb2], new_workbook_list)
+        # the paths were never needed, as wb1 was still open
+        self.assertIsNone(snapshot._full_names)
+
+        safexl.kill_all_instances_of_excel(application)
+        del application
+        pythoncom.CoUninitialize()
+
+    def test_reopened_workbook_is_not_new(self):
+        pythoncom.CoInitialize()
+        application = win32com.client.Dispatch("Excel.Application")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            save_filepath = f"{temp_dir}\\temporary.xlsx"
+            application.DisplayAlerts = False
+            wb1 = application.Workbooks.Add()
+            wb1.SaveAs(save_filepath)
+            snapshot = safexl.WorkbookSnapshot.take(application)
+            # paths can only be read from workbooks that are still open, so expand them before closing wb1
+            self.assertIn(save_filepath, snapshot.full_names)
+            wb1.Close()
+            wb1_reopened = application.Workbooks.Open(save_filepath)
+            wb2 = application.Workbooks.Add()
+
+            new_workbook_list = safexl.toolkit.new_workbooks(application, snapshot)
+            self.assertEqual([wb2], new_workbook_list)
+
+            wb1_reopened.Close()
+            application.DisplayAlerts = True
+
+        safexl.kill_all_instances_of_excel(application)
+        del application
+        pythoncom.CoUninitialize()
+
+    def test_workbooks_currently_open_matches_plain_iteration(self):
+        pythoncom.CoInitialize()
+        application = win32com.client.Dispatch("Excel.Application")
+
+        for i in range(10):
+            application.Workbooks.Add()
+        self.assertEqual([wb for wb in application.Workbooks], safexl.workbooks_currently_open(application))
+
+        safexl.kill_all_instances_of_excel(application)
+        del application
+        pythoncom.CoUninitialize()
+
+
 class test_see_excel(unittest.TestCase):
     def test_ability_to_make_multiple_windows_visible(self):
         pythoncom.CoInitialize()
@@ -170,6 +230,29 @@ class test_see_excel(unittest.TestCase):
         del application
         pythoncom.CoUninitialize()
 
+    def test_many_workbooks_and_screen_updating_is_restored(self):
+        pythoncom.CoInitialize()
+        application = win32com.client.Dispatch("Excel.Application")
+
+        wbs = [application.Workbooks.Add() for i in range(20)]
+        self.assertTrue(application.ScreenUpdating)
+        safexl.see_excel(wbs, safexl.xl_constants.xlMinimized)
+        self.assertTrue(application.Visible)
+        self.assertTrue(application.ScreenUpdating)
+        for wb in wbs:
+            self.assertEqual(safexl.xl_constants.xlMinimized, wb.Windows(1).WindowState)
+
+        # second call finds every window already in the target state
+        safexl.see_excel(wbs, safexl.xl_constants.xlMinimized)
+        self.assertTrue(application.ScreenUpdating)
+
+        safexl.kill_all_instances_of_excel(application)
+        del application
+        pythoncom.CoUninitialize()
+
+    def test_no_workbooks_is_a_no_op(self):
+        safexl.see_excel([], safexl.xl_constants.xlMaximized)
+
     def test_PERSONAL_workbook_is_not_affected(self):
         with safexl.application(kill_after=True) as app:
             personal_wb_paths = [wb for wb in app.Workbooks if "PERSONAL.XLSB" in wb.FullName]
@@ -369,3 +452,106 @@ class test_worksheet_name_sanitization(unittest.TestCase):
         expectation = "a"
         result = safexl.worksheet_name_sanitization(input_name)
         self.assertEqual(expectation, result)
+
+
+class test_load_addins(unittest.TestCase):
+    def test_warm_instance_is_skipped(self):
+        pythoncom.CoInitialize()
+        application = win32com.client.Dispatch("Excel.Application")
+
+        safexl.load_addins(application)
+        self.assertIn(application.Hwnd, safexl.toolkit._addin_cache)
+        # everything installed was loaded by the first call, so there is nothing left to reload
+        self.assertEqual([], safexl.load_addins(application))
+        installed = sum(1 for add_in in application.AddIns if add_in.Installed)
+        self.assertEqual(installed, len(safexl.toolkit._addin_cache[application.Hwnd]["live"]))
+
+        safexl.kill_all_instances_of_excel(application)
+        self.assertEqual({}, safexl.toolkit._addin_cache)
+        del application
+        pythoncom.CoUninitialize()
+
+    def test_allowlist_limits_what_is_loaded(self):
+        pythoncom.CoInitialize()
+        application = win32com.client.Dispatch("Excel.Application")
+
+        self.assertEqual([], safexl.load_addins(application, ["not an add-in.xlam"]))
+        self.assertEqual(set(), safexl.toolkit._addin_cache[application.Hwnd]["live"])
+
+        safexl.kill_all_instances_of_excel(application)
+        del application
+        pythoncom.CoUninitialize()
+
+
+class test_open_workbook(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.save_filepath = f"{self.temp_dir.name}\\temporary.xlsx"
+        with safexl.application(kill_after=True) as app:
+            wb = app.Workbooks.Add()
+            wb.ActiveSheet.Range("A1").Value = 555
+            app.DisplayAlerts = False
+            wb.SaveAs(self.save_filepath)
+            wb.Close()
+
+    def tearDown(self):
+        safexl.kill_all_instances_of_excel()
+        self.temp_dir.cleanup()
+
+    def test_same_path_returns_cached_handle(self):
+        with safexl.application(kill_after=True) as app:
+            wb1 = safexl.open_workbook(app, self.save_filepath)
+            wb2 = safexl.open_workbook(app, self.save_filepath.upper())
+            self.assertEqual(wb1, wb2)
+            self.assertEqual(1, app.Workbooks.Count)
+            self.assertEqual(555, wb1.ActiveSheet.Range("A1").Value)
+            self.assertTrue(app.EnableEvents)
+
+    def test_read_only(self):
+        with safexl.application(kill_after=True) as app:
+            wb = safexl.open_workbook(app, self.save_filepath, read_only=True)
+            self.assertTrue(wb.ReadOnly)
+
+    def test_open_in_another_mode_raises(self):
+        with safexl.application(kill_after=True) as app:
+            safexl.open_workbook(app, self.save_filepath)
+            with self.assertRaises(safexl.toolkit.ExcelError):
+                safexl.open_workbook(app, self.save_filepath, read_only=True)
+            # also when the handle isn't cached yet, ex: on another thread
+            safexl.toolkit._workbook_handle_cache().clear()
+            with self.assertRaises(safexl.toolkit.ExcelError):
+                safexl.open_workbook(app, self.save_filepath, read_only=True)
+            self.assertFalse(safexl.open_workbook(app, self.save_filepath).ReadOnly)
+
+    def test_closed_workbook_is_reopened(self):
+        with safexl.application(kill_after=True) as app:
+            wb1 = safexl.open_workbook(app, self.save_filepath)
+            safexl.close_workbooks(app, [wb1])
+            self.assertEqual({}, safexl.toolkit._workbook_handle_cache())
+            wb2 = safexl.open_workbook(app, self.save_filepath)
+            self.assertEqual(1, app.Workbooks.Count)
+            self.assertEqual(555, wb2.ActiveSheet.Range("A1").Value)
+
+    def test_handles_are_not_shared_between_threads(self):
+        values = []
+
+        def open_in_thread():
+            with safexl.application(kill_after=False) as app:
+                values.append(safexl.open_workbook(app, self.save_filepath).ActiveSheet.Range("A1").Value)
+
+        with safexl.application(kill_after=True) as app:
+            safexl.open_workbook(app, self.save_filepath)
+            thread = threading.Thread(target=open_in_thread)
+            thread.start()
+            thread.join()
+        self.assertEqual([555], values)
+
+    def test_workbook_opened_in_block_is_cleaned_up_after_error(self):
+        with safexl.application(kill_after=False) as app:
+            app.Workbooks.Add()
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            with safexl.application(kill_after=False) as app:
+                safexl.open_workbook(app, self.save_filepath)
+                self.assertEqual(2, app.Workbooks.Count)
+                raise ValueError("oops")
+        self.assertNotIn(self.save_filepath, safexl.toolkit.excel_open_files())
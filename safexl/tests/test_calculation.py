@@ -0,0 +1,100 @@
+# Copyright (c) 2020 safexl
+import sys
+import unittest
+import safexl
+import safexl.calculation
+import safexl.events
+from safexl.tests.fakes import FakeConnectionPoint
+
+
+class FakeApplication:
+    """
+    Stand-in for an Application COM object, still calculating for the first `busy_polls` checks of `CalculationState`
+    """
+    def __init__(self, busy_polls: int):
+        self.busy_polls = busy_polls
+        self.Application = self
+        self.calculated = 0
+
+    @property
+    def CalculationState(self):
+        if self.busy_polls:
+            self.busy_polls -= 1
+            return safexl.xl_constants.xlCalculating
+        return safexl.xl_constants.xlDone
+
+    def Calculate(self):
+        self.calculated += 1
+
+
+class FakeTarget:
+    def __init__(self, app):
+        self.Application = app
+        self.calculated = 0
+
+    def Calculate(self):
+        self.calculated += 1
+
+
+class test_calculate(unittest.TestCase):
+    def test_only_targets_are_calculated(self):
+        app = FakeApplication(busy_polls=0)
+        targets = [FakeTarget(app), FakeTarget(app)]
+        report = safexl.calculate(*targets)
+        self.assertEqual([1, 1], [target.calculated for target in targets])
+        self.assertEqual(0, app.calculated)
+        self.assertEqual("targets", report.scope)
+        self.assertEqual("polling", report.completed_by)
+        self.assertEqual(1, report.polls)
+
+    def test_polling_backs_off(self):
+        app = FakeApplication(busy_polls=5)
+        report = safexl.calculate(app)
+        self.assertEqual("application", report.scope)
+        self.assertEqual(6, report.polls)
+        # 10 + 20 + 40 + 80 + 160ms between checks
+        self.assertGreaterEqual(report.seconds, 0.3)
+
+    def test_timeout(self):
+        with self.assertRaises(TimeoutError):
+            safexl.wait_for_calculation(FakeApplication(busy_polls=1000), timeout=0.1)
+        with self.assertRaises(ValueError):
+            safexl.calculate()
+
+    def test_events_connect_without_makepy(self):
+        app = FakeApplication(busy_polls=0)
+        app._oleobj_ = FakeConnectionPoint()
+        events = safexl.calculation._subscribe(app)
+        self.assertIsInstance(events, safexl.calculation._CalculationEvents)
+        self.assertEqual(safexl.events.IID_APP_EVENTS, app._oleobj_.iid)
+        self.assertIsNotNone(app._oleobj_.sink)
+        events.OnAfterCalculate()
+        self.assertTrue(events.calculated)
+        safexl.calculation._unsubscribe(events)
+        events.close()
+        self.assertEqual([7], app._oleobj_.unadvised)
+        # no makepy wrapper was generated for Excel along the way
+        self.assertFalse([name for name in sys.modules if name.startswith("win32com.gen_py.00020813")])
+
+    def test_without_events_waiting_polls(self):
+        self.assertIsNone(safexl.calculation._subscribe(FakeApplication(busy_polls=0)))
+
+    def test_metric(self):
+        before = safexl.calculation.CALCULATION_DURATION.count(scope="targets")
+        safexl.calculate(FakeTarget(FakeApplication(busy_polls=0)))
+        self.assertEqual(before + 1, safexl.calculation.CALCULATION_DURATION.count(scope="targets"))
+
+    def test_on_a_real_workbook(self):
+        with safexl.application(kill_after=True) as app:
+            wb = app.Workbooks.Add()
+            app.Calculation = safexl.xl_constants.xlCalculationManual
+            ws = wb.ActiveSheet
+            ws.Range("A1").Value = 1
+            ws.Range("B1").Formula = "=A1*2"
+            ws.Range("C1").Formula = "=A1*3"
+            ws.Range("A1").Value = 5
+            report = safexl.calculate(ws.Range("B1"))
+            self.assertEqual(10, ws.Range("B1").Value)
+            self.assertEqual(3, ws.Range("C1").Value)
+            self.assertEqual("targets", report.scope)
+            app.Calculation = safexl.xl_constants.xlCalculationAutomatic
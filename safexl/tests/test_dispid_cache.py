@@ -0,0 +1,67 @@
+# Copyright (c) 2020 safexl
+import os
+import tempfile
+import unittest
+import safexl
+
+
+class test_fast_dispatch(unittest.TestCase):
+    def setUp(self):
+        safexl.kill_all_instances_of_excel()
+
+    def tearDown(self):
+        safexl.kill_all_instances_of_excel()
+        self.assertFalse(safexl.is_excel_open())
+
+    def test_reads_and_writes_like_dispatch(self):
+        cache = safexl.DispidCache()
+        with safexl.application(kill_after=True) as app:
+            fast_app = safexl.fast_dispatch(app, cache)
+            self.assertEqual("Microsoft Excel", fast_app.Name)
+            wb = fast_app.Workbooks.Add()
+            ws = wb.ActiveSheet
+            ws.Range("A1").Value = 555
+            self.assertEqual(555, ws.Range("A1").Value)
+            self.assertEqual(555, app.ActiveSheet.Range("A1").Value)
+            ws.Range("A1").Copy(Destination=ws.Range("B2"))
+            self.assertEqual(555, ws.Cells(2, 2).Value)
+            self.assertEqual(["Book1"], [book.Name for book in fast_app.Workbooks])
+
+    def test_lookups_are_shared_across_objects(self):
+        cache = safexl.DispidCache()
+        with safexl.application(kill_after=True) as app:
+            ws = safexl.fast_dispatch(app, cache).Workbooks.Add().ActiveSheet
+            for i in range(1, 101):
+                ws.Range(f"A{i}").Value = i
+            misses = cache.misses
+            for i in range(1, 101):
+                self.assertEqual(i, ws.Range(f"A{i}").Value)
+            # every Range object after the first reused the cached DISPIDs
+            self.assertEqual(misses, cache.misses)
+            self.assertGreater(cache.hit_rate(), 0.9)
+
+    def test_cache_round_trips_to_disk(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "dispids.json")
+            cache = safexl.DispidCache(path)
+            with safexl.application(kill_after=True) as app:
+                safexl.fast_dispatch(app, cache).Workbooks.Add().ActiveSheet.Range("A1").Value = 1
+            cache.save()
+
+            warm_cache = safexl.DispidCache(path)
+            self.assertEqual(cache.members, warm_cache.members)
+            with safexl.application(kill_after=True) as app:
+                safexl.fast_dispatch(app, warm_cache).Workbooks.Add().ActiveSheet.Range("A1").Value = 1
+            self.assertEqual(0, warm_cache.misses)
+
+    def test_cache_outlives_excel(self):
+        cache = safexl.DispidCache()
+        with safexl.application(kill_after=True) as app:
+            fast_app = safexl.fast_dispatch(app, cache)
+            self.assertTrue(fast_app)
+            fast_app.Workbooks.Add().ActiveSheet.Range("A1").Value = 1
+        # a miss in the next instance must not touch anything left over from the one that was killed
+        with safexl.application(kill_after=True) as app:
+            ws = safexl.fast_dispatch(app, cache).Workbooks.Add().ActiveSheet
+            ws.Range("A1").Value = 1
+            self.assertEqual("$A$1", ws.Range("A1").Address)
@@ -0,0 +1,84 @@
+# Copyright (c) 2020 safexl
+import unittest
+import safexl
+from safexl.tests.fakes import FakeWorksheet
+
+
+class test_apply_formats(unittest.TestCase):
+    def test_same_format_is_set_once(self):
+        ws = FakeWorksheet()
+        safexl.apply_formats(ws, {f"A{i}": {"Font.Bold": True} for i in range(1, 11)})
+        self.assertEqual(["A1:A10"], [rng.address for rng in ws.ranges])
+        self.assertTrue(ws.ranges[0].Font.Bold)
+
+    def test_formats_on_the_same_cells_share_a_range(self):
+        ws = FakeWorksheet()
+        safexl.apply_formats(ws, {
+            "A1:D1": {"Font.Bold": True, "Interior.Color": safexl.colors.rgbRed},
+            (2, 1): {"NumberFormat": "0.00", "Font.Bold": True},
+        })
+        ranges = {rng.address: rng for rng in ws.ranges}
+        self.assertEqual(["A1:D1", "A1:D1,A2", "A2"], sorted(ranges))
+        self.assertTrue(ranges["A1:D1,A2"].Font.Bold)
+        self.assertEqual(safexl.colors.rgbRed, ranges["A1:D1"].Interior.Color)
+        self.assertEqual([("A2", "NumberFormat", "0.00")], ws.log)
+
+    def test_address_limit(self):
+        ws = FakeWorksheet()
+        # every other row, so that the cells can't be joined into a single area
+        safexl.apply_formats(ws, {(row, 3): {"Interior.Color": 0} for row in range(2, 2001, 2)})
+        self.assertGreater(len(ws.ranges), 1)
+        for rng in ws.ranges:
+            self.assertLessEqual(len(rng.address), 255)
+        cells = [address for rng in ws.ranges for address in rng.address.split(",")]
+        self.assertEqual([f"C{row}" for row in range(2, 2001, 2)], cells)
+
+    def test_color_names_and_tuples(self):
+        ws = FakeWorksheet()
+        safexl.apply_formats(ws, {
+            "A1": {"Interior.Color": "rgbRed"},
+            "B1": {"Font.Color": (0, 0, 255)},
+        })
+        self.assertEqual(safexl.colors.rgbRed, ws.ranges[0].Interior.Color)
+        self.assertEqual(safexl.colors.rgbBlue, ws.ranges[1].Font.Color)
+        with self.assertRaises(ValueError):
+            safexl.apply_formats(ws, {"A1": {"Interior.Color": "rgbNotAColor"}})
+
+    def test_later_target_wins_where_targets_overlap(self):
+        ws = FakeWorksheet()
+        safexl.apply_formats(ws, {
+            "A1:D1": {"NumberFormat": "0.00"},
+            "B1": {"NumberFormat": "@"},
+            "B1:C1": {"NumberFormat": "0.00"},
+        })
+        # 'B1:C1' can't be set along with 'A1:D1', or 'B1' would overwrite it
+        self.assertEqual([("A1:D1", "NumberFormat", "0.00"), ("B1", "NumberFormat", "@"),
+                          ("B1:C1", "NumberFormat", "0.00")], ws.log)
+
+    def test_targets_that_dont_overlap_are_still_gathered(self):
+        ws = FakeWorksheet()
+        # a checkerboard of two formats, where no cell gets both
+        safexl.apply_formats(ws, {(row, 1): {"NumberFormat": "@" if row % 2 else "0.00"} for row in range(1, 9)})
+        self.assertEqual([("A1,A3,A5,A7", "NumberFormat", "@"), ("A2,A4,A6,A8", "NumberFormat", "0.00")], ws.log)
+
+    def test_same_cells_are_not_gathered_past_a_later_value(self):
+        ws = FakeWorksheet()
+        safexl.apply_formats(ws, {
+            "A1": {"NumberFormat": "@"},
+            "A1:B1": {"NumberFormat": "0.00"},
+            (1, 1): {"NumberFormat": "@", "Font.Bold": True},
+        })
+        self.assertEqual([("A1", "NumberFormat", "@"), ("A1:B1", "NumberFormat", "0.00"), ("A1", "NumberFormat", "@")],
+                         ws.log)
+
+    def test_on_a_real_worksheet(self):
+        with safexl.application(kill_after=True) as app:
+            ws = app.Workbooks.Add().ActiveSheet
+            safexl.apply_formats(ws, {
+                "A1:B1": {"Font.Bold": True},
+                (3, 2): {"Interior.Color": "rgbRed", "NumberFormat": "0.00"},
+            })
+            self.assertTrue(ws.Range("B1").Font.Bold)
+            self.assertFalse(ws.Range("A2").Font.Bold)
+            self.assertEqual(safexl.colors.rgbRed, ws.Range("B3").Interior.Color)
+            self.assertEqual("0.00", ws.Range("B3").NumberFormat)
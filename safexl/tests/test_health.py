@@ -0,0 +1,119 @@
+# Copyright (c) 2020 safexl
+import os
+import subprocess
+import sys
+import threading
+import unittest
+import psutil
+import win32com.client
+import safexl
+
+
+def join_reapers():
+    # a recycled instance is waited on by a background thread, see `_recycle_cached`
+    for thread in threading.enumerate():
+        if thread.name == "safexl-reap":
+            thread.join()
+
+
+class test_instance_health(unittest.TestCase):
+    def setUp(self):
+        # any live process will do for scoring, no Excel required
+        self.health = safexl.InstanceHealth(os.getpid())
+
+    def test_fresh_instance_scores_low(self):
+        score, reason = self.health.score(safexl.HealthThresholds())
+        self.assertLess(score, 1.0)
+
+    def test_largest_ratio_wins(self):
+        self.health.jobs = 250
+        self.health.rss = 1_200_000_000
+        score, reason = self.health.score(safexl.HealthThresholds(max_jobs=500, max_rss=1_500_000_000))
+        self.assertAlmostEqual(0.8, score)
+        self.assertEqual("rss", reason)
+
+    def test_limits_set_to_none_are_ignored(self):
+        self.health.jobs = 1000
+        thresholds = safexl.HealthThresholds(max_jobs=None, max_rss=None, max_handles=None,
+                                             max_probe_latency=None)
+        self.assertEqual((0.0, None), self.health.score(thresholds))
+
+    def test_probe_latency_is_a_moving_average(self):
+        self.health.record_probe_latency(0.1)
+        self.assertAlmostEqual(0.1, self.health.probe_latency)
+        self.health.record_probe_latency(1.1)
+        self.assertAlmostEqual(0.2, self.health.probe_latency)
+
+    def test_exited_process_is_not_sampled(self):
+        process = psutil.Popen([sys.executable, "-c", "input()"], stdin=subprocess.PIPE)
+        health = safexl.InstanceHealth(process.pid)
+        self.assertTrue(health.running)
+        process.communicate(b"\n")
+        self.assertFalse(health.running)
+        self.assertFalse(health.sample())
+
+
+class test_healthy_application(unittest.TestCase):
+    def tearDown(self):
+        safexl.release_application()
+        safexl.kill_all_instances_of_excel()
+
+    def test_jobs_are_counted(self):
+        for i in range(3):
+            with safexl.healthy_application() as app:
+                pid = safexl.excel_pid(app)
+        with safexl.healthy_application() as app:
+            health = safexl.instance_health(app)
+        self.assertEqual(pid, health.pid)
+        self.assertEqual(3, health.jobs)
+        self.assertGreater(health.rss, 0)
+
+    def test_instance_is_recycled_after_max_jobs(self):
+        thresholds = safexl.HealthThresholds(max_jobs=2)
+        with safexl.healthy_application(thresholds) as app:
+            first_pid = safexl.excel_pid(app)
+        with safexl.healthy_application(thresholds) as app:
+            self.assertEqual(first_pid, safexl.excel_pid(app))
+        join_reapers()
+        self.assertFalse(psutil.pid_exists(first_pid))
+        with safexl.healthy_application(thresholds) as app:
+            self.assertNotEqual(first_pid, safexl.excel_pid(app))
+
+    def test_instance_with_workbooks_safexl_did_not_open_is_not_recycled(self):
+        # stands in for the user's own Excel session, with a workbook they are working on
+        user_app = win32com.client.Dispatch("Excel.Application")
+        user_wb = user_app.Workbooks.Add()
+        pid = safexl.excel_pid(user_app)
+        thresholds = safexl.HealthThresholds(max_jobs=1)
+        for i in range(2):
+            with safexl.healthy_application(thresholds) as app:
+                self.assertEqual(pid, safexl.excel_pid(app))
+                app.Workbooks.Add()
+        join_reapers()
+        self.assertTrue(psutil.pid_exists(pid))
+        self.assertIn(user_wb, safexl.workbooks_currently_open(user_app))
+        self.assertGreater(safexl.health.RECYCLES_SKIPPED.value(reason="jobs"), 0)
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            safexl.recycle_instance(user_app)
+
+    def test_instance_killed_by_an_error_is_forgotten(self):
+        # no Excel is open at the start, so the error inside the block kills the instance it started
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            with safexl.healthy_application() as app:
+                first_pid = safexl.excel_pid(app)
+                raise ValueError("oops")
+        self.assertFalse(psutil.pid_exists(first_pid))
+        self.assertNotIn(first_pid, safexl.health._instance_health)
+        with safexl.healthy_application() as app:
+            self.assertNotEqual(first_pid, safexl.excel_pid(app))
+            self.assertEqual(0, safexl.instance_health(app).jobs)
+
+    def test_error_inside_block_still_counts_as_a_job(self):
+        # with a workbook open at the start, the error only closes what the block opened and the instance survives
+        with safexl.healthy_application() as app:
+            app.Workbooks.Add()
+        with self.assertRaises(safexl.toolkit.ExcelError):
+            with safexl.healthy_application() as app:
+                raise ValueError("oops")
+        with safexl.healthy_application() as app:
+            self.assertEqual(2, safexl.instance_health(app).jobs)
@@ -0,0 +1,89 @@
+# Copyright (c) 2020 safexl
+import unittest
+import safexl
+from safexl.tests.fakes import FakeWorksheet
+
+
+class test_index_sheet(unittest.TestCase):
+    def setUp(self):
+        self.ws = FakeWorksheet.from_columns({
+            "A": ["Id", "ORD-1", "ord-2", "ORD-3", "ORD-2", None],
+            "B": ["Region", "East", "West", "East", "West", None],
+            "D": ["Amount", 10.0, 20.0, 30.0, 40.0, None],
+        })
+
+    def test_find(self):
+        index = safexl.index_sheet(self.ws, "A", first_row=2)
+        self.assertEqual(["A2:A6"], self.ws.reads)
+        self.assertEqual(5, len(index))
+        self.assertEqual(3, index.find("ORD-2"))
+        self.assertEqual([3, 5], index.find_all("ord-2"))
+        self.assertIsNone(index.find("ORD-9"))
+        self.assertIn("Ord-1", index)
+        self.assertEqual("ord-3", index.key(4))
+
+    def test_case_sensitive(self):
+        index = safexl.index_sheet(self.ws, "A", first_row=2, case_sensitive=True)
+        self.assertEqual([5], index.find_all("ORD-2"))
+        self.assertIsNone(index.find("ord-1"))
+
+    def test_several_key_columns(self):
+        index = safexl.index_sheet(self.ws, ["B", "D", "A"], first_row=2)
+        # B and D are not neighbours, A and B are
+        self.assertEqual(["A2:B6", "D2:D6"], self.ws.reads)
+        self.assertEqual(4, index.find(("east", 30, "ORD-3")))
+
+    def test_duplicates(self):
+        index = safexl.index_sheet(self.ws, "B", first_row=2)
+        self.assertEqual({"east": [2, 4], "west": [3, 5]}, index.duplicates())
+        self.assertIn(None, safexl.index_sheet(self.ws, "A", last_row=7).duplicates(include_blank=True))
+
+    def test_join(self):
+        other = FakeWorksheet.from_columns({"C": ["ord-2", "ORD-1", "ORD-7"]})
+        index = safexl.index_sheet(self.ws, "A", first_row=2)
+        other_index = safexl.index_sheet(other, "C")
+        self.assertEqual([(2, 2), (3, 1), (5, 1)], index.join(other_index))
+        self.assertEqual([(2, 2), (3, 1), (4, None), (5, 1)], index.join(other_index, how="left"))
+        with self.assertRaises(ValueError):
+            index.join(other_index, how="outer")
+
+    def test_refresh(self):
+        index = safexl.index_sheet(self.ws, "A", first_row=2)
+        self.ws.cells[3, 1] = "ORD-9"
+        self.ws.cells[7, 1] = "ORD-10"
+        self.assertEqual([3, 7], index.refresh())
+        self.assertEqual(3, index.find("ORD-9"))
+        self.assertEqual([5], index.find_all("ORD-2"))
+        self.assertEqual(7, index.find("ORD-10"))
+
+        self.ws.reads = []
+        self.ws.cells[4, 1] = "ORD-2"
+        self.ws.cells[5, 1] = "ORD-5"
+        self.assertEqual([4, 5], index.refresh(rows=[5, 4]))
+        self.assertEqual(["A4:A5"], self.ws.reads)
+        self.assertEqual([4], index.find_all("ORD-2"))
+
+    def test_refresh_rows_below_the_index(self):
+        index = safexl.index_sheet(self.ws, "A", first_row=2, last_row=4)
+        self.assertEqual([5, 6, 7], index.refresh(rows=[7]))
+        self.assertEqual(7, index.last_row)
+        self.assertEqual([3, 5], index.find_all("ORD-2"))
+
+    def test_refresh_after_the_sheet_shrinks(self):
+        index = safexl.index_sheet(self.ws, "A", first_row=2)
+        for row in (5, 6):
+            for column in (1, 2, 4):
+                self.ws.cells.pop((row, column))
+        self.assertEqual([5, 6], index.refresh())
+        self.assertEqual(4, index.last_row)
+        self.assertEqual([3], index.find_all("ORD-2"))
+        self.assertNotIn(None, index)
+        self.assertEqual({}, index.duplicates(include_blank=True))
+
+    def test_on_a_real_worksheet(self):
+        with safexl.application(kill_after=True) as app:
+            ws = app.Workbooks.Add().ActiveSheet
+            ws.Range("A1:B4").Value = (("Key", "Value"), ("a", 1), ("b", 2), ("A", 3))
+            index = safexl.index_sheet(ws, "A", first_row=2)
+            self.assertEqual(ws.Range("A:A").Find("b").Row, index.find("b"))
+            self.assertEqual({"a": [2, 4]}, index.duplicates())
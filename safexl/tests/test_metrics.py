@@ -0,0 +1,100 @@
+# Copyright (c) 2020 safexl
+import os
+import tempfile
+import unittest
+import urllib.request
+import safexl
+
+
+class test_counter(unittest.TestCase):
+    def test_counter_renders_help_type_and_value(self):
+        registry = safexl.metrics.Registry()
+        counter = safexl.metrics.Counter("jobs_total", "Jobs run.", registry=registry)
+        counter.inc()
+        counter.inc(2)
+        self.assertEqual(3, counter.value())
+        self.assertEqual(
+            "# HELP jobs_total Jobs run.\n# TYPE jobs_total counter\njobs_total 3\n",
+            registry.render(),
+        )
+
+    def test_counter_cannot_decrease(self):
+        counter = safexl.metrics.Counter("jobs_total", "Jobs run.")
+        with self.assertRaises(ValueError):
+            counter.inc(-1)
+
+    def test_labels_are_required_and_escaped(self):
+        registry = safexl.metrics.Registry()
+        counter = safexl.metrics.Counter("errors_total", "Errors.", labelnames=("hresult",), registry=registry)
+        with self.assertRaises(ValueError):
+            counter.inc()
+        counter.inc(hresult='a"b')
+        self.assertIn('errors_total{hresult="a\\"b"} 1', registry.render())
+
+
+class test_histogram(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        registry = safexl.metrics.Registry()
+        histogram = safexl.metrics.Histogram("duration_seconds", "Duration.", buckets=(1, 5), registry=registry)
+        histogram.observe(0.5)
+        histogram.observe(3)
+        histogram.observe(10)
+        text = registry.render()
+        self.assertIn('duration_seconds_bucket{le="1"} 1', text)
+        self.assertIn('duration_seconds_bucket{le="5"} 2', text)
+        self.assertIn('duration_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('duration_seconds_sum 13.5', text)
+        self.assertIn('duration_seconds_count 3', text)
+
+
+class test_exporters(unittest.TestCase):
+    def test_format_hresult(self):
+        # RPC_E_CALL_REJECTED
+        self.assertEqual("0x80010001", safexl.metrics.format_hresult(-2147418111))
+
+    def test_write_textfile(self):
+        registry = safexl.metrics.Registry()
+        safexl.metrics.Gauge("rss_bytes", "RSS.", labelnames=("pid",), registry=registry).set(1024, pid=42)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "safexl.prom")
+            safexl.metrics.write_textfile(path, registry)
+            with open(path, encoding="utf-8") as f:
+                self.assertIn('rss_bytes{pid="42"} 1024', f.read())
+            self.assertEqual(["safexl.prom"], os.listdir(temp_dir))
+
+    def test_excel_rss_follows_running_processes(self):
+        class FakeProcess:
+            def __init__(self, pid, rss):
+                self.pid = pid
+                self.rss = rss
+
+            def memory_info(self):
+                return self
+
+        rss = safexl.metrics.EXCEL_RSS
+        rss.clear()
+        safexl.metrics.record_excel_processes([FakeProcess(1, 100), FakeProcess(2, 200)])
+        self.assertEqual([{"pid": "1"}, {"pid": "2"}], rss.label_values())
+        # pid 1 exited without safexl killing it
+        safexl.metrics.record_excel_processes([FakeProcess(2, 250), FakeProcess(3, 300)])
+        self.assertEqual([{"pid": "2"}, {"pid": "3"}], rss.label_values())
+        self.assertEqual(250, rss.value(pid=2))
+        rss.clear()
+
+    def test_http_server(self):
+        registry = safexl.metrics.Registry()
+        safexl.metrics.Counter("jobs_total", "Jobs run.", registry=registry).inc()
+        server = safexl.metrics.start_http_server(0, registry=registry)
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/metrics"
+            with urllib.request.urlopen(url) as response:
+                self.assertIn("jobs_total 1", response.read().decode("utf-8"))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_application_sessions_are_counted(self):
+        started = safexl.metrics.SESSIONS_STARTED.value()
+        with safexl.application(kill_after=True):
+            pass
+        self.assertEqual(started + 1, safexl.metrics.SESSIONS_STARTED.value())
@@ -0,0 +1,121 @@
+# Copyright (c) 2020 safexl
+import unittest
+import safexl
+from safexl.tests.fakes import FakeWorksheet
+
+
+def grid(rows, columns):
+    return [[row * columns + column for column in range(columns)] for row in range(rows)]
+
+
+class test_sheet_mirror(unittest.TestCase):
+    def test_first_write_is_full(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws, "B2")
+        mirror.write(grid(3, 2))
+        self.assertEqual([("B2:C4", ((0, 1), (2, 3), (4, 5)))], ws.writes)
+
+    def test_unchanged_data_writes_nothing(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws)
+        mirror.write(grid(100, 10))
+        mirror.write(grid(100, 10))
+        self.assertEqual(1, len(ws.writes))
+        self.assertEqual([], mirror.last_areas)
+
+    def test_only_changed_rectangles_are_written(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws, (1, 1))
+        mirror.write(grid(100, 10))
+        data = grid(100, 10)
+        data[10][2] = data[10][3] = data[11][2] = data[11][3] = "x"
+        data[50][9] = "y"
+        mirror.write(data)
+        self.assertEqual(["C11:D12", "J51"], mirror.last_areas)
+        self.assertEqual([("C11:D12", (("x", "x"), ("x", "x"))), ("J51", (("y",),))], ws.writes[1:])
+
+    def test_booleans_and_numbers_are_told_apart(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws, full_write_ratio=1)
+        mirror.write([[1, 0, 1, 2]])
+        mirror.write([[True, False, 1.0, 2]])
+        self.assertEqual(["A1:C1"], mirror.last_areas)
+        mirror.write([[True, False, 1.0, 2]])
+        self.assertEqual([], mirror.last_areas)
+
+    def test_many_changes_fall_back_to_full_write(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws, full_write_ratio=0.3)
+        mirror.write(grid(10, 10))
+        data = [[-value for value in row] for row in grid(10, 10)]
+        data[0][0] = 0
+        mirror.write(data)
+        self.assertEqual(["A1:J10"], mirror.last_areas)
+
+    def test_too_many_areas_fall_back_to_full_write(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws, max_areas=3)
+        mirror.write(grid(20, 1))
+        data = grid(20, 1)
+        for row in range(0, 20, 4):
+            data[row][0] = "changed"
+        mirror.write(data)
+        self.assertEqual(["A1:A20"], mirror.last_areas)
+
+    def test_new_shape_and_invalidate_write_everything(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws)
+        mirror.write(grid(2, 2))
+        mirror.write(grid(3, 2))
+        self.assertEqual(["A1:B3"], mirror.last_areas)
+        mirror.invalidate()
+        mirror.write(grid(3, 2))
+        self.assertEqual(["A1:B3"], mirror.last_areas)
+
+    def test_smaller_block_clears_what_the_old_one_covered(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws, "B2")
+        mirror.write(grid(4, 3))
+        mirror.write(grid(2, 2))
+        self.assertEqual(["B2:C3", "D2:D3", "B4:D5"], mirror.last_areas)
+        self.assertEqual(["D2:D3", "B4:D5"], ws.clears)
+        self.assertEqual({(2, 2): 0, (2, 3): 1, (3, 2): 2, (3, 3): 3}, ws.cells)
+
+    def test_wider_but_shorter_block_clears_only_the_rows_below(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws)
+        mirror.write(grid(3, 1))
+        mirror.invalidate()
+        mirror.write(grid(1, 2))
+        self.assertEqual(["A2:A3"], ws.clears)
+        self.assertEqual({(1, 1): 0, (1, 2): 1}, ws.cells)
+
+    def test_empty_data_clears_the_whole_block(self):
+        ws = FakeWorksheet()
+        mirror = safexl.SheetMirror(ws)
+        mirror.write(grid(2, 2))
+        mirror.write([])
+        self.assertEqual(["A1:B2"], ws.clears)
+        self.assertEqual({}, ws.cells)
+        mirror.write([])
+        self.assertEqual(["A1:B2"], ws.clears)
+
+    def test_ragged_rows(self):
+        with self.assertRaises(ValueError):
+            safexl.SheetMirror(FakeWorksheet()).write([[1, 2], [3]])
+
+    def test_on_a_real_worksheet(self):
+        with safexl.application(kill_after=True) as app:
+            ws = app.Workbooks.Add().ActiveSheet
+            mirror = safexl.SheetMirror(ws, "B2")
+            mirror.write(grid(50, 5))
+            data = grid(50, 5)
+            data[20][1] = "changed"
+            mirror.write(data)
+            self.assertEqual(["C22"], mirror.last_areas)
+            self.assertEqual("changed", ws.Range("C22").Value)
+            self.assertEqual(249, ws.Range("F51").Value)
+            mirror.write(grid(10, 2))
+            self.assertIsNone(ws.Range("F51").Value)
+            self.assertIsNone(ws.Range("D2").Value)
+            self.assertEqual(19, ws.Range("C11").Value)
@@ -0,0 +1,142 @@
+# Copyright (c) 2020 safexl
+import unittest
+import safexl
+
+
+class FakeOleObject:
+    """
+    Stand-in for a PyIDispatch, which compares equal to another one for the same object (same IUnknown), but hashes
+    by its own identity
+    """
+    def __init__(self, unknown):
+        self.unknown = unknown
+
+    def __eq__(self, other):
+        return isinstance(other, FakeOleObject) and other.unknown is self.unknown
+
+    __hash__ = object.__hash__
+
+
+class FakeWorkbook:
+    """
+    Stand-in for a workbook COM object that counts how often Excel would have been asked for each property
+    """
+    def __init__(self, name):
+        self.reads = {}
+        self._name = name
+        self._oleobj_ = FakeOleObject(self)
+
+    def __len__(self):
+        raise TypeError("This dispatch object does not have a Count property")
+
+    @property
+    def Name(self):
+        return self._name
+
+    @Name.setter
+    def Name(self, name):
+        self._name = name
+
+    @property
+    def FullName(self):
+        self.reads["FullName"] = self.reads.get("FullName", 0) + 1
+        return f"C:\\{self._name}"
+
+    @property
+    def Saved(self):
+        self.reads["Saved"] = self.reads.get("Saved", 0) + 1
+        return True
+
+    def SaveAs(self, filename):
+        self._name = filename
+
+
+class FakeProxy:
+    """
+    A second proxy for the same workbook, as pywin32 hands out a new one each time an object is reached
+    """
+    def __init__(self, wb):
+        self.__dict__["_wb"] = wb
+        self.__dict__["_oleobj_"] = FakeOleObject(wb)
+
+    def __getattr__(self, name):
+        return getattr(self._wb, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._wb, name, value)
+
+
+class FakeApplication:
+    """
+    Stand-in for an application COM object that hands out the same workbook through two different paths
+    """
+    def __init__(self, wb):
+        self.ActiveWorkbook = wb
+        self._oleobj_ = object()
+
+    def Workbooks(self, index):
+        return FakeProxy(self.ActiveWorkbook)
+
+    def Range(self, address):
+        return FakeWorkbook(address)
+
+
+class test_caching_dispatch(unittest.TestCase):
+    def test_cached_property_is_read_once(self):
+        wb = FakeWorkbook("Book1.xlsx")
+        proxy = safexl.CachingDispatch(wb)
+        for i in range(10):
+            self.assertEqual("C:\\Book1.xlsx", proxy.FullName)
+        self.assertEqual(1, wb.reads["FullName"])
+        self.assertEqual(9, proxy.cache_stats.hits)
+        self.assertEqual(1, proxy.cache_stats.misses)
+        self.assertAlmostEqual(0.9, proxy.cache_stats.hit_rate)
+
+    def test_other_properties_are_not_cached(self):
+        wb = FakeWorkbook("Book1.xlsx")
+        proxy = safexl.CachingDispatch(wb)
+        for i in range(3):
+            self.assertTrue(proxy.Saved)
+        self.assertEqual(3, wb.reads["Saved"])
+
+    def test_save_as_invalidates(self):
+        wb = FakeWorkbook("Book1.xlsx")
+        proxy = safexl.CachingDispatch(wb)
+        self.assertEqual("C:\\Book1.xlsx", proxy.FullName)
+        proxy.SaveAs("Report.xlsx")
+        self.assertEqual("C:\\Report.xlsx", proxy.FullName)
+        self.assertEqual(2, wb.reads["FullName"])
+        self.assertEqual(1, proxy.cache_stats.invalidations)
+
+    def test_values_are_shared_between_proxies_of_one_object(self):
+        wb = FakeWorkbook("Book1.xlsx")
+        app = safexl.CachingDispatch(FakeApplication(wb))
+        self.assertEqual("Book1.xlsx", app.ActiveWorkbook.Name)
+        app.Workbooks(1).Name = "Renamed.xlsx"
+        self.assertEqual("Renamed.xlsx", app.ActiveWorkbook.Name)
+
+    def test_objects_without_cached_reads_are_not_kept(self):
+        app = safexl.CachingDispatch(FakeApplication(FakeWorkbook("Book1.xlsx")))
+        for i in range(100):
+            self.assertTrue(app.Range(f"A{i + 1}").Saved)
+        self.assertEqual(0, len(object.__getattribute__(app, "_store")))
+        app.ActiveWorkbook.FullName
+        self.assertEqual(1, len(object.__getattribute__(app, "_store")))
+
+    def test_truth_test_does_not_ask_for_count(self):
+        self.assertTrue(safexl.CachingDispatch(FakeWorkbook("Book1.xlsx")))
+
+    def test_application_with_cache_properties(self):
+        with safexl.application(kill_after=True, cache_properties=True) as app:
+            self.assertIsInstance(app, safexl.CachingDispatch)
+            wb = app.Workbooks.Add()
+            ws = wb.ActiveSheet
+            self.assertEqual("Book1", wb.Name)
+            self.assertEqual("Book1", wb.Name)
+            ws.Name = "Renamed"
+            self.assertEqual("Renamed", ws.Name)
+            self.assertEqual(1, app.cache_stats.hits)
+            # two separate pywin32 proxies for the same sheet share their cached values
+            self.assertEqual("Renamed", wb.Worksheets(1).Name)
+            wb.Worksheets(1).Name = "Renamed again"
+            self.assertEqual("Renamed again", ws.Name)
@@ -0,0 +1,88 @@
+# Copyright (c) 2020 safexl
+import unittest
+import pywintypes
+import safexl
+from safexl.retry import RPC_E_CALL_REJECTED, RPC_E_SERVERCALL_RETRYLATER
+
+
+def com_error(hresult):
+    return pywintypes.com_error(hresult, "Call was rejected by callee.", None, None)
+
+
+class Flaky:
+    """
+    Stand-in for a busy COM call, rejects the first `failures` calls before succeeding
+    """
+    def __init__(self, failures, hresult=RPC_E_CALL_REJECTED):
+        self.failures = failures
+        self.hresult = hresult
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise com_error(self.hresult)
+        return "done"
+
+
+class test_retry_policy(unittest.TestCase):
+    def test_rejected_calls_are_retried_until_they_succeed(self):
+        policy = safexl.RetryPolicy(deadline=5, base_delay=0.001, max_delay=0.01)
+        func = Flaky(3)
+        self.assertEqual("done", policy.call(func))
+        self.assertEqual(4, func.calls)
+        self.assertEqual(3, policy.retries)
+        self.assertEqual(0, policy.gave_up)
+
+    def test_retry_later_is_also_retried(self):
+        policy = safexl.RetryPolicy(deadline=5, base_delay=0.001, max_delay=0.01)
+        func = Flaky(1, RPC_E_SERVERCALL_RETRYLATER)
+        self.assertEqual("done", policy.call(func))
+        self.assertEqual(1, policy.retries)
+
+    def test_gives_up_after_deadline(self):
+        policy = safexl.RetryPolicy(deadline=0.05, base_delay=0.01, max_delay=0.01)
+        func = Flaky(10 ** 6)
+        with self.assertRaises(pywintypes.com_error):
+            policy.call(func)
+        self.assertEqual(1, policy.gave_up)
+        self.assertGreater(policy.retries, 0)
+
+    def test_other_com_errors_are_not_retried(self):
+        policy = safexl.RetryPolicy(deadline=5, base_delay=0.001)
+        func = Flaky(1, -2146827284)  # generic Excel exception
+        with self.assertRaises(pywintypes.com_error):
+            policy.call(func)
+        self.assertEqual(1, func.calls)
+        self.assertEqual(0, policy.retries)
+
+    def test_delay_is_bounded(self):
+        policy = safexl.RetryPolicy(base_delay=0.1, max_delay=1, jitter=0)
+        self.assertEqual(0.1, policy.delay(0))
+        self.assertEqual(0.2, policy.delay(1))
+        self.assertEqual(1, policy.delay(10))
+
+
+class NoCount:
+    """
+    Stand-in for a COM object without a `Count` property, which pywin32 reports from `len()` as a TypeError
+    """
+    def __len__(self):
+        raise TypeError("This dispatch object does not have a Count property")
+
+
+class test_retrying_dispatch(unittest.TestCase):
+    def test_truth_test_does_not_ask_for_count(self):
+        self.assertTrue(safexl.RetryingDispatch(NoCount(), safexl.RetryPolicy()))
+
+
+class test_retrying_application(unittest.TestCase):
+    def test_retrying_app_behaves_like_app(self):
+        with safexl.application(kill_after=True, retry_deadline=10) as app:
+            self.assertIsInstance(app, safexl.RetryingDispatch)
+            wb = app.Workbooks.Add()
+            ws = wb.ActiveSheet
+            ws.Range("A1").Value = 555
+            self.assertEqual(555, ws.Range("A1").Value)
+            self.assertIn(wb, [book for book in app.Workbooks])
+        self.assertFalse(safexl.is_excel_open())
@@ -0,0 +1,137 @@
+# Copyright (c) 2020 safexl
+import unittest
+import safexl
+import safexl.address
+from safexl.tests.fakes import FakeCount, FakeRange, FakeWorksheet
+
+
+class FakeTable:
+    """
+    Stand-in for a ListObject COM object with a header row, spanning `bounds` of `sheet`
+    """
+    def __init__(self, sheet, name, bounds, show_totals=False):
+        self.Parent = sheet
+        self.Name = name
+        self.bounds = bounds
+        self.ShowHeaders = True
+        self.ShowTotals = show_totals
+        self.resizes = []
+
+    @property
+    def Range(self):
+        return FakeRange(self.Parent, safexl.address.area(*self.bounds))
+
+    @property
+    def HeaderRowRange(self):
+        first_row, first_column, _, last_column = self.bounds
+        return FakeRange(self.Parent, safexl.address.area(first_row, first_column, first_row, last_column))
+
+    @property
+    def ListRows(self):
+        return FakeCount(self.bounds[2] - self.bounds[0])
+
+    @property
+    def DataBodyRange(self):
+        table = self
+
+        class Body:
+            def Delete(self):
+                first_row, first_column, last_row, last_column = table.bounds
+                for row in range(first_row + 1, last_row + 1):
+                    for column in range(first_column, last_column + 1):
+                        table.Parent.cells.pop((row, column), None)
+                table.bounds = (first_row, first_column, first_row, last_column)
+        return Body()
+
+    def Resize(self, rng):
+        self.resizes.append(rng.bounds)
+        self.bounds = rng.bounds
+
+
+class FakeWorkbook:
+    def __init__(self, worksheets):
+        self.Worksheets = worksheets
+
+
+def make_table(rows, show_totals=False):
+    """
+    Table named 'Sales' with its header in B2 and `rows` below it
+    """
+    ws = FakeWorksheet()
+    header = ("Region", "Units", "Price")
+    for i, row in enumerate([header] + rows):
+        for j, value in enumerate(row):
+            ws.cells[2 + i, 2 + j] = value
+    table = FakeTable(ws, "Sales", (2, 2, 2 + len(rows), 4), show_totals)
+    ws.ListObjects.append(table)
+    return ws, table
+
+
+class test_tables(unittest.TestCase):
+    def test_list_tables(self):
+        ws, table = make_table([])
+        self.assertEqual({"Sales": table}, safexl.list_tables(FakeWorkbook([FakeWorksheet(), ws])))
+
+    def test_read_table(self):
+        ws, table = make_table([("East", 3, 1.5), ("West", 4, 2.5)])
+        self.assertEqual({"Region": ["East", "West"], "Units": [3, 4], "Price": [1.5, 2.5]}, safexl.read_table(table))
+        empty_ws, empty_table = make_table([])
+        self.assertEqual({"Region": [], "Units": [], "Price": []}, safexl.read_table(empty_table))
+
+    def test_append_rows_resizes_once(self):
+        ws, table = make_table([("East", 3, 1.5)], show_totals=True)
+        self.assertEqual("B4:D5", safexl.append_rows(table, [("West", 4, 2.5), ("North", 5, 3.5)]))
+        self.assertEqual([(2, 2, 5, 4)], table.resizes)
+        self.assertEqual(["B4:D5"], [address for address, values in ws.writes])
+        self.assertTrue(table.ShowTotals)
+        self.assertEqual(["East", "West", "North"], safexl.read_table(table)["Region"])
+
+    def test_append_rows_moves_cells_below_the_table_down(self):
+        ws, table = make_table([("East", 3, 1.5)])
+        ws.cells[4, 2] = "Notes"
+        ws.cells[5, 3] = 42
+        safexl.append_rows(table, [("West", 4, 2.5)])
+        self.assertEqual(["B4:D4"], ws.inserts)
+        self.assertEqual(["East", "West"], safexl.read_table(table)["Region"])
+        self.assertEqual("Notes", ws.cells[5, 2])
+        self.assertEqual(42, ws.cells[6, 3])
+
+    def test_one_column_table(self):
+        ws = FakeWorksheet({(1, 1): "Name"})
+        table = FakeTable(ws, "Names", (1, 1, 1, 1))
+        self.assertEqual({"Name": []}, safexl.read_table(table))
+        self.assertEqual("A2:A3", safexl.append_rows(table, {"Name": ["a", "b"]}))
+        self.assertEqual({"Name": ["a", "b"]}, safexl.read_table(table))
+
+    def test_append_columns(self):
+        ws, table = make_table([("East", 3, 1.5)])
+        self.assertEqual("B4:D4", safexl.append_rows(table, {"Region": ["West"], "Price": [2.5]}))
+        # Units is left alone, ex: for a calculated column
+        self.assertEqual(["B4", "D4"], [address for address, values in ws.writes])
+        with self.assertRaises(KeyError):
+            safexl.append_rows(table, {"Cost": [1]})
+        with self.assertRaises(ValueError):
+            safexl.append_rows(table, [("West", 4)])
+
+    def test_replace_rows(self):
+        ws, table = make_table([("East", 3, 1.5), ("West", 4, 2.5), ("North", 5, 3.5)])
+        self.assertEqual("B3:D3", safexl.replace_rows(table, [("South", 6, 4.5)]))
+        self.assertEqual({"Region": ["South"], "Units": [6], "Price": [4.5]}, safexl.read_table(table))
+        self.assertEqual("", safexl.replace_rows(table, []))
+        self.assertEqual(0, table.ListRows.Count)
+
+    def test_on_a_real_workbook(self):
+        with safexl.application(kill_after=True) as app:
+            wb = app.Workbooks.Add()
+            ws = wb.ActiveSheet
+            ws.Range("A1:B2").Value = (("Name", "Score"), ("a", 1))
+            table = ws.ListObjects.Add(1, ws.Range("A1:B2"), None, 1)
+            table.Name = "Scores"
+            table.ShowTotals = True
+            ws.Range("A8").Value = "Notes"
+            safexl.append_rows(table, [("b", 2), ("c", 3)])
+            table = safexl.list_tables(wb)["Scores"]
+            self.assertEqual({"Name": ["a", "b", "c"], "Score": [1, 2, 3]}, safexl.read_table(table))
+            self.assertEqual("$A$1:$B$5", table.Range.Address)
+            # moved down out of the table's way rather than overwritten
+            self.assertIn("Notes", [row[0] for row in ws.Range("A6:A20").Value])
@@ -0,0 +1,109 @@
+# Copyright (c) 2020 safexl
+import os
+import unittest
+import safexl
+import safexl.transfer
+from safexl.tests.fakes import FakeWorksheet
+
+
+class test_write_range(unittest.TestCase):
+    def test_small_block_is_one_assignment(self):
+        ws = FakeWorksheet()
+        self.assertEqual("B2:C3", safexl.write_range(ws, [[1, 2], [3, 4]], "B2"))
+        self.assertEqual([("B2:C3", ((1, 2), (3, 4)))], ws.writes)
+
+    def test_large_block_is_chunked_by_rows(self):
+        ws = FakeWorksheet()
+        chunk_cells = safexl.transfer.CHUNK_CELLS
+        safexl.transfer.CHUNK_CELLS = 10
+        try:
+            safexl.write_range(ws, [[row, row] for row in range(12)], (1, 1))
+        finally:
+            safexl.transfer.CHUNK_CELLS = chunk_cells
+        self.assertEqual(["A1:B5", "A6:B10", "A11:B12"], [address for address, values in ws.writes])
+        self.assertEqual(((10, 10), (11, 11)), ws.writes[-1][1])
+
+    def test_text_path_is_opt_in(self):
+        ws = FakeWorksheet()
+        chunk_cells = safexl.transfer.CHUNK_CELLS
+        safexl.transfer.CHUNK_CELLS = 10
+        try:
+            # however large the block, it only goes through a text file when asked to
+            safexl.write_range(ws, [["00123", "2020-01-31"]] * 20)
+        finally:
+            safexl.transfer.CHUNK_CELLS = chunk_cells
+        self.assertEqual(4, len(ws.writes))
+        self.assertEqual("00123", ws.cells[20, 1])
+
+    def test_line_breaks_stay_on_the_com_path(self):
+        ws = FakeWorksheet()
+        self.assertEqual("A1:B2", safexl.write_range(ws, [["a", "b\nc"], ["d", "e"]], via_text=True))
+        self.assertEqual([("A1:B2", (("a", "b\nc"), ("d", "e")))], ws.writes)
+        self.assertTrue(safexl.transfer._has_line_breaks([(1, "x\r")]))
+        self.assertFalse(safexl.transfer._has_line_breaks([(1, "x", None)]))
+
+    def test_empty_and_ragged(self):
+        self.assertEqual("", safexl.write_range(FakeWorksheet(), []))
+        with self.assertRaises(ValueError):
+            safexl.write_range(FakeWorksheet(), [[1, 2], [3]])
+
+    def test_text_file_is_tracked_until_removed(self):
+        path = safexl.transfer._write_text_file([(1, None, "a\tb"), (2.5, "x", "y")])
+        try:
+            self.assertIn(path, safexl.temp_files())
+            with open(path, encoding="utf-8", newline="") as f:
+                self.assertEqual('1\t\t"a\tb"\r\n2.5\tx\ty\r\n', f.read())
+        finally:
+            safexl.transfer._remove_temp_file(path)
+        self.assertFalse(os.path.exists(path))
+        self.assertNotIn(path, safexl.temp_files())
+
+    def test_cleanup_temp_files(self):
+        path = safexl.transfer._write_text_file([(1,)])
+        self.assertEqual([], safexl.cleanup_temp_files())
+        self.assertFalse(os.path.exists(path))
+
+    def test_via_text_on_a_real_worksheet(self):
+        data = [[row, f"text {row}", row / 4] for row in range(1, 1001)]
+        with safexl.application(kill_after=True) as app:
+            ws = app.Workbooks.Add().ActiveSheet
+            self.assertEqual("B2:D1001", safexl.write_range(ws, data, "B2", via_text=True))
+            self.assertEqual(1, app.Workbooks.Count)
+            self.assertEqual("text 500", ws.Range("C501").Value)
+            self.assertEqual(250, ws.Range("D1001").Value)
+        self.assertEqual([], safexl.temp_files())
+
+
+class test_read_sparse(unittest.TestCase):
+    def test_sparse_sheet_reads_only_filled_areas(self):
+        ws = FakeWorksheet({(1, 1): "id", (1, 2): "name", (5000, 2): 7.0, (9000, 40): "=A1"}, formulas=[(9000, 40)])
+        self.assertEqual({(1, 1): "id", (1, 2): "name", (5000, 2): 7.0, (9000, 40): "=A1"}, safexl.read_sparse(ws))
+        self.assertEqual(["A1:B1", "B5000", "AN9000"], ws.reads)
+
+    def test_dense_sheet_is_read_in_one_block(self):
+        ws = FakeWorksheet({(row, column): row * column for row in range(1, 11) for column in range(1, 4)
+                                  if (row, column) != (2, 2)})
+        cells = safexl.read_sparse(ws)
+        self.assertEqual(29, len(cells))
+        self.assertNotIn((2, 2), cells)
+        self.assertEqual(["A1:C10"], ws.reads)
+
+    def test_coo_and_cell_range(self):
+        ws = FakeWorksheet({(3, 2): 1.0, (2, 5): 2.0, (100, 100): 3.0})
+        self.assertEqual(([2, 3], [5, 2], [2.0, 1.0]), safexl.read_sparse(ws, "A1:Z50", coo=True))
+
+    def test_falls_back_to_dense_when_special_cells_fails(self):
+        ws = FakeWorksheet({(1, 1): 1.0, (50, 50): 2.0}, protected=True)
+        self.assertEqual({(1, 1): 1.0, (50, 50): 2.0}, safexl.read_sparse(ws))
+        self.assertEqual(["A1:AX50"], ws.reads)
+
+    def test_empty_sheet(self):
+        self.assertEqual({}, safexl.read_sparse(FakeWorksheet({})))
+
+    def test_on_a_real_worksheet(self):
+        with safexl.application(kill_after=True) as app:
+            ws = app.Workbooks.Add().ActiveSheet
+            ws.Range("A1").Value = "header"
+            ws.Range("C2000").Value = 5
+            ws.Range("Z5000").Formula = "=C2000*2"
+            self.assertEqual({(1, 1): "header", (2000, 3): 5, (5000, 26): 10}, safexl.read_sparse(ws))
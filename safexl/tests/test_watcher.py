@@ -0,0 +1,81 @@
+# Copyright (c) 2020 safexl
+import queue
+import unittest
+import safexl
+import safexl.events
+from safexl.tests.fakes import FakeConnectionPoint
+from safexl.watcher import _SheetEvents
+
+
+class FakeSheet:
+    def __init__(self, workbook_name, name):
+        self.Parent = FakeSheet(None, workbook_name) if workbook_name else None
+        self.Name = name
+
+
+class FakeTarget:
+    def __init__(self, address):
+        self.Address = address
+
+
+class RecordingWatcher:
+    """
+    Takes the place of a `SheetWatcher`, keeping what its event sink hands over
+    """
+    include_calculate = True
+
+    def __init__(self):
+        self.records = []
+
+    def _record(self, sheet, areas=(), calculated=False):
+        self.records.append((sheet, list(areas), calculated))
+
+
+class test_watch(unittest.TestCase):
+    def test_change_batch(self):
+        batch = safexl.ChangeBatch({("Book1", "Sheet1"): [(1, 1, 2, 2), (5, 3, 5, 3)]}, {("Book1", "Sheet2")}, 3)
+        self.assertEqual(["A1:B2", "C5"], batch.addresses(("Book1", "Sheet1")))
+        self.assertEqual([], batch.addresses(("Book1", "Sheet2")))
+
+    def test_events_connect_without_makepy(self):
+        connection_point = FakeConnectionPoint()
+        watcher = RecordingWatcher()
+        events = _SheetEvents(connection_point, watcher)
+        self.assertEqual(safexl.events.IID_APP_EVENTS, connection_point.iid)
+        self.assertIsNotNone(connection_point.sink)
+        sheet = FakeSheet("Book1", "Sheet1")
+        events.OnSheetChange(sheet, FakeTarget("$A$1:$B$2,$D$4"))
+        events.OnSheetCalculate(sheet)
+        self.assertEqual([(("Book1", "Sheet1"), [(1, 1, 2, 2), (4, 4, 4, 4)], False),
+                          (("Book1", "Sheet1"), [], True)], watcher.records)
+        events.close()
+        self.assertEqual([7], connection_point.unadvised)
+
+    def test_edits_are_batched(self):
+        with safexl.application(kill_after=True) as app:
+            wb = app.Workbooks.Add()
+            ws = wb.ActiveSheet
+            with safexl.watch(app, include_calculate=False, quiet_period=0.5) as watcher:
+                ws.Range("A1:C1").Value = (1, 2, 3)
+                ws.Range("A2:C2").Value = (4, 5, 6)
+                ws.Range("B2").Value = 7
+                batch = watcher.queue.get(timeout=5)
+            self.assertEqual(3, batch.events)
+            self.assertEqual({(wb.Name, ws.Name): [(1, 1, 2, 3)]}, batch.areas)
+            self.assertEqual(set(), batch.calculated)
+            with self.assertRaises(queue.Empty):
+                watcher.queue.get_nowait()
+
+    def test_callback_and_calculate(self):
+        batches = []
+        with safexl.application(kill_after=True) as app:
+            wb = app.Workbooks.Add()
+            ws = wb.ActiveSheet
+            sheet = (wb.Name, ws.Name)
+            watcher = safexl.watch(app, batches.append)
+            ws.Range("A1").Formula = "=1+1"
+            watcher.stop()
+            self.assertFalse(watcher.running)
+        self.assertEqual(1, len(batches))
+        self.assertEqual(["A1"], batches[0].addresses(sheet))
+        self.assertEqual({sheet}, batches[0].calculated)
@@ -0,0 +1,116 @@
+# Copyright (c) 2020 safexl
+import unittest
+import tempfile
+from unittest import mock
+import safexl
+
+
+class test_workbook_cache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.paths = [f"{self.temp_dir.name}\\book{i}.xlsx" for i in range(3)]
+        with safexl.application(kill_after=True) as app:
+            app.DisplayAlerts = False
+            for path in self.paths:
+                wb = app.Workbooks.Add()
+                wb.SaveAs(path)
+                wb.Close()
+
+    def tearDown(self):
+        safexl.kill_all_instances_of_excel()
+        self.temp_dir.cleanup()
+
+    def test_hits_and_misses(self):
+        with safexl.application(kill_after=True) as app:
+            cache = safexl.WorkbookCache(app)
+            wb1 = cache.get(self.paths[0])
+            wb2 = cache.get(self.paths[0])
+            self.assertEqual(wb1, wb2)
+            self.assertIn(self.paths[0], cache)
+            self.assertEqual(1, cache.stats.hits)
+            self.assertEqual(1, cache.stats.misses)
+            self.assertEqual(1, app.Workbooks.Count)
+
+    def test_least_recently_used_is_evicted(self):
+        with safexl.application(kill_after=True) as app:
+            cache = safexl.WorkbookCache(app, max_workbooks=2)
+            cache.get(self.paths[0])
+            cache.get(self.paths[1])
+            cache.get(self.paths[0])
+            cache.get(self.paths[2])
+            self.assertEqual(2, len(cache))
+            self.assertNotIn(self.paths[1], cache)
+            self.assertIn(self.paths[0], cache)
+            self.assertEqual(1, cache.stats.evictions)
+            self.assertEqual(2, app.Workbooks.Count)
+
+    def test_memory_limit_keeps_newest_workbook(self):
+        with safexl.application(kill_after=True) as app:
+            cache = safexl.WorkbookCache(app, max_rss=1)
+            # every close hands some memory back, but never enough
+            samples = iter(range(10 ** 9, 0, -1000))
+            cache.rss = lambda: next(samples)
+            for path in self.paths:
+                cache.get(path)
+            self.assertEqual(1, len(cache))
+            self.assertIn(self.paths[2], cache)
+            self.assertEqual(2, cache.stats.evictions)
+
+    def test_memory_limit_stops_when_closing_does_not_help(self):
+        with safexl.application(kill_after=True) as app:
+            cache = safexl.WorkbookCache(app, max_rss=10 ** 12)
+            cache.rss = lambda: 10 ** 9
+            cache.get(self.paths[0])
+            cache.get(self.paths[1])
+            cache.max_rss = 1
+            cache.get(self.paths[2])
+            self.assertEqual(1, cache.stats.evictions)
+            self.assertEqual(2, len(cache))
+
+    def test_workbook_already_open_is_never_closed(self):
+        with safexl.application(kill_after=True) as app:
+            users_wb = app.Workbooks.Open(self.paths[0])
+            users_wb.ActiveSheet.Range("A1").Value = "unsaved"
+            cache = safexl.WorkbookCache(app, max_workbooks=1)
+            self.assertEqual(users_wb, cache.get(self.paths[0]))
+            cache.get(self.paths[1])
+            cache.get(self.paths[2])
+            cache.clear()
+            # only book1 was evicted, to make room for book2
+            self.assertEqual(1, cache.stats.evictions)
+            self.assertEqual(1, app.Workbooks.Count)
+            self.assertEqual("unsaved", users_wb.ActiveSheet.Range("A1").Value)
+
+    def test_workbook_opened_elsewhere_meanwhile_is_not_taken_for_the_caches(self):
+        with safexl.application(kill_after=True) as app:
+            users_wb = app.Workbooks.Open(self.paths[0])
+            open_workbook = safexl.toolkit._open_workbook
+
+            def open_while_another_is_added(*args, **kwargs):
+                # ex: by another thread, or the user, while the cache looks for book0
+                app.Workbooks.Add()
+                return open_workbook(*args, **kwargs)
+
+            cache = safexl.WorkbookCache(app)
+            with mock.patch.object(safexl.workbook_cache, "_open_workbook", open_while_another_is_added):
+                cache.get(self.paths[0])
+            cache.clear()
+            self.assertEqual("book0.xlsx", users_wb.Name)
+
+    def test_workbook_closed_by_hand_is_reopened(self):
+        with safexl.application(kill_after=True) as app:
+            cache = safexl.WorkbookCache(app)
+            wb = cache.get(self.paths[0])
+            safexl.close_workbooks(app, [wb])
+            wb = cache.get(self.paths[0])
+            self.assertEqual("book0.xlsx", wb.Name)
+            self.assertEqual(2, cache.stats.misses)
+
+    def test_clear(self):
+        with safexl.application(kill_after=True) as app:
+            cache = safexl.WorkbookCache(app)
+            for path in self.paths:
+                cache.get(path)
+            cache.clear()
+            self.assertEqual(0, len(cache))
+            self.assertEqual(0, app.Workbooks.Count)
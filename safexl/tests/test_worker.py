@@ -0,0 +1,130 @@
+# Copyright (c) 2020 safexl
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import safexl
+import safexl.worker
+
+AUTHKEY = b"test"
+
+
+def write_and_read(app, value):
+    wb = app.Workbooks.Add()
+    wb.ActiveSheet.Range("A1").Value = value
+    result = wb.ActiveSheet.Range("A1").Value
+    safexl.close_workbooks(app, [wb])
+    return result
+
+
+def sleep(app, seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def fail(app):
+    app.Workbooks.Add()
+    raise ValueError("oops")
+
+
+class test_worker(unittest.TestCase):
+    def start_server(self, **kwargs):
+        server = safexl.worker.WorkerServer(["safexl.tests"], address=("127.0.0.1", 0), authkey=AUTHKEY, **kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 10)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def submit(self, server, func, *args):
+        return safexl.worker.submit(func, *args, address=server.address, authkey=AUTHKEY)
+
+    def tearDown(self):
+        safexl.kill_all_instances_of_excel()
+
+    def test_callable_path(self):
+        self.assertEqual("safexl.tests.test_worker:sleep", safexl.worker._callable_path(sleep))
+        self.assertEqual("os.path:join", safexl.worker._callable_path("os.path:join"))
+        with self.assertRaises(ValueError):
+            safexl.worker._callable_path(lambda app: None)
+
+    def test_only_allowed_modules_are_imported(self):
+        self.assertIs(sleep, safexl.worker._resolve("safexl.tests.test_worker:sleep", ("safexl.tests",)))
+        with mock.patch("importlib.import_module") as import_module:
+            with self.assertRaises(PermissionError):
+                safexl.worker._resolve("os:system", ("safexl.tests",))
+            with self.assertRaises(PermissionError):
+                # a prefix of the name alone is not enough
+                safexl.worker._resolve("safexl.testsuite:run", ("safexl.tests",))
+            import_module.assert_not_called()
+
+    def test_server_writes_a_random_authkey_for_its_user(self):
+        with tempfile.TemporaryDirectory() as folder:
+            key_file = os.path.join(folder, "safexl", "worker.key")
+            with mock.patch.object(safexl.worker, "AUTHKEY_FILE", key_file), \
+                    mock.patch.dict(os.environ, {safexl.worker.AUTHKEY_ENVIRONMENT_VARIABLE: ""}):
+                with self.assertRaises(safexl.toolkit.ExcelError):
+                    safexl.worker._default_authkey()
+                key = safexl.worker._default_authkey(create=True)
+                self.assertGreaterEqual(len(key), 32)
+                self.assertNotEqual(b"safexl", key)
+                # clients read the same key back
+                self.assertEqual(key, safexl.worker._default_authkey())
+
+    def test_shutdown_with_a_full_queue_does_not_block(self):
+        server = self.start_server(max_pending=1)
+        errors = []
+
+        def submit():
+            try:
+                self.submit(server, sleep, 1)
+            except safexl.toolkit.ExcelError as e:
+                errors.append(e)
+
+        # one job running and one waiting fill the queue
+        threads = [threading.Thread(target=submit) for i in range(2)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.5)
+        start = time.perf_counter()
+        server.shutdown()
+        self.assertLess(time.perf_counter() - start, 0.5)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(errors))
+        self.assertIn("shut down before the job started", str(errors[0]))
+
+    def test_result_and_timings(self):
+        server = self.start_server()
+        result = self.submit(server, write_and_read, 555)
+        self.assertEqual(555, result.value)
+        self.assertGreaterEqual(result.queued, 0)
+        self.assertGreater(result.elapsed, 0)
+
+    def test_job_error_is_raised_with_worker_traceback(self):
+        server = self.start_server()
+        with self.assertRaises(safexl.toolkit.ExcelError) as cm:
+            self.submit(server, fail)
+        self.assertIn("oops", str(cm.exception))
+        self.assertIn("Worker traceback", str(cm.exception))
+        # the workbook opened by the failed job was cleaned up
+        self.assertEqual(1, self.submit(server, write_and_read, 1).value)
+
+    def test_busy_when_queue_is_full(self):
+        server = self.start_server(max_pending=1)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.submit(server, sleep, 2)))
+            for i in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.5)
+        with self.assertRaises(safexl.worker.WorkerBusy):
+            self.submit(server, sleep, 0)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2, len(results))
+        self.assertGreater(max(result.queued for result in results), 1)
@@ -0,0 +1,223 @@
+# Copyright (c) 2020 safexl
+import datetime
+import decimal
+import fractions
+import os
+import tempfile
+import unittest
+import zipfile
+import safexl
+
+MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+RELATIONSHIPS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def make_xlsx(path, sheets, shared_strings=(), date1904=False):
+    """
+    Writes a minimal workbook by hand, the way other tools than Excel do, ex: `sheets={"Data": '<row r="1">...</row>'}`
+    """
+    with zipfile.ZipFile(path, "w") as archive:
+        sheet_entries = "".join(f'<sheet name="{name}" sheetId="{i}" r:id="rId{i}"/>'
+                                for i, name in enumerate(sheets, 1))
+        archive.writestr("xl/workbook.xml", (
+            f'<workbook xmlns="{MAIN}" xmlns:r="{RELATIONSHIPS}">'
+            f'<workbookPr date1904="{int(date1904)}"/><sheets>{sheet_entries}</sheets></workbook>'
+        ))
+        archive.writestr("xl/_rels/workbook.xml.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml" Type="worksheet"/>'
+                      for i in range(1, len(sheets) + 1))
+            + '</Relationships>'
+        ))
+        for i, (name, xml) in enumerate(sheets.items(), 1):
+            archive.writestr(f"xl/worksheets/sheet{i}.xml", f'<worksheet xmlns="{MAIN}">{xml}</worksheet>')
+        archive.writestr("xl/sharedStrings.xml", f'<sst xmlns="{MAIN}">'
+                         + "".join(f"<si><t>{s}</t></si>" for s in shared_strings)
+                         + '<si><r><t>rich </t></r><r><t>text</t></r></si></sst>')
+        archive.writestr("xl/styles.xml", (
+            f'<styleSheet xmlns="{MAIN}"><numFmts><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/>'
+            '<numFmt numFmtId="165" formatCode="&quot;days&quot; 0.00"/></numFmts>'
+            '<cellXfs><xf numFmtId="0"/><xf numFmtId="14"/><xf numFmtId="164"/><xf numFmtId="165"/></cellXfs></styleSheet>'
+        ))
+
+
+class test_read_xlsx(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "book.xlsx")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_value_types(self):
+        make_xlsx(self.path, {"Data": (
+            '<dimension ref="A1:F1"/><sheetData><row r="1">'
+            '<c r="A1"><v>555</v></c>'
+            '<c r="B1" t="s"><v>0</v></c>'
+            '<c r="C1" t="b"><v>1</v></c>'
+            '<c r="D1" t="e"><v>#DIV/0!</v></c>'
+            '<c r="E1" t="inlineStr"><is><t>inline</t></is></c>'
+            '<c r="F1" t="str"><f>A1&amp;""</f><v>555</v></c>'
+            '</row></sheetData>'
+        )}, shared_strings=["Hello, World!"])
+        self.assertEqual([(555.0, "Hello, World!", True, -2146826281, "inline", "555")], list(safexl.read_xlsx(self.path)))
+
+    def test_dates(self):
+        make_xlsx(self.path, {"Data": (
+            '<sheetData><row r="1">'
+            '<c r="A1" s="1"><v>43831</v></c>'
+            '<c r="B1" s="2"><v>43831.5</v></c>'
+            '<c r="C1" s="3"><v>2.5</v></c>'
+            '</row></sheetData>'
+        )})
+        self.assertEqual([(datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 1, 12), 2.5)],
+                         list(safexl.read_xlsx(self.path)))
+
+    def test_1904_date_system(self):
+        make_xlsx(self.path, {"Data": '<sheetData><row r="1"><c r="A1" s="1"><v>0</v></c></row></sheetData>'},
+                  date1904=True)
+        self.assertEqual([(datetime.datetime(1904, 1, 1),)], list(safexl.read_xlsx(self.path)))
+
+    def test_gaps_are_filled_with_none(self):
+        make_xlsx(self.path, {"Data": (
+            '<dimension ref="B2:D5"/><sheetData>'
+            '<row r="2"><c r="B2"><v>1</v></c></row>'
+            '<row r="5"><c r="D5"><v>2</v></c></row>'
+            '</sheetData>'
+        )})
+        self.assertEqual([
+            (1.0, None, None),
+            (None, None, None),
+            (None, None, None),
+            (None, None, 2.0),
+        ], list(safexl.read_xlsx(self.path)))
+
+    def test_used_range_without_dimension(self):
+        make_xlsx(self.path, {"Data": (
+            '<sheetData><row r="3"><c r="C3"><v>1</v></c></row><row r="4"><c r="B4"><v>2</v></c></row></sheetData>'
+        )})
+        self.assertEqual([(None, 1.0), (2.0, None)], list(safexl.read_xlsx(self.path)))
+
+    def test_cell_range_and_sheet_selection(self):
+        rows = "".join(f'<row r="{r}">' + "".join(f'<c r="{c}{r}"><v>{r}</v></c>' for c in "ABC") + "</row>"
+                       for r in range(1, 101))
+        make_xlsx(self.path, {"Empty": "<sheetData/>", "Data": f"<sheetData>{rows}</sheetData>"})
+        self.assertEqual(["Empty", "Data"], safexl.xlsx_sheet_names(self.path))
+        self.assertEqual([], list(safexl.read_xlsx(self.path)))
+        self.assertEqual([(50.0, 50.0), (51.0, 51.0)], list(safexl.read_xlsx(self.path, "data", "B50:C51")))
+        self.assertEqual(100, len(list(safexl.read_xlsx(self.path, 2))))
+        with self.assertRaises(KeyError):
+            list(safexl.read_xlsx(self.path, "Missing"))
+
+    def test_rich_text_shared_string(self):
+        make_xlsx(self.path, {"Data": '<sheetData><row r="1"><c r="A1" t="s"><v>1</v></c></row></sheetData>'},
+                  shared_strings=["plain"])
+        self.assertEqual([("rich text",)], list(safexl.read_xlsx(self.path)))
+
+    def test_matches_read_range(self):
+        with safexl.application(kill_after=True) as app:
+            wb = app.Workbooks.Add()
+            ws = wb.ActiveSheet
+            ws.Range("B2:D3").Value = ((1, "text", True), (2.5, None, "=1/0"))
+            ws.Range("C4").Value = "=DATE(2020,1,31)"
+            expected = safexl.read_range(ws)
+            app.DisplayAlerts = False
+            wb.SaveAs(self.path)
+            wb.Close()
+        actual = list(safexl.read_xlsx(self.path))
+        self.assertEqual(len(expected), len(actual))
+        self.assertEqual(expected[:2], actual[:2])
+        self.assertEqual(datetime.datetime(2020, 1, 31), actual[2][1])
+
+
+class test_write_xlsx(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "written.xlsx")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        rows = [
+            ["text", 1, 2.5, True, None, "<&> \"quoted\""],
+            [datetime.datetime(2020, 1, 31, 12), datetime.date(2020, 1, 31), float("nan"), " padded ", "bell\x07", 10 ** 15],
+        ]
+        safexl.write_xlsx(self.path, {"Data": rows})
+        self.assertEqual([
+            ("text", 1.0, 2.5, True, None, "<&> \"quoted\""),
+            (datetime.datetime(2020, 1, 31, 12), datetime.datetime(2020, 1, 31), -2146826252, " padded ", "bell", 1e15),
+        ], list(safexl.read_xlsx(self.path)))
+
+    def test_other_number_types(self):
+        safexl.write_xlsx(self.path, {"Data": [[decimal.Decimal("1.10"), fractions.Fraction(1, 4), 2 ** 70]]})
+        with zipfile.ZipFile(self.path) as archive:
+            sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertIn("<v>1.1</v>", sheet)
+        self.assertIn("<v>0.25</v>", sheet)
+        self.assertIn(f"<v>{2 ** 70}</v>", sheet)
+        self.assertEqual([(1.1, 0.25, float(2 ** 70))], list(safexl.read_xlsx(self.path)))
+        with self.assertRaises(ValueError):
+            safexl.write_xlsx(self.path, {"Data": [[1 + 2j]]})
+
+    def test_too_many_columns(self):
+        with self.assertRaises(ValueError):
+            safexl.write_xlsx(self.path, {"Data": [range(safexl.address.MAX_COLUMN + 1)]})
+
+    def test_rows_from_generator(self):
+        safexl.write_xlsx(self.path, [("Big", ([i, i * 2] for i in range(1, 5001))), ("Small", [[1]])])
+        self.assertEqual(["Big", "Small"], safexl.xlsx_sheet_names(self.path))
+        rows = list(safexl.read_xlsx(self.path, "Big"))
+        self.assertEqual(5000, len(rows))
+        self.assertEqual((5000.0, 10000.0), rows[-1])
+
+    def test_empty_rows_are_kept_in_place(self):
+        safexl.write_xlsx(self.path, {"Data": [[1], [], [None], [2]]})
+        self.assertEqual([(1.0,), (None,), (None,), (2.0,)], list(safexl.read_xlsx(self.path)))
+
+    def test_styles(self):
+        safexl.write_xlsx(self.path, {"Data": [[
+            safexl.StyledCell(1, fill="rgbRed", bold=True),
+            safexl.StyledCell(2, fill=(0, 0, 255), number_format="#,##0.00"),
+            safexl.StyledCell(3, number_format="0.000"),
+            safexl.StyledCell(4, fill=safexl.colors.rgbRed, bold=True),
+            safexl.StyledCell(None, fill="rgbRed"),
+        ]]})
+        with zipfile.ZipFile(self.path) as archive:
+            styles = archive.read("xl/styles.xml").decode("utf-8")
+            sheet = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertIn('<fgColor rgb="FFFF0000"/>', styles)
+        self.assertIn('<fgColor rgb="FF0000FF"/>', styles)
+        self.assertIn('<numFmt numFmtId="164" formatCode="0.000"/>', styles)
+        self.assertIn('<xf numFmtId="4" fontId="0" fillId="3"', styles)
+        # the same formatting is shared rather than repeated
+        self.assertIn('<c r="A1" s="1">', sheet)
+        self.assertIn('<c r="D1" s="1">', sheet)
+        self.assertIn('<c r="E1" s="4"/>', sheet)
+        # an empty cell with only formatting holds no value to read
+        self.assertEqual([(1.0, 2.0, 3.0, 4.0)], list(safexl.read_xlsx(self.path)))
+
+    def test_sheet_names(self):
+        safexl.write_xlsx(self.path, {"Q1/Q2 [draft]: a very long sheet name indeed": [[1]]})
+        self.assertEqual(["Q1Q2 draft a very long sheet na"], safexl.xlsx_sheet_names(self.path))
+        with self.assertRaises(ValueError):
+            safexl.write_xlsx(self.path, {"Data": [[1]], "DATA": [[2]]})
+        # the same rule, and error, as `worksheet_name_sanitization` on a live workbook
+        with self.assertRaises(safexl.errors.ExcelError):
+            safexl.write_xlsx(self.path, {"[]": [[1]]})
+        with self.assertRaises(ValueError):
+            safexl.write_xlsx(self.path, {})
+
+    def test_opens_in_excel(self):
+        safexl.write_xlsx(self.path, {"Data": [
+            ["Header", safexl.StyledCell(datetime.date(2020, 1, 31), fill="rgbYellow")],
+            [safexl.StyledCell(1234.5, number_format="#,##0.00", bold=True), "text"],
+        ]})
+        with safexl.application(kill_after=True) as app:
+            wb = app.Workbooks.Open(self.path)
+            ws = wb.Worksheets("Data")
+            self.assertEqual("1,234.50", ws.Range("A2").Text)
+            self.assertTrue(ws.Range("A2").Font.Bold)
+            self.assertEqual(safexl.colors.rgbYellow, ws.Range("B1").Interior.Color)
+            self.assertEqual("text", ws.Range("B2").Value)
+            wb.Close(SaveChanges=False)
@@ -1,35 +1,78 @@
 # Copyright (c) 2020 safexl
 from contextlib import contextmanager
+import os
+import threading
+import time
 import psutil
 import pythoncom
+import pywintypes
 import win32com.client
+import win32process
+import safexl.metrics as metrics
+from safexl.address import worksheet_name_sanitization
+from safexl.errors import ExcelError
+from safexl.retry import RetryPolicy, RetryingDispatch
+from safexl.property_cache import CachingDispatch
 EXCEL_PROCESS_NAME = "EXCEL.EXE"
+_com_state = threading.local()
+_session_cache = threading.local()
+# Hwnd of each Excel instance -> which of its add-ins safexl has already seen loaded, see `load_addins`
+_addin_cache = {}
+# (Hwnd of the Excel instance, normalized path) -> workbook COM object, see `open_workbook`. Kept per thread, as every
+# thread dispatches to the same Excel, but a COM object only works in the apartment of the thread that fetched it
+_workbook_handles = threading.local()
 
 __all__ = [
     'is_excel_open',
+    'excel_pid',
     'kill_all_instances_of_excel',
     'close_workbooks',
+    'open_workbook',
     'see_excel',
     'workbooks_currently_open',
+    'WorkbookSnapshot',
     'last_row',
     'last_column',
     'worksheet_name_sanitization',
+    'load_addins',
+    'com_apartment',
+    'release_application',
     'application',
 ]
 
 
-def is_excel_open() -> bool:
+def _excel_processes() -> list:
     """
-    Simple wrapper around `psutil.process_iter()` searching for individual processes of EXCEL.EXE
-    :return: bool - Indicating whether or not Excel is open
+    :return: list - Every running EXCEL.EXE process, as psutil.Process objects, also sampled into the memory gauge
     """
+    procs = []
     for proc in psutil.process_iter():
         try:
             if proc.name() == EXCEL_PROCESS_NAME:
-                return True
-        except psutil.AccessDenied:
+                procs.append(proc)
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
             pass
-    return False
+    metrics.record_excel_processes(procs)
+    return procs
+
+
+def is_excel_open() -> bool:
+    """
+    Simple wrapper around `psutil.process_iter()` searching for individual processes of EXCEL.EXE
+    :return: bool - Indicating whether or not Excel is open
+    """
+    return bool(_excel_processes())
+
+
+def excel_pid(app: 'win32com.client.Dispatch("Excel.Application")') -> int:
+    """
+    Finds the process ID of the EXCEL.EXE process behind `app`, by way of its main window handle. Useful for asking
+    psutil about that one instance (ex: `psutil.Process(safexl.excel_pid(app)).memory_info().rss`) when several are open.
+    :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
+    :return: int - Process ID
+    """
+    thread_id, pid = win32process.GetWindowThreadProcessId(app.Hwnd)
+    return pid
 
 
 def excel_open_files() -> list:
@@ -41,11 +84,10 @@ def excel_open_files() -> list:
                     given a .tmp filepath.
     """
     result = []
-    for proc in psutil.process_iter():
+    for proc in _excel_processes():
         try:
-            if proc.name() == EXCEL_PROCESS_NAME:
-                result.extend([popenfile.path for popenfile in proc.open_files()])
-        except psutil.AccessDenied:
+            result.extend([popenfile.path for popenfile in proc.open_files()])
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
             pass
     return result
 
@@ -66,22 +108,37 @@ def kill_all_instances_of_excel(app: 'win32com.client.Dispatch("Excel.Applicatio
         try:
             if proc.name() == EXCEL_PROCESS_NAME:
                 proc.kill()
+                metrics.KILLS.inc()
+                metrics.EXCEL_RSS.remove(pid=proc.pid)
+                _addin_cache.clear()
+                _workbook_handle_cache().clear()
         except (psutil.AccessDenied, psutil.NoSuchProcess):
             # passing on psutil.NoSuchProcess avoids erroring out if race conditions
             # close Excel *between* finding it and killing it with psutil
             pass
 
 
-def new_workbooks(app: 'win32com.client.Dispatch("Excel.Application")', workbooks_open_at_onset: iter) -> list:
+def new_workbooks(
+        app: 'win32com.client.Dispatch("Excel.Application")',
+        workbooks_open_at_onset: iter,
+        currently_open_workbooks: list = None,
+) -> list:
     """
     Determines which workbooks are open currently in comparison to list of `workbooks_open_at_onset`, returns the delta
     :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
     :param workbooks_open_at_onset: iterable - Full of workbook COM objects that you want to close without saving
+    :param currently_open_workbooks: Optional list - Result of `workbooks_currently_open(app)`, if you already have it on hand
     :return: iterable - Full of workbook COM objects that are both open currently and not present in your `workbooks_open_at_onset`
     """
+    if isinstance(workbooks_open_at_onset, WorkbookSnapshot):
+        if currently_open_workbooks is None:
+            currently_open_workbooks = workbooks_currently_open(app)
+        return workbooks_open_at_onset.new_since(currently_open_workbooks)
+
     paths_for_workbooks_open_at_onset = set(wb.FullName for wb in workbooks_open_at_onset)
 
-    currently_open_workbooks = workbooks_currently_open(app)
+    if currently_open_workbooks is None:
+        currently_open_workbooks = workbooks_currently_open(app)
     paths_for_currently_open_workbooks = set(wb.FullName for wb in currently_open_workbooks)
 
     paths_for_new_workbooks = paths_for_currently_open_workbooks - paths_for_workbooks_open_at_onset
@@ -99,29 +156,169 @@ def close_workbooks(app: 'win32com.client.Dispatch("Excel.Application")', workbo
         app.DisplayAlerts = 0
         wb.Close(SaveChanges=False)
         app.DisplayAlerts = 1
+        metrics.WORKBOOKS_CLOSED.inc()
+        _forget_workbook_handle(wb)
+
+
+def _normalize_path(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _workbook_handle_cache() -> dict:
+    handles = getattr(_workbook_handles, "handles", None)
+    if handles is None:
+        handles = _workbook_handles.handles = {}
+    return handles
+
+
+def _forget_instance(hwnd: int) -> None:
+    """
+    Drops everything cached about the Excel instance with main window `hwnd`, for use once that instance is gone
+    """
+    _addin_cache.pop(hwnd, None)
+    handles = _workbook_handle_cache()
+    for key in [key for key in handles if key[0] == hwnd]:
+        del handles[key]
+
+
+def _check_open_mode(wb, read_only: bool):
+    """
+    :return: Workbook COM object - `wb` itself, if it is open in the mode asked for
+    """
+    if bool(wb.ReadOnly) != bool(read_only):
+        raise ExcelError(f"{wb.FullName} is already open {'read-only' if wb.ReadOnly else 'for editing'}, close it before "
+                         f"opening it {'read-only' if read_only else 'for editing'}")
+    return wb
+
+
+def _forget_workbook_handle(wb) -> None:
+    handles = _workbook_handle_cache()
+    for key, handle in list(handles.items()):
+        # comparing COM objects is answered locally, without a round trip to Excel
+        if handle == wb:
+            del handles[key]
+
+
+def open_workbook(
+        app: 'win32com.client.Dispatch("Excel.Application")',
+        path: str,
+        read_only: bool = False,
+        update_links: int = 0,
+        add_to_mru: bool = False,
+        password: str = None,
+):
+    """
+    Opens a workbook with defaults chosen for automation speed rather than for a person at the keyboard: external links are
+    not updated, the file is not added to the recently used list, and events (`Workbook_Open` macros and the like) are
+    switched off while it opens. If the file is already open in `app` the existing workbook is returned instead of
+    reopening it, provided it is open in the `read_only` mode asked for. Otherwise an `ExcelError` is raised, rather than
+    handing back a workbook that can be written to when a read-only one was asked for, or the other way around. The other
+    options only apply when the file is actually opened. Workbooks opened inside a `with safexl.application()` block are
+    cleaned up like any other new workbook, while a workbook that was already open before the block is handed back as is,
+    and left open.
+    :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
+    :param path: str - Filepath of the workbook to open
+    :param read_only: Optional bool - Defaults to `False`
+    :param update_links: Optional int - Defaults to 0, don't update external references. 3 updates them
+    :param add_to_mru: Optional bool - Defaults to `False`
+    :param password: Optional str - Password required to open a protected workbook
+    :return: Workbook COM object
+    """
+    return _open_workbook(app, path, read_only, update_links, add_to_mru, password)[0]
+
+
+def _open_workbook(
+        app: 'win32com.client.Dispatch("Excel.Application")',
+        path: str,
+        read_only: bool = False,
+        update_links: int = 0,
+        add_to_mru: bool = False,
+        password: str = None,
+) -> tuple:
+    """
+    `open_workbook`, also telling whether it opened the workbook
+    :return: tuple - (Workbook COM object, `True` if it was opened by this call rather than found already open)
+    """
+    full_name = _normalize_path(path)
+    key = (app.Hwnd, full_name)
+    handles = _workbook_handle_cache()
+    wb = handles.get(key)
+    if wb is not None:
+        try:
+            if _normalize_path(wb.FullName) == full_name:
+                return _check_open_mode(wb, read_only), False
+        except pywintypes.com_error:
+            # closed by hand since it was opened
+            pass
+        del handles[key]
+
+    try:
+        # open workbooks can be found by file name alone, it's cheaper to ask than to iterate over all of them
+        wb = app.Workbooks(os.path.basename(full_name))
+        if _normalize_path(wb.FullName) == full_name:
+            handles[key] = wb
+            return _check_open_mode(wb, read_only), False
+    except pywintypes.com_error:
+        pass
+
+    open_kwargs = {
+        "Filename": full_name,
+        "UpdateLinks": update_links,
+        "ReadOnly": read_only,
+        "AddToMru": add_to_mru,
+        "IgnoreReadOnlyRecommended": True,
+        "Notify": False,
+    }
+    if password is not None:
+        open_kwargs["Password"] = password
+
+    enable_events = app.EnableEvents
+    app.EnableEvents = False
+    try:
+        wb = app.Workbooks.Open(**open_kwargs)
+    finally:
+        app.EnableEvents = enable_events
+    handles[key] = wb
+    return wb, True
 
 
 def see_excel(workbooks: iter, window_state: int) -> None:
     """
-    Makes every window of every workbook passed visible, will ignore the PERSONAL workbook and anything else in your StartupPath
-    :param workbooks: iterable - Full of workbook COM objects whose windows you wish to maximize, minimize, or normalize
+    Makes every window of every workbook passed visible, will ignore the PERSONAL workbook and anything else in your StartupPath.
+    Screen updating is suspended while the windows are adjusted, and windows already in the desired state are left alone,
+    so that a repaint is not paid for every window.
+    :param workbooks: iterable - Full of workbook COM objects whose windows you wish to maximize, minimize, or normalize,
+                                 all belonging to the same Excel instance
     :param window_state: int - xl_constant for Window.WindowState, available options include:
                                  * safexl.xl_constants.xlMaximized = -4137
                                  * safexl.xl_constants.xlMinimized = -4140
                                  * safexl.xl_constants.xlNormal = -4143
     :return: None
     """
-    for wb in workbooks:
-        wb.Application.Visible = True
-
-        # Ignore changing the visibility of any workbooks you have set to open in your StartupPath
-        # such as the PERSONAL.XLSB
-        if wb.Application.StartupPath in wb.FullName:
-            continue
-
-        for window in wb.Windows:
-            window.Visible = True
-            window.WindowState = window_state
+    workbooks = list(workbooks)
+    if not workbooks:
+        return
+
+    app = workbooks[0].Application
+    if not app.Visible:
+        app.Visible = True
+    startup_path = app.StartupPath
+    screen_updating = app.ScreenUpdating
+    app.ScreenUpdating = False
+    try:
+        for wb in workbooks:
+            # Ignore changing the visibility of any workbooks you have set to open in your StartupPath
+            # such as the PERSONAL.XLSB
+            if startup_path in wb.FullName:
+                continue
+
+            for window in wb.Windows:
+                if not window.Visible:
+                    window.Visible = True
+                if window.WindowState != window_state:
+                    window.WindowState = window_state
+    finally:
+        app.ScreenUpdating = screen_updating
 
 
 def workbooks_currently_open(app: 'win32com.client.Dispatch("Excel.Application")') -> list:
@@ -131,7 +328,79 @@ def workbooks_currently_open(app: 'win32com.client.Dispatch("Excel.Application")
     :return: list - Full of workbook COM objects currently open in Excel. Note that prior to saving a file it is given a generic
                     non-path such as 'Book1', 'Book2', etc.
     """
-    return [wb for wb in app.Workbooks]
+    workbooks = app.Workbooks
+    count = workbooks.Count
+    if not count:
+        return []
+    enum = workbooks._NewEnum()
+    if enum is None:
+        return [wb for wb in workbooks]
+    # Plain iteration costs one round trip to Excel per workbook, asking the enumerator for all of them costs one in total
+    result = []
+    while len(result) < count:
+        batch = enum.Next(count - len(result))
+        if not batch:
+            break
+        result.extend(batch)
+    return result
+
+
+class WorkbookSnapshot:
+    """
+    Cheap record of the workbooks open at a point in time: their count and their COM objects ("handles").
+    Comparing handles is answered by the local COM proxy without a round trip to Excel, so the set of `FullName`s,
+    which costs one round trip per workbook, is only read from Excel if it is actually needed to tell two states apart.
+    """
+    def __init__(self, workbooks: iter = ()):
+        self.handles = list(workbooks)
+        self.count = len(self.handles)
+        self._full_names = None
+
+    @classmethod
+    def take(cls, app: 'win32com.client.Dispatch("Excel.Application")') -> 'WorkbookSnapshot':
+        """
+        :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
+        :return: WorkbookSnapshot - Of the workbooks currently open in `app`
+        """
+        return cls(workbooks_currently_open(app))
+
+    @property
+    def full_names(self) -> set:
+        """
+        `FullName` of every workbook in the snapshot that is still open, read from Excel the first time it is asked for
+        """
+        if self._full_names is None:
+            full_names = set()
+            for wb in self.handles:
+                try:
+                    full_names.add(wb.FullName)
+                except pywintypes.com_error:
+                    # closed since the snapshot was taken
+                    pass
+            self._full_names = full_names
+        return self._full_names
+
+    def new_since(self, currently_open_workbooks: list) -> list:
+        """
+        :param currently_open_workbooks: list - Result of `workbooks_currently_open(app)`
+        :return: list - Workbooks in `currently_open_workbooks` that were not open when the snapshot was taken
+        """
+        candidates = [wb for wb in currently_open_workbooks if wb not in self.handles]
+        if len(currently_open_workbooks) - len(candidates) == self.count:
+            # every workbook in the snapshot is still open, so anything else is new
+            return candidates
+        # A workbook from the snapshot was closed since, and may have been reopened as a new COM object,
+        # which only its path can tell apart from a genuinely new workbook
+        return [wb for wb in candidates if wb.FullName not in self.full_names]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.handles)
+
+    def __contains__(self, wb):
+        return wb in self.handles
 
 
 def last_row(worksheet) -> int:
@@ -158,18 +427,148 @@ def last_column(worksheet) -> int:
     return worksheet.Range("A1").CurrentRegion.Columns.Count
 
 
-def worksheet_name_sanitization(worksheet_name: str) -> str:
+def _addin_is_loaded(app: 'win32com.client.Dispatch("Excel.Application")', add_in) -> bool:
     """
-    Tool to cleanse worksheet names of common problems
-    :param worksheet_name: str - String of name you're about to assign to a worksheet
-    :return: str - String that won't cause an error when assigned to a worksheet. Note this function will throw an error
-                   itself if the result of removing the invalid worksheet name characters leaves you with an empty string only
+    Checks whether an installed add-in is actually loaded in `app`, without reloading it
+    :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
+    :param add_in: Excel AddIn COM object, from `app.AddIns`
+    :return: bool
     """
-    for char in ("\\", "/", "*", "[", "]", ":", "?"):
-        worksheet_name = worksheet_name.replace(char, "")
-    if not worksheet_name:
-        raise ExcelError("Worksheet name cannot be empty string")
-    return worksheet_name[:31]
+    if add_in.Name.lower().endswith(".xll"):
+        # .xll add-ins are DLLs, not workbooks, and show up among the registered functions once loaded
+        full_name = add_in.FullName.lower()
+        registered_functions = app.RegisteredFunctions or ()
+        return any(str(row[0]).lower() == full_name for row in registered_functions)
+    try:
+        # add-in workbooks are hidden from iterating `app.Workbooks`, but can still be found by name once loaded
+        app.Workbooks(add_in.Name)
+        return True
+    except pywintypes.com_error:
+        return False
+
+
+def load_addins(app: 'win32com.client.Dispatch("Excel.Application")', allowlist: iter = None) -> list:
+    """
+    Loads the installed add-ins that an instance created from code did not load on its own (see the `include_addins`
+    parameter of `application` for the background). Add-ins already loaded are left alone, and which add-ins are loaded
+    is remembered per instance, so calling this again on the same instance does no work unless the add-ins have changed.
+    :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
+    :param allowlist: Optional iterable - Names of the add-ins to consider, ex: ["Solver.xlam"]. Defaults to every installed add-in
+    :return: list - Names of the add-ins that had to be reloaded
+    """
+    allowed = None if allowlist is None else frozenset(name.lower() for name in allowlist)
+    add_ins = app.AddIns
+    add_in_count = add_ins.Count
+    cache = _addin_cache.setdefault(app.Hwnd, {"count": None, "live": set(), "complete": set()})
+    if cache["count"] != add_in_count:
+        # add-ins were added or removed from the list since we last looked
+        cache["count"] = add_in_count
+        cache["live"].clear()
+        cache["complete"].clear()
+    if allowed in cache["complete"]:
+        return []
+
+    reloaded = []
+    for add_in in add_ins:
+        name = add_in.Name
+        if allowed is not None and name.lower() not in allowed:
+            continue
+        if name in cache["live"] or not add_in.Installed:
+            continue
+        if not _addin_is_loaded(app, add_in):
+            # Excel Application oddity where addins are not visible on the ribbon even when installed
+            # when app instance is created via code. Thankfully the `.Installed` attribute remains intact,
+            # and to make your addins show up on the ribbon, you must turn the installed addins off and then on again...
+            add_in.Installed = False
+            add_in.Installed = True
+            reloaded.append(name)
+        cache["live"].add(name)
+    cache["complete"].add(allowed)
+    return reloaded
+
+
+def _co_initialize() -> None:
+    """
+    Reference-counted `pythoncom.CoInitialize()`, only the first caller on each thread actually initializes COM
+    """
+    count = getattr(_com_state, "count", 0)
+    if count == 0:
+        pythoncom.CoInitialize()
+    _com_state.count = count + 1
+
+
+def _co_uninitialize() -> None:
+    """
+    Reference-counted `pythoncom.CoUninitialize()`, only the last caller on each thread actually tears COM down
+    """
+    _com_state.count -= 1
+    if _com_state.count == 0:
+        pythoncom.CoUninitialize()
+
+
+@contextmanager
+def com_apartment() -> None:
+    """
+    Keeps the COM apartment of the current thread alive for the duration of the `with` block.
+    Every safexl entry point initializes COM through the same per-thread reference count, so nested `application()` blocks
+    no longer tear COM down underneath an outer block, and wrapping a loop of short sessions like so:
+        with safexl.com_apartment():
+            for path in paths:
+                with safexl.application(kill_after=False) as app:
+                    ...
+    initializes the apartment once for the whole loop, instead of once per session.
+    :return: None
+    """
+    _co_initialize()
+    try:
+        yield
+    finally:
+        _co_uninitialize()
+
+
+def _cached_application() -> 'win32com.client.Dispatch("Excel.Application")':
+    """
+    Returns the application object kept alive on this thread by `application(keep_alive=True)`, or None if there isn't one
+    or if the instance behind it has since been closed
+    """
+    _app = getattr(_session_cache, "app", None)
+    if _app is None:
+        return None
+    try:
+        # cheapest round trip available, fails with a pywintypes.com_error if the user has closed Excel in the meantime
+        _app.Hwnd
+    except pywintypes.com_error:
+        release_application()
+        return None
+    return _app
+
+
+def release_application() -> None:
+    """
+    Drops the application object and workbook snapshot kept alive on this thread by `application(keep_alive=True)`.
+    Excel itself is left running, this only releases safexl's hold on it (and on this thread's COM apartment).
+    :return: None
+    """
+    if getattr(_session_cache, "app", None) is None:
+        return
+    _session_cache.app = None
+    _session_cache.workbooks = None
+    _session_cache.opened = None
+    _co_uninitialize()
+
+
+def _opened_by_sessions() -> list:
+    """
+    :return: list - Workbook COM objects opened by this thread's `application(keep_alive=True)` blocks in the kept
+                    application object, and still open when the last of those blocks ended
+    """
+    return getattr(_session_cache, "opened", None) or []
+
+
+def _record_session_failure(e: Exception) -> None:
+    metrics.SESSIONS_FAILED.inc()
+    if isinstance(e, pywintypes.com_error):
+        metrics.COM_ERRORS.inc(hresult=metrics.format_hresult(e.hresult))
 
 
 @contextmanager
@@ -177,6 +576,9 @@ def application(
         kill_after: bool,
         maximize: bool = True,
         include_addins: bool = False,
+        retry_deadline: float = None,
+        keep_alive: bool = False,
+        cache_properties: bool = False,
 ) -> 'win32com.client.Dispatch("Excel.Application")':
     """
     Wrapper for the pywin32 interface for handling programmatic access to the Excel Application from Python on Windows.
@@ -209,6 +611,32 @@ def application(
                                            set `kill_after=True` it doesn't matter what value `include_addins` is, as that part of
                                            the code will not be executed. Please note there is a performance hit taken by setting
                                            this parameter to `True`, especially if you or your user has many addins installed.
+                                           To keep that hit small, only the add-ins that are not already loaded are reloaded,
+                                           and a warm instance that has already had its add-ins loaded is skipped entirely.
+                                           You may also pass an iterable of add-in names instead of `True`, ex: ["Solver.xlam"],
+                                           to only load those. See `safexl.load_addins` for more.
+    :param retry_deadline: Optional float - Defaults to `None`. When Excel is busy (a modal dialog is up, a cell is in edit mode,
+                                            a long recalculation is running, etc.) it rejects COM calls with the error
+                                            "Call was rejected by callee." which would normally abort your `with` block.
+                                            Passing a number of seconds here yields an application object that retries those
+                                            rejected calls with exponential backoff & jitter, and gives up once a single call
+                                            has been rejected for longer than `retry_deadline` seconds. The yielded object
+                                            is then a `safexl.RetryingDispatch`, which behaves the same as the bare COM object.
+    :param keep_alive: Optional bool - Defaults to `False`. Meant for code that opens many short sessions on the same thread,
+                                       such as a request handler. When `True`, the application object and the snapshot of
+                                       open workbooks are kept after the `with` block ends, and the next `application()`
+                                       call on this thread with `keep_alive=True` reuses them instead of searching the
+                                       process list and dispatching again. The kept snapshot is checked against the
+                                       workbooks open at the start of each block, in a single round trip, so workbooks
+                                       opened or closed by hand in between are never mistaken for the block's own. Cleanup
+                                       still applies per block, so only the workbooks opened inside the block that errored
+                                       are closed.
+                                       Call `safexl.release_application()` to let go of the kept application object.
+    :param cache_properties: Optional bool - Defaults to `False`. When `True`, the yielded object is a `safexl.CachingDispatch`
+                                             that remembers effectively immutable properties (`FullName`, `Name`, `Path`,
+                                             `StartupPath`, etc., see `safexl.CACHED_PROPERTIES`) of every object reached
+                                             through it for the rest of the block, forgetting them again on `SaveAs` or
+                                             renames. Hit rates are available from `app.cache_stats`.
     :return: win32com.client.Dispatch("Excel.Application") - Wrapped to follow best practices and clean up after itself
              Note, I specifically chose `Dispatch` over both `DispatchEx` and `EnsureDispatch` to avoid some odd bugs
              that can crop up with those methods, as discussed further on SO:
@@ -216,26 +644,54 @@ def application(
                * https://stackoverflow.com/questions/22930751/autofilter-method-of-range-class-failed-dispatch-vs-ensuredispatch
 
     """
-    open_at_onset = is_excel_open()
-    pythoncom.CoInitialize()
-    _app = win32com.client.Dispatch("Excel.Application")
-    if open_at_onset:
-        workbooks_open_at_onset = workbooks_currently_open(_app)
-    else:
-        workbooks_open_at_onset = []
+    metrics.SESSIONS_STARTED.inc()
+    session_start = time.perf_counter()
+    _co_initialize()
+    try:
+        _app = _cached_application() if keep_alive else None
+        if _app is not None:
+            workbooks_open_at_onset = _session_cache.workbooks
+            currently_open_workbooks = workbooks_currently_open(_app)
+            if (len(currently_open_workbooks) != workbooks_open_at_onset.count
+                    or any(wb not in workbooks_open_at_onset for wb in currently_open_workbooks)):
+                # workbooks were opened or closed by hand since the last block, so the snapshot is stale. Comparing
+                # handles rather than the count alone also catches one workbook closed and another opened in its place
+                workbooks_open_at_onset = WorkbookSnapshot(currently_open_workbooks)
+        else:
+            open_at_onset = is_excel_open()
+            _app = win32com.client.Dispatch("Excel.Application")
+            if open_at_onset:
+                workbooks_open_at_onset = WorkbookSnapshot.take(_app)
+            else:
+                workbooks_open_at_onset = WorkbookSnapshot()
+    except BaseException as e:
+        # nothing was opened yet to clean up, but this thread's hold on its COM apartment has to be let go of
+        _app = None
+        _co_uninitialize()
+        if isinstance(e, Exception):
+            _record_session_failure(e)
+        raise
 
     try:
         # For use inside a `with` block, with exceptions caught and cleaned up for you
-        yield _app
+        yielded_app = _app
+        if retry_deadline is not None:
+            yielded_app = RetryingDispatch(yielded_app, RetryPolicy(deadline=retry_deadline))
+        if cache_properties:
+            yielded_app = CachingDispatch(yielded_app)
+        yield yielded_app
 
     except Exception as e:
         err_msg = e
+        _record_session_failure(e)
 
     else:
         err_msg = ""
 
     finally:
-        workbooks_opened_during_with_block = new_workbooks(_app, workbooks_open_at_onset)
+        currently_open_workbooks = workbooks_currently_open(_app)
+        workbooks_opened_during_with_block = new_workbooks(_app, workbooks_open_at_onset, currently_open_workbooks)
+        app_killed = False
         if kill_after or err_msg:
             # If user wants to kill the app after the with block OR if an error occurs
             # close everything that was opened during this `with` block alone
@@ -245,16 +701,11 @@ def application(
             else:
                 # kill the app's entire presence on computer
                 kill_all_instances_of_excel()
+                app_killed = True
         else:
-            # Excel Application oddity where addins are not visible on the ribbon even when installed
-            # when app instance is created via code. Thankfully the `.Installed` attribute remains intact,
-            # and to make your addins show up on the ribbon, you must turn the installed addins off and then on again...
-            # See docstring for links describing the problem, this solution, and more details.
+            # See docstring for links describing the add-in problem, and `load_addins` for the solution
             if include_addins:
-                for add_in in _app.AddIns:
-                    if add_in.Installed:
-                        add_in.Installed = False
-                        add_in.Installed = True
+                load_addins(_app, None if include_addins is True else include_addins)
 
             # Running `see_excel` at the end here
             # makes sure that no Excel instances are left running in the background
@@ -265,11 +716,25 @@ def application(
             else:
                 see_excel(workbooks_opened_during_with_block, -4140)  # xlMinimized
 
+        if keep_alive and not app_killed:
+            if getattr(_session_cache, "app", None) is None:
+                # the kept application object holds its own reference on this thread's COM apartment
+                _co_initialize()
+            _session_cache.app = _app
+            opened_before = getattr(_session_cache, "opened", None) or ()
+            if kill_after or err_msg:
+                still_open = [wb for wb in currently_open_workbooks if wb not in workbooks_opened_during_with_block]
+                _session_cache.opened = [wb for wb in still_open if wb in opened_before]
+            else:
+                still_open = currently_open_workbooks
+                _session_cache.opened = [wb for wb in still_open
+                                         if wb in opened_before or wb in workbooks_opened_during_with_block]
+            _session_cache.workbooks = WorkbookSnapshot(still_open)
+        elif app_killed:
+            release_application()
+
         del _app
-        pythoncom.CoUninitialize()
+        _co_uninitialize()
+        metrics.SESSION_DURATION.observe(time.perf_counter() - session_start)
         if err_msg:
             raise ExcelError(err_msg)
-
-
-class ExcelError(Exception):
-    pass
@@ -0,0 +1,230 @@
+# Copyright (c) 2020 safexl
+import atexit
+import csv
+import os
+import tempfile
+import threading
+import pywintypes
+import safexl.address as address
+import safexl.xl_constants as xl_constants
+
+__all__ = [
+    'write_range',
+    'read_range',
+    'read_sparse',
+    'temp_files',
+    'cleanup_temp_files',
+]
+
+# Cells sent per `Value2` assignment on the COM path, which keeps the SAFEARRAY built for each one a manageable size
+CHUNK_CELLS = 250_000
+UTF8_CODE_PAGE = 65001
+# Share of non-empty cells below which `read_sparse` reads only the non-empty areas rather than the whole block
+SPARSE_FILL_RATIO = 0.1
+TEMP_FILE_PREFIX = "safexl-"
+
+# temporary text files written for Excel to import, removed once imported, or at exit if Excel still had them open
+_temp_files = set()
+_temp_files_lock = threading.Lock()
+
+
+def temp_files() -> list:
+    """
+    :return: list - Filepaths of the temporary text files `write_range` has written that are still on disk
+    """
+    with _temp_files_lock:
+        return sorted(path for path in _temp_files if os.path.exists(path))
+
+
+def cleanup_temp_files() -> list:
+    """
+    Deletes the temporary text files `write_range` has written, for the rare case that Excel still had one open
+    when it was done with it (ex: the import failed). Runs by itself when Python exits.
+    :return: list - Filepaths that could not be deleted yet, because Excel still has them open
+    """
+    remaining = []
+    with _temp_files_lock:
+        for path in list(_temp_files):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                remaining.append(path)
+                continue
+            _temp_files.discard(path)
+    return remaining
+
+
+atexit.register(cleanup_temp_files)
+
+
+def _as_rows(data) -> list:
+    if hasattr(data, "tolist"):
+        data = data.tolist()
+    return [tuple(row) for row in data]
+
+
+def write_range(worksheet, data, top_left="A1", via_text: bool = False) -> str:
+    """
+    Writes a block of values to a worksheet, sent over COM with one `Value2` assignment per chunk of rows, so that the
+    values land exactly as given.
+    With `via_text=True` the block is instead written to a temporary tab delimited file that Excel imports itself with
+    `Workbooks.OpenText`, then copied into place inside Excel, which for millions of cells is far faster than marshalling
+    every value across COM. The catch is that every value then goes through Excel's own text parsing, the same as typing
+    it in, so ex: the text '00123' lands as the number 123 and '2020-01-31' as a date, and the cells also take on the
+    formats the import gave them. Only ask for it when the data holds nothing Excel would read differently.
+    Blocks with a line break inside a text value are always sent over COM, as the import would split them into rows.
+    :param worksheet: Worksheet COM object
+    :param data: Rows of values, as a list of lists (or tuples), numpy array, etc. All rows must be the same length.
+    :param top_left: Optional str or tuple - Defaults to 'A1'. Top left cell to write to, as an A1 style address
+                                             or a (row, column) tuple
+    :param via_text: Optional bool - Defaults to `False`. `True` has Excel import the block from a text file, see above
+    :return: str - A1 style address of the block written
+    """
+    rows = _as_rows(data)
+    if not rows or not rows[0]:
+        return ""
+    width = len(rows[0])
+    if any(len(row) != width for row in rows):
+        raise ValueError("All rows must be the same length")
+    if isinstance(top_left, tuple):
+        first_row, first_column = top_left
+    else:
+        first_row, first_column, _, _ = address.parse(top_left)
+    target = address.area(first_row, first_column, first_row + len(rows) - 1, first_column + width - 1)
+
+    if via_text and not _has_line_breaks(rows):
+        _write_via_text(worksheet, rows, target)
+    else:
+        rows_per_chunk = max(1, CHUNK_CELLS // width)
+        for start in range(0, len(rows), rows_per_chunk):
+            chunk = rows[start:start + rows_per_chunk]
+            chunk_area = address.area(first_row + start, first_column,
+                                      first_row + start + len(chunk) - 1, first_column + width - 1)
+            worksheet.Range(chunk_area).Value2 = tuple(chunk)
+    return target
+
+
+def _has_line_breaks(rows: list) -> bool:
+    return any(isinstance(value, str) and ("\n" in value or "\r" in value) for row in rows for value in row)
+
+
+def read_range(worksheet, cell_range: str = None) -> list:
+    """
+    Reads a block of values from a worksheet in a single round trip
+    :param worksheet: Worksheet COM object
+    :param cell_range: Optional str - A1 style address of the block to read, ex: 'A1:D100', defaults to the used range
+    :return: list - Of tuples, one per row, with None for empty cells, floats for numbers and datetimes for dates
+    """
+    rng = worksheet.UsedRange if cell_range is None else worksheet.Range(cell_range)
+    values = rng.Value
+    if not isinstance(values, tuple):
+        # a single cell comes back as a bare value
+        return [(values,)]
+    return list(values)
+
+
+def _special_areas(rng, cell_type: int) -> list:
+    try:
+        cells = rng.SpecialCells(cell_type)
+    except pywintypes.com_error:
+        # Excel raises rather than returning nothing when no cell is of that type
+        return []
+    return list(cells.Areas)
+
+
+def read_sparse(worksheet, cell_range: str = None, fill_ratio: float = SPARSE_FILL_RATIO, coo: bool = False):
+    """
+    Reads only the non-empty cells of a worksheet, for sheets with a little data scattered over a large used range.
+    When less than `fill_ratio` of the range holds anything, Excel is asked for just the cells holding constants and
+    formulas (`SpecialCells`) and each resulting area is read as its own block. Otherwise one dense read of the whole
+    range is cheaper, and its empty cells are dropped afterwards.
+    :param worksheet: Worksheet COM object
+    :param cell_range: Optional str - A1 style address of the block to read, ex: 'A1:Z50000', defaults to the used range
+    :param fill_ratio: Optional float - Defaults to 0.1. Share of non-empty cells below which the sparse path is used
+    :param coo: Optional bool - Defaults to `False`. `True` returns (rows, columns, values) lists instead of a dict,
+                                ready for ex: `scipy.sparse.coo_matrix`
+    :return: dict - (row, column) -> value of every non-empty cell, in row then column order. Row and column numbers are
+                    those of the worksheet, not offsets into `cell_range`
+    """
+    rng = worksheet.UsedRange if cell_range is None else worksheet.Range(cell_range)
+    filled = worksheet.Application.WorksheetFunction.CountA(rng)
+    total = rng.CountLarge
+    cells = {}
+    # `SpecialCells` on a single cell searches the whole sheet instead, so that is always read directly
+    if total > 1 and filled < fill_ratio * total:
+        for area in _special_areas(rng, xl_constants.xlCellTypeConstants) + _special_areas(rng, xl_constants.xlCellTypeFormulas):
+            _gather(area, cells)
+        if len(cells) < filled:
+            # ex: on a protected sheet `SpecialCells` fails outright
+            cells = {}
+    if not cells and filled:
+        _gather(rng, cells)
+    cells = dict(sorted(cells.items()))
+    if coo:
+        return [row for row, _ in cells], [column for _, column in cells], list(cells.values())
+    return cells
+
+
+def _gather(rng, cells: dict) -> None:
+    first_row, first_column = rng.Row, rng.Column
+    values = rng.Value
+    if not isinstance(values, tuple):
+        values = ((values,),)
+    for i, row in enumerate(values, first_row):
+        for j, value in enumerate(row, first_column):
+            if value is not None:
+                cells[i, j] = value
+
+
+def _write_text_file(rows: list) -> str:
+    fd, path = tempfile.mkstemp(prefix=TEMP_FILE_PREFIX, suffix=".txt")
+    with _temp_files_lock:
+        _temp_files.add(path)
+    # `.txt` rather than `.csv`, as Excel ignores the delimiter settings of `OpenText` for files ending in `.csv`
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, delimiter="\t", lineterminator="\r\n").writerows(
+            ["" if value is None else value for value in row] for row in rows
+        )
+    return path
+
+
+def _write_via_text(worksheet, rows: list, target: str) -> None:
+    app = worksheet.Application
+    path = _write_text_file(rows)
+    try:
+        app.Workbooks.OpenText(
+            Filename=path,
+            Origin=UTF8_CODE_PAGE,
+            StartRow=1,
+            DataType=xl_constants.xlDelimited,
+            TextQualifier=xl_constants.xlTextQualifierDoubleQuote,
+            ConsecutiveDelimiter=False,
+            Tab=True,
+            DecimalSeparator=".",
+            ThousandsSeparator=",",
+            Local=False,
+        )
+        # OpenText returns nothing, the imported file is the active workbook
+        text_wb = app.ActiveWorkbook
+        try:
+            source = text_wb.Worksheets(1).Range("A1").Resize(len(rows), len(rows[0]))
+            # copying with a destination stays inside Excel and leaves the clipboard alone
+            source.Copy(Destination=worksheet.Range(target))
+        finally:
+            app.DisplayAlerts = 0
+            text_wb.Close(SaveChanges=False)
+            app.DisplayAlerts = 1
+    finally:
+        _remove_temp_file(path)
+
+
+def _remove_temp_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        # still held by Excel, `cleanup_temp_files` gets it later
+        return
+    with _temp_files_lock:
+        _temp_files.discard(path)
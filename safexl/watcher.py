@@ -0,0 +1,231 @@
+# Copyright (c) 2020 safexl
+import queue
+import threading
+import time
+import pythoncom
+import win32com.client
+import safexl.address as address
+import safexl.metrics as metrics
+from safexl.events import AppEvents, DISPID_SHEET_CALCULATE, DISPID_SHEET_CHANGE
+from safexl.toolkit import _co_initialize, _co_uninitialize
+
+__all__ = [
+    'ChangeBatch',
+    'SheetWatcher',
+    'watch',
+]
+
+# Dirty rectangles kept per sheet in one batch, past which they are replaced by the single rectangle around them all
+MAX_AREAS = 100
+# Seconds between checks for new events on the watcher thread
+PUMP_INTERVAL = 0.02
+
+WATCH_EVENTS = metrics.Counter(
+    "safexl_watch_events_total", "`SheetChange` and `SheetCalculate` events received by `safexl.watch`, by event.",
+    labelnames=("event",), registry=metrics.REGISTRY)
+WATCH_BATCHES = metrics.Counter(
+    "safexl_watch_batches_total", "Batches of changes delivered by `safexl.watch`.", registry=metrics.REGISTRY)
+
+
+class ChangeBatch:
+    """
+    Everything that changed during one burst of events, as delivered by `safexl.watch`.
+    Sheets are identified by (workbook name, worksheet name) tuples, ex: ('Book1.xlsx', 'Sheet1').
+    """
+    def __init__(self, areas: dict, calculated: set, events: int):
+        """
+        :param areas: dict - Sheet -> (first_row, first_column, last_row, last_column) rectangles edited on it, merged with
+                             `safexl.address.merge_areas`
+        :param calculated: set - Sheets recalculated, where any formula cell may now hold a different value
+        :param events: int - Events received for this batch, before merging
+        """
+        self.areas = areas
+        self.calculated = calculated
+        self.events = events
+
+    def addresses(self, sheet: tuple) -> list:
+        """
+        :param sheet: tuple - (workbook name, worksheet name)
+        :return: list - A1 style addresses of the rectangles edited on that sheet
+        """
+        return [address.area(*rectangle) for rectangle in self.areas.get(sheet, ())]
+
+    def __repr__(self) -> str:
+        return f"ChangeBatch(areas={self.areas!r}, calculated={self.calculated!r}, events={self.events})"
+
+
+def _sheet(worksheet) -> tuple:
+    return worksheet.Parent.Name, worksheet.Name
+
+
+class _SheetEvents(AppEvents):
+    """
+    Sink for the Application's sheet events, which run on the watcher thread while it pumps messages
+    """
+    _dispid_to_func_ = {DISPID_SHEET_CHANGE: "OnSheetChange", DISPID_SHEET_CALCULATE: "OnSheetCalculate"}
+
+    def __init__(self, app, watcher: 'SheetWatcher'):
+        self.watcher = watcher
+        super().__init__(app)
+
+    def OnSheetChange(self, worksheet, target):
+        WATCH_EVENTS.inc(event="change")
+        # `Address` is absolute and can hold several areas, ex: '$A$1:$B$2,$D$4', or whole columns, ex: '$C:$C'
+        self.watcher._record(_sheet(worksheet), [address.parse(area) for area in target.Address.split(",")])
+
+    def OnSheetCalculate(self, worksheet):
+        WATCH_EVENTS.inc(event="calculate")
+        if self.watcher.include_calculate:
+            self.watcher._record(_sheet(worksheet), calculated=True)
+
+
+class SheetWatcher:
+    """
+    Listens to an Excel instance's `SheetChange` and `SheetCalculate` events on a thread of its own, and hands over what
+    changed in batches, each covering one burst of events. Build one with `safexl.watch`.
+    """
+    def __init__(self, app, callback=None, quiet_period: float = 0.2, max_delay: float = 1.0,
+                 include_calculate: bool = True):
+        """
+        :param app: Excel Application COM object
+        :param callback: Optional callable - Called with each `ChangeBatch`, on the watcher thread. Without one, batches are
+                                             put on `queue` instead. An exception raised by the callback stops the watcher
+                                             and is raised again from `stop()`.
+        :param quiet_period: Optional float - Defaults to 0.2. Seconds without a new event that end a burst
+        :param max_delay: Optional float - Defaults to 1. Seconds after its first event that a batch is delivered anyway,
+                                           so a steady stream of edits is still reported
+        :param include_calculate: Optional bool - Defaults to `True`. Whether recalculated sheets are reported
+        """
+        self.callback = callback
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self.include_calculate = include_calculate
+        self.queue = queue.Queue()
+        self.error = None
+        # only touched on the watcher thread, where the events are delivered
+        self._areas = {}
+        self._calculated = set()
+        self._events = 0
+        self._first_event = self._last_event = None
+        # the Application object belongs to the calling thread's apartment, the watcher thread gets its own proxy to it
+        self._stream = pythoncom.CoMarshalInterThreadInterfaceInStream(pythoncom.IID_IDispatch, app._oleobj_)
+        self._stopping = threading.Event()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="safexl-watch", daemon=True)
+
+    def start(self) -> 'SheetWatcher':
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stops listening, after delivering the changes seen so far
+        :param timeout: Optional float - Defaults to 5. Seconds to wait for the watcher thread to finish
+        :return: None
+        """
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def __enter__(self) -> 'SheetWatcher':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def _record(self, sheet: tuple, areas: list = (), calculated: bool = False) -> None:
+        now = time.perf_counter()
+        if self._first_event is None:
+            self._first_event = now
+        self._last_event = now
+        self._events += 1
+        if areas:
+            self._areas.setdefault(sheet, []).extend(areas)
+        if calculated:
+            self._calculated.add(sheet)
+
+    def _due(self) -> bool:
+        if self._first_event is None:
+            return False
+        now = time.perf_counter()
+        return now - self._last_event >= self.quiet_period or now - self._first_event >= self.max_delay
+
+    def _flush(self) -> None:
+        if self._first_event is None:
+            return
+        areas = {}
+        for sheet, rectangles in self._areas.items():
+            merged = address.merge_areas(rectangles)
+            if len(merged) > MAX_AREAS:
+                merged = [(min(r[0] for r in merged), min(r[1] for r in merged),
+                           max(r[2] for r in merged), max(r[3] for r in merged))]
+            areas[sheet] = merged
+        batch = ChangeBatch(areas, self._calculated, self._events)
+        self._areas, self._calculated, self._events = {}, set(), 0
+        self._first_event = self._last_event = None
+        WATCH_BATCHES.inc()
+        if self.callback is None:
+            self.queue.put(batch)
+        else:
+            self.callback(batch)
+
+    def _run(self) -> None:
+        _co_initialize()
+        app = events = None
+        try:
+            app = win32com.client.Dispatch(
+                pythoncom.CoGetInterfaceAndReleaseStream(self._stream, pythoncom.IID_IDispatch))
+            events = _SheetEvents(app, self)
+            self._ready.set()
+            while not self._stopping.is_set():
+                pythoncom.PumpWaitingMessages()
+                if self._due():
+                    self._flush()
+                self._stopping.wait(PUMP_INTERVAL)
+            pythoncom.PumpWaitingMessages()
+            self._flush()
+        except Exception as e:
+            self.error = e
+        finally:
+            if events is not None:
+                events.close()
+            # released on the thread that created them, before the apartment goes away
+            events = app = None
+            _co_uninitialize()
+            self._ready.set()
+
+
+def watch(app: 'win32com.client.Dispatch("Excel.Application")', callback=None, quiet_period: float = 0.2,
+          max_delay: float = 1.0, include_calculate: bool = True) -> SheetWatcher:
+    """
+    Starts listening for edits and recalculations in every workbook of an Excel instance, so that data mirrored into
+    Python can be invalidated exactly where it changed. Events are gathered on a background thread, and each burst of them
+    (ex: a paste, a fill down, a macro) is delivered as one `ChangeBatch` with the edited rectangles of each sheet merged:
+        def invalidate(batch):
+            for (workbook_name, sheet_name), rectangles in batch.areas.items():
+                cache.drop(workbook_name, sheet_name, rectangles)
+
+        with safexl.watch(app, invalidate):
+            ...
+    Or without a callback, take batches off the watcher's queue:
+        watcher = safexl.watch(app)
+        batch = watcher.queue.get()
+    Note the callback runs on the watcher thread, so it should not use COM objects from other threads. The events are
+    connected to directly rather than through `win32com.client.WithEvents`, so no makepy wrapper is generated and later
+    `Dispatch` calls in your process stay late bound.
+    :param app: Excel Application COM object
+    :param callback: Optional callable - Called with each `ChangeBatch`. Without one, batches are put on `watcher.queue`
+    :param quiet_period: Optional float - Defaults to 0.2. Seconds without a new event that end a burst
+    :param max_delay: Optional float - Defaults to 1. Seconds after its first event that a batch is delivered anyway
+    :param include_calculate: Optional bool - Defaults to `True`. Whether recalculated sheets are reported
+    :return: SheetWatcher - Already started, call `stop()` (or leave its `with` block) to stop listening
+    """
+    return SheetWatcher(app, callback, quiet_period, max_delay, include_calculate).start()
@@ -0,0 +1,180 @@
+# Copyright (c) 2020 safexl
+from collections import OrderedDict
+import threading
+import psutil
+import pywintypes
+import safexl.metrics as metrics
+from safexl.toolkit import close_workbooks, excel_pid, _normalize_path, _open_workbook
+
+__all__ = [
+    'WorkbookCache',
+    'WorkbookCacheStats',
+]
+
+WORKBOOK_CACHE_EVICTIONS = metrics.Counter(
+    "safexl_workbook_cache_evictions_total", "Workbooks closed by a `WorkbookCache` to stay within its limits, by reason.",
+    labelnames=("reason",), registry=metrics.REGISTRY)
+
+
+class WorkbookCacheStats:
+    """
+    Hit, miss and eviction counts for a single `WorkbookCache`
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def evicted(self) -> None:
+        with self._lock:
+            self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self):
+        return (f"<WorkbookCacheStats hits={self.hits} misses={self.misses} "
+                f"evictions={self.evictions} hit_rate={self.hit_rate:.1%}>")
+
+
+class WorkbookCache:
+    """
+    Keeps recently used workbooks open in one Excel instance for reuse, closing the least recently used ones (without
+    saving, through `safexl.close_workbooks`) once there are more than `max_workbooks` of them, or once the instance's
+    resident memory passes `max_rss` bytes. Meant for long running services that touch many files:
+        with safexl.application(kill_after=False, keep_alive=True) as app:
+            cache = safexl.WorkbookCache(app, max_workbooks=20, max_rss=1_500_000_000)
+        ...
+        wb = cache.get(r"C:\\reports\\daily.xlsx", read_only=True)
+    Only workbooks the cache opened itself are ever evicted. Anything else open in the instance is left alone, including
+    a workbook that `get` found already open (ex: the user's own, possibly unsaved), which is handed out but never closed.
+    """
+    def __init__(self, app: 'win32com.client.Dispatch("Excel.Application")', max_workbooks: int = 16, max_rss: int = None):
+        """
+        :param app: win32com.client.Dispatch("Excel.Application") - Programmatic access to Excel application object
+        :param max_workbooks: Optional int - Defaults to 16. Most workbooks kept open at once
+        :param max_rss: Optional int - Defaults to `None`, no limit. Bytes of resident memory the EXCEL.EXE process may use
+                                       before least recently used workbooks are closed, checked each time one is opened
+        """
+        if max_workbooks < 1:
+            raise ValueError("max_workbooks must be at least 1")
+        self.app = app
+        self.max_workbooks = max_workbooks
+        self.max_rss = max_rss
+        self.stats = WorkbookCacheStats()
+        # normalized path -> (workbook, whether the cache opened it), least recently used first
+        self._workbooks = OrderedDict()
+        self._process = psutil.Process(excel_pid(app)) if max_rss is not None else None
+
+    def get(self, path: str, **open_kwargs):
+        """
+        Returns the open workbook at `path`, opening it with `safexl.open_workbook` if it isn't cached yet
+        :param path: str - Filepath of the workbook
+        :param open_kwargs: Optional keyword arguments passed on to `safexl.open_workbook` when the workbook has to be opened,
+                            ex: `read_only=True`. They are not checked against the way a cached workbook was opened.
+        :return: Workbook COM object
+        """
+        key = _normalize_path(path)
+        wb, opened = self._workbooks.get(key, (None, False))
+        if wb is not None:
+            try:
+                # cheap check that the workbook hasn't been closed behind the cache's back (by hand, or by the
+                # cleanup of an `application()` block that errored)
+                wb.Name
+            except pywintypes.com_error:
+                del self._workbooks[key]
+            else:
+                self._workbooks.move_to_end(key)
+                self.stats.hit()
+                return wb
+
+        self.stats.miss()
+        # a workbook that was already open is handed back as is, and isn't the cache's to close
+        wb, opened = _open_workbook(self.app, key, **open_kwargs)
+        self._workbooks[key] = (wb, opened)
+        self._enforce_limits()
+        return wb
+
+    def _evictable(self) -> list:
+        """
+        :return: list - Keys of the workbooks the cache opened itself, least recently used first
+        """
+        return [key for key, (wb, opened) in self._workbooks.items() if opened]
+
+    def _enforce_limits(self) -> None:
+        evictable = self._evictable()
+        while len(evictable) > self.max_workbooks:
+            self._evict(evictable.pop(0), "count")
+        if self._process is not None:
+            # the workbook just opened is never evicted, even if it alone is over the limit
+            rss = self.rss()
+            while len(evictable) > 1 and rss > self.max_rss:
+                self._evict(evictable.pop(0), "memory")
+                previous_rss, rss = rss, self.rss()
+                if rss >= previous_rss:
+                    # Excel doesn't always hand memory back on `Close`, closing more would only empty the cache
+                    break
+
+    def _evict(self, key: str, reason: str) -> None:
+        wb, opened = self._workbooks.pop(key)
+        try:
+            close_workbooks(self.app, [wb])
+        except pywintypes.com_error:
+            # already closed by someone else, which is as good as evicted
+            pass
+        self.stats.evicted()
+        WORKBOOK_CACHE_EVICTIONS.inc(reason=reason)
+
+    def rss(self) -> int:
+        """
+        :return: int - Resident memory of the EXCEL.EXE process behind the cache's application object, in bytes
+        """
+        process = self._process or psutil.Process(excel_pid(self.app))
+        return process.memory_info().rss
+
+    def discard(self, path: str) -> None:
+        """
+        Closes the workbook at `path` without saving, if the cache opened it. A workbook that was already open is only forgotten
+        :param path: str - Filepath of the workbook
+        :return: None
+        """
+        wb, opened = self._workbooks.pop(_normalize_path(path), (None, False))
+        if opened:
+            try:
+                close_workbooks(self.app, [wb])
+            except pywintypes.com_error:
+                pass
+
+    def clear(self) -> None:
+        """
+        Closes every workbook the cache opened, without saving, and forgets the rest
+        :return: None
+        """
+        while self._workbooks:
+            key, (wb, opened) = self._workbooks.popitem(last=False)
+            if not opened:
+                continue
+            try:
+                close_workbooks(self.app, [wb])
+            except pywintypes.com_error:
+                pass
+
+    def __len__(self):
+        return len(self._workbooks)
+
+    def __contains__(self, path: str):
+        return _normalize_path(path) in self._workbooks
+
+    def __repr__(self):
+        return f"<WorkbookCache {len(self)}/{self.max_workbooks} workbooks, {self.stats!r}>"
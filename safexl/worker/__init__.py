@@ -0,0 +1,336 @@
+# Copyright (c) 2020 safexl
+"""
+Local job queue for Excel automation shared by many client scripts, run as:
+    python -m safexl.worker --port 6543 --allow reports
+Clients send importable callables and their arguments with `safexl.worker.submit`, each job runs inside its own
+`safexl.application(kill_after=False, keep_alive=True)` block, one job at a time, and the result comes back along with
+how long the job waited in the queue and how long it ran.
+Only functions from the modules named with `--allow` are run, and clients must know the server's authkey.
+"""
+import argparse
+import importlib
+import os
+import queue
+import secrets
+import threading
+import time
+import traceback
+from multiprocessing.connection import Client, Listener
+import safexl.metrics as metrics
+from safexl.toolkit import application, release_application, ExcelError
+
+__all__ = [
+    'JobResult',
+    'WorkerBusy',
+    'WorkerServer',
+    'submit',
+]
+
+DEFAULT_ADDRESS = ("127.0.0.1", 6543)
+AUTHKEY_ENVIRONMENT_VARIABLE = "SAFEXL_WORKER_AUTHKEY"
+# Random key written by the server the first time it starts without one, in the current user's own profile folder
+AUTHKEY_FILE = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "safexl", "worker.key")
+
+JOBS = metrics.Counter(
+    "safexl_worker_jobs_total", "Jobs handled by `python -m safexl.worker`, by outcome.",
+    labelnames=("outcome",), registry=metrics.REGISTRY)
+JOB_QUEUE_SECONDS = metrics.Histogram(
+    "safexl_worker_job_queue_seconds", "Time jobs spent waiting in the queue.", registry=metrics.REGISTRY)
+
+
+class WorkerBusy(ExcelError):
+    """
+    Raised by `submit` when the worker is busy and the queue is full, so the job was not accepted
+    """
+    pass
+
+
+class JobResult:
+    """
+    What a job returned, plus the time it spent waiting in the queue and running, in seconds
+    """
+    def __init__(self, value, queued: float, elapsed: float):
+        self.value = value
+        self.queued = queued
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"<JobResult value={self.value!r} queued={self.queued:.3f}s elapsed={self.elapsed:.3f}s>"
+
+
+def _default_authkey(create: bool = False) -> bytes:
+    """
+    :param create: Optional bool - Defaults to `False`. Write a new random key to `AUTHKEY_FILE` if there isn't one yet
+    :return: bytes - The SAFEXL_WORKER_AUTHKEY environment variable if set, else the contents of `AUTHKEY_FILE`
+    """
+    if os.environ.get(AUTHKEY_ENVIRONMENT_VARIABLE):
+        return os.environ[AUTHKEY_ENVIRONMENT_VARIABLE].encode("utf-8")
+    if create and not os.path.exists(AUTHKEY_FILE):
+        os.makedirs(os.path.dirname(AUTHKEY_FILE), exist_ok=True)
+        try:
+            # readable by the current user alone, on Windows the profile folder's own permissions already see to that
+            fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            # another server got there first
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        with open(AUTHKEY_FILE) as f:
+            return f.read().strip().encode("utf-8")
+    except FileNotFoundError:
+        raise ExcelError(f"No worker authkey found, pass `authkey`, set {AUTHKEY_ENVIRONMENT_VARIABLE}, "
+                         f"or start the worker as the same user so that it writes {AUTHKEY_FILE}") from None
+
+
+def _callable_path(func) -> str:
+    if isinstance(func, str):
+        return func
+    if func.__qualname__ != func.__name__ or func.__module__ == "__main__":
+        raise ValueError(f"{func!r} must be a module level function the worker can import, ex: 'package.module:function'")
+    return f"{func.__module__}:{func.__name__}"
+
+
+def _resolve(path: str, allowed_modules: tuple):
+    """
+    :param path: str - 'package.module:function'
+    :param allowed_modules: tuple - Module names jobs may come from, each including its submodules
+    :return: The function itself
+    """
+    module_name, _, func_name = path.partition(":")
+    if not module_name or not func_name:
+        raise ValueError(f"Expected 'package.module:function', got {path!r}")
+    # checked before importing, as importing a module can run code of its own
+    if not any(module_name == allowed or module_name.startswith(allowed + ".") for allowed in allowed_modules):
+        raise PermissionError(f"This worker only runs jobs from {list(allowed_modules)}, not from {module_name!r}")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+class _Job:
+    def __init__(self, connection, request: dict):
+        self.connection = connection
+        self.request = request
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+
+
+class WorkerServer:
+    """
+    Accepts jobs on a local socket and runs them one at a time, on a single thread that keeps its `keep_alive` session
+    warm between jobs. Any job that errors gets the usual `application()` cleanup. While a job runs, up to `max_pending`
+    jobs wait in the queue, and jobs beyond that are turned away right away with `WorkerBusy` rather than piling up.
+    There is deliberately one thread only: `safexl.application` attaches to the running instance of Excel with
+    `win32com.client.Dispatch`, so concurrent jobs would all drive that one instance, which runs their calls one at a time
+    anyway, and the cleanup after one failed job would close the workbooks another job still had open.
+    """
+    def __init__(
+            self,
+            allowed_modules,
+            address: tuple = DEFAULT_ADDRESS,
+            authkey: bytes = None,
+            max_pending: int = 2,
+            application_kwargs: dict = None,
+    ):
+        """
+        :param allowed_modules: list - Names of the modules jobs may be imported from, each including its submodules,
+                                       ex: ['reports'] allows 'reports.daily:build'. Anything else is refused unimported
+        :param address: Optional tuple - Defaults to ('127.0.0.1', 6543). Port 0 picks a free port, see `.address`
+        :param authkey: Optional bytes - Shared secret clients must know, defaults to the SAFEXL_WORKER_AUTHKEY
+                                         environment variable, or a random key kept in `AUTHKEY_FILE`, created if needed
+        :param max_pending: Optional int - Defaults to 2. Jobs allowed to wait while another one runs
+        :param application_kwargs: Optional dict - Passed on to `safexl.application`, ex: {"retry_deadline": 30}
+        """
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        if isinstance(allowed_modules, str):
+            allowed_modules = [allowed_modules]
+        self.allowed_modules = tuple(allowed_modules)
+        if not self.allowed_modules:
+            raise ValueError("allowed_modules must name at least one module jobs may be imported from")
+        self.authkey = authkey or _default_authkey(create=True)
+        self.listener = Listener(address, authkey=self.authkey)
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.application_kwargs = application_kwargs or {}
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._work, name="safexl-worker", daemon=True)
+
+    @property
+    def address(self) -> tuple:
+        return self.listener.address
+
+    def serve_forever(self) -> None:
+        self._thread.start()
+        while not self._stopping.is_set():
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                # listener closed by `shutdown`
+                break
+            except Exception:
+                # a client that failed authentication, keep serving the others
+                continue
+            if self._stopping.is_set():
+                connection.close()
+                break
+            threading.Thread(target=self._handle, args=(connection,), name="safexl-worker-connection", daemon=True).start()
+
+    def shutdown(self) -> None:
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        try:
+            # closing the listener doesn't interrupt a blocked `accept`, a last connection does
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+        self.listener.close()
+        self._put_stop()
+
+    def _put_stop(self) -> None:
+        """
+        Queues the marker that stops the worker thread. Never blocks on a full queue, room is made by turning away jobs
+        that haven't started instead
+        """
+        while True:
+            try:
+                self.jobs.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    continue
+                if job is not None:
+                    self._cancel(job)
+
+    def _cancel(self, job: _Job) -> None:
+        JOBS.inc(outcome="cancelled")
+        try:
+            job.connection.send({"status": "error", "error": "The worker shut down before the job started",
+                                 "traceback": "", "queued": time.perf_counter() - job.submitted, "elapsed": 0.0})
+        except (OSError, EOFError):
+            pass
+        finally:
+            job.done.set()
+
+    def _handle(self, connection) -> None:
+        """ One thread per client connection, which may submit any number of jobs one after the other """
+        with connection:
+            while not self._stopping.is_set():
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                job = _Job(connection, request)
+                try:
+                    self.jobs.put_nowait(job)
+                except queue.Full:
+                    JOBS.inc(outcome="rejected")
+                    connection.send({"status": "busy"})
+                    continue
+                # the worker thread replies on this connection, wait for it before reading the next request
+                job.done.wait()
+
+    def _work(self) -> None:
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                if self._stopping.is_set():
+                    # still queued when `shutdown` was called
+                    self._cancel(job)
+                    continue
+                try:
+                    self._run(job)
+                finally:
+                    job.done.set()
+        finally:
+            release_application()
+
+    def _run(self, job: _Job) -> None:
+        started = time.perf_counter()
+        queued = started - job.submitted
+        JOB_QUEUE_SECONDS.observe(queued)
+        remote_traceback = None
+        try:
+            func = _resolve(job.request["func"], self.allowed_modules)
+            with application(kill_after=False, keep_alive=True, **self.application_kwargs) as app:
+                try:
+                    value = func(app, *job.request.get("args", ()), **job.request.get("kwargs", {}))
+                except Exception:
+                    remote_traceback = traceback.format_exc()
+                    raise
+            reply = {"status": "ok", "value": value}
+        except Exception as e:
+            reply = {"status": "error", "error": f"{type(e).__name__}: {e}",
+                     "traceback": remote_traceback or traceback.format_exc()}
+        reply["queued"] = queued
+        reply["elapsed"] = time.perf_counter() - started
+        JOBS.inc(outcome=reply["status"])
+        try:
+            job.connection.send(reply)
+        except (OSError, EOFError):
+            # the client went away while its job ran
+            pass
+        except Exception as e:
+            # ex: a COM object or anything else that can't be pickled was returned
+            job.connection.send({"status": "error", "error": f"Result could not be sent back: {e}", "traceback": "",
+                                 "queued": reply["queued"], "elapsed": reply["elapsed"]})
+
+
+def submit(func, *args, address: tuple = DEFAULT_ADDRESS, authkey: bytes = None, **kwargs) -> JobResult:
+    """
+    Runs `func(app, *args, **kwargs)` on a `python -m safexl.worker` process and waits for the result
+    :param func: Module level function, or its 'package.module:function' path. The worker imports it by that path, so it
+                 must be importable on the worker's side too, and its first argument is the Excel application object
+    :param args: Optional positional arguments for `func`, which must be picklable, as must its return value
+    :param address: Optional tuple - Defaults to ('127.0.0.1', 6543)
+    :param authkey: Optional bytes - Defaults to the SAFEXL_WORKER_AUTHKEY environment variable, or the key the worker
+                                     wrote to `AUTHKEY_FILE` when run by the same user
+    :param kwargs: Optional keyword arguments for `func`
+    :return: JobResult - With the value `func` returned
+    """
+    request = {"func": _callable_path(func), "args": args, "kwargs": kwargs}
+    with Client(address, authkey=authkey or _default_authkey()) as connection:
+        connection.send(request)
+        reply = connection.recv()
+    if reply["status"] == "busy":
+        raise WorkerBusy("The worker is busy and its queue is full, try again later")
+    if reply["status"] == "error":
+        raise ExcelError(f"{reply['error']}\n\nWorker traceback:\n{reply['traceback']}")
+    return JobResult(reply["value"], reply["queued"], reply["elapsed"])
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m safexl.worker", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0], help="Defaults to %(default)s, local connections only")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1], help="Defaults to %(default)s")
+    parser.add_argument("--allow", action="append", required=True, metavar="MODULE",
+                        help="Module jobs may be imported from, submodules included. Repeat for several")
+    parser.add_argument("--max-pending", type=int, default=2,
+                        help="Jobs allowed to wait while another one runs before new ones are turned away, "
+                             "defaults to %(default)s")
+    parser.add_argument("--retry-deadline", type=float, default=None,
+                        help="Seconds to retry calls Excel rejects as busy, see `safexl.application`")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve safexl.metrics on this port")
+    args = parser.parse_args(argv)
+
+    server = WorkerServer(
+        args.allow,
+        address=(args.host, args.port),
+        max_pending=args.max_pending,
+        application_kwargs={"retry_deadline": args.retry_deadline},
+    )
+    if args.metrics_port is not None:
+        metrics.start_http_server(args.metrics_port)
+    print(f"safexl worker listening on {server.address[0]}:{server.address[1]}, "
+          f"running jobs from {', '.join(server.allowed_modules)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
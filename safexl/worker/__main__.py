@@ -0,0 +1,4 @@
+# Copyright (c) 2020 safexl
+from safexl.worker import main
+
+main()
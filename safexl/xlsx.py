@@ -0,0 +1,562 @@
+# Copyright (c) 2020 safexl
+import datetime
+import math
+import numbers
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ElementTree
+from xml.parsers import expat
+from xml.sax.saxutils import escape, quoteattr
+import safexl.address as address
+import safexl.colors as colors
+
+__all__ = [
+    'read_xlsx',
+    'xlsx_sheet_names',
+    'write_xlsx',
+    'StyledCell',
+]
+
+# Values Excel hands back over COM for error cells, so that both readers agree
+ERROR_CODES = {
+    "#NULL!": -2146826288,
+    "#DIV/0!": -2146826281,
+    "#VALUE!": -2146826273,
+    "#REF!": -2146826265,
+    "#NAME?": -2146826259,
+    "#NUM!": -2146826252,
+    "#N/A": -2146826246,
+}
+# Built in number formats that display a date and/or time, see ECMA-376 Part 1, 18.8.30
+DATE_FORMAT_IDS = frozenset(list(range(14, 23)) + [45, 46, 47])
+# Anything in quotes, brackets (colors, conditions, elapsed time) or escaped can't make a format a date format
+_NOT_DATE_PARTS = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.|_.|\*.')
+# Bytes of sheet XML parsed at a time
+CHUNK_BYTES = 64 * 1024
+# Number formats every copy of Excel knows by ID, the rest are written out in styles.xml
+BUILTIN_NUMBER_FORMATS = {
+    "General": 0,
+    "0": 1,
+    "0.00": 2,
+    "#,##0": 3,
+    "#,##0.00": 4,
+    "0%": 9,
+    "0.00%": 10,
+    "0.00E+00": 11,
+    "@": 49,
+}
+DEFAULT_DATETIME_FORMAT = "yyyy-mm-dd hh:mm:ss"
+DEFAULT_DATE_FORMAT = "yyyy-mm-dd"
+DEFAULT_TIME_FORMAT = "hh:mm:ss"
+# Rows of sheet XML gathered before each write to the zip
+ROWS_PER_WRITE = 1000
+_ILLEGAL_XML_CHARACTERS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_MAIN_NAMESPACE = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_RELATIONSHIPS_NAMESPACE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_EPOCH_1900 = datetime.datetime(1899, 12, 30)
+_EPOCH_1904 = datetime.datetime(1904, 1, 1)
+
+
+def _local(tag: str) -> str:
+    # strips the namespace, which differs between transitional and strict OOXML
+    return tag.rsplit("}", 1)[-1]
+
+
+def _attribute(element, name: str):
+    for key, value in element.attrib.items():
+        if _local(key) == name:
+            return value
+    return None
+
+
+def _is_date_format(format_code: str) -> bool:
+    code = _NOT_DATE_PARTS.sub("", format_code.split(";")[0]).lower()
+    return any(letter in code for letter in "dmyhs")
+
+
+def _to_datetime(serial: float, date1904: bool) -> datetime.datetime:
+    # the same conversion COM applies, which means dates before March 1900 come back a day early, as Excel counts
+    # a 29th of February 1900 that never happened (after Lotus 1-2-3)
+    return (_EPOCH_1904 if date1904 else _EPOCH_1900) + datetime.timedelta(days=serial)
+
+
+class _Workbook:
+    """
+    The parts of a saved workbook needed to read values out of its sheets: sheet names and files, shared strings,
+    which styles are dates, and the date system
+    """
+    def __init__(self, archive: zipfile.ZipFile):
+        self.archive = archive
+        self.sheets = []
+        self.date1904 = False
+        self._read_workbook()
+        self.shared_strings = self._read_shared_strings()
+        self.date_styles = self._read_date_styles()
+
+    def _read_workbook(self) -> None:
+        relationships = {}
+        rels_path = "xl/_rels/workbook.xml.rels"
+        if rels_path in self.archive.namelist():
+            for element in ElementTree.fromstring(self.archive.read(rels_path)):
+                target = element.get("Target", "")
+                if target.startswith("/"):
+                    target = target.lstrip("/")
+                else:
+                    target = posixpath.normpath(posixpath.join("xl", target))
+                relationships[element.get("Id")] = target
+
+        for element in ElementTree.fromstring(self.archive.read("xl/workbook.xml")).iter():
+            tag = _local(element.tag)
+            if tag == "workbookPr":
+                self.date1904 = element.get("date1904", "0").lower() in ("1", "true")
+            elif tag == "sheet":
+                self.sheets.append((element.get("name"), relationships.get(_attribute(element, "id"))))
+
+    def _read_shared_strings(self) -> list:
+        if "xl/sharedStrings.xml" not in self.archive.namelist():
+            return []
+        strings = []
+        with self.archive.open("xl/sharedStrings.xml") as f:
+            for event, element in ElementTree.iterparse(f):
+                if _local(element.tag) == "si":
+                    # plain strings have a single <t>, rich text has one per run, phonetic hints (<rPh>) are skipped
+                    strings.append("".join(t.text or "" for t in _text_runs(element)))
+                    element.clear()
+        return strings
+
+    def _read_date_styles(self) -> set:
+        if "xl/styles.xml" not in self.archive.namelist():
+            return set()
+        root = ElementTree.fromstring(self.archive.read("xl/styles.xml"))
+        custom_date_formats = set()
+        date_styles = set()
+        for element in root:
+            tag = _local(element.tag)
+            if tag == "numFmts":
+                for number_format in element:
+                    if _is_date_format(number_format.get("formatCode", "")):
+                        custom_date_formats.add(int(number_format.get("numFmtId")))
+            elif tag == "cellXfs":
+                for style_index, xf in enumerate(element):
+                    format_id = int(xf.get("numFmtId", 0))
+                    if format_id in DATE_FORMAT_IDS or format_id in custom_date_formats:
+                        date_styles.add(style_index)
+        return date_styles
+
+    def sheet_path(self, sheet) -> str:
+        if sheet is None:
+            sheet = 1
+        if isinstance(sheet, int):
+            if not 1 <= sheet <= len(self.sheets):
+                raise IndexError(f"Sheet {sheet} is out of range, the workbook has {len(self.sheets)} sheets")
+            return self.sheets[sheet - 1][1]
+        for name, path in self.sheets:
+            if name.lower() == sheet.lower():
+                return path
+        raise KeyError(f"No sheet named {sheet!r}, found {[name for name, path in self.sheets]}")
+
+
+def _text_runs(element) -> list:
+    runs = []
+    for child in element:
+        tag = _local(child.tag)
+        if tag == "t":
+            runs.append(child)
+        elif tag == "r":
+            runs.extend(grandchild for grandchild in child if _local(grandchild.tag) == "t")
+    return runs
+
+
+def _cell_value(cell, cell_type: str, value: str, workbook: _Workbook):
+    if cell_type == "n":
+        number = float(value)
+        style = cell.get("s")
+        if style is not None and int(style) in workbook.date_styles:
+            return _to_datetime(number, workbook.date1904)
+        return number
+    if cell_type == "s":
+        return workbook.shared_strings[int(value)]
+    if cell_type == "b":
+        return value == "1"
+    if cell_type == "e":
+        return ERROR_CODES.get(value, value)
+    if cell_type == "d":
+        return datetime.datetime.fromisoformat(value.rstrip("Z"))
+    # "str", the cached result of a formula
+    return value
+
+
+class _SheetParser:
+    """
+    Expat handlers that turn the XML of one sheet into (row_number, {column_number: value}) tuples as it is fed,
+    without building an element tree, which is several times faster than `ElementTree.iterparse` for large sheets
+    """
+    def __init__(self, workbook: _Workbook):
+        self.workbook = workbook
+        self.rows = []
+        self.dimension = None
+        self._row_number = 0
+        self._values = None
+        self._next_column = 1
+        self._cell = None
+        self._text = None
+        self._inline = False
+        self._phonetic = False
+
+    def start(self, name: str, attributes: dict) -> None:
+        local = name.rpartition(":")[2]
+        if local == "c":
+            self._cell = attributes
+            self._text = None
+            self._inline = False
+        elif local == "v" or (local == "t" and self._inline and not self._phonetic):
+            self._text = [] if self._text is None else self._text
+        elif local == "row":
+            self._row_number = int(attributes.get("r", self._row_number + 1))
+            self._values = {}
+            self._next_column = 1
+        elif local == "is":
+            self._inline = True
+        elif local == "rPh":
+            self._phonetic = True
+        elif local == "dimension":
+            self.dimension = attributes.get("ref")
+
+    def end(self, name: str) -> None:
+        local = name.rpartition(":")[2]
+        if local == "c":
+            cell = self._cell
+            reference = cell.get("r")
+            column = address.COLUMN_NUMBERS[reference.rstrip("0123456789")] if reference else self._next_column
+            self._next_column = column + 1
+            if self._text is not None:
+                text = "".join(self._text)
+                if self._inline:
+                    self._values[column] = text
+                else:
+                    self._values[column] = _cell_value(cell, cell.get("t", "n"), text, self.workbook)
+            self._cell = None
+            self._text = None
+        elif local == "row":
+            if self._values:
+                self.rows.append((self._row_number, self._values))
+            self._values = None
+        elif local == "rPh":
+            self._phonetic = False
+
+    def data(self, text: str) -> None:
+        if self._text is not None and self._cell is not None:
+            self._text.append(text)
+
+
+def _iter_rows(archive: zipfile.ZipFile, path: str, workbook: _Workbook):
+    """
+    Yields ('dimension', ref) if the sheet declares one, then (row_number, {column_number: value}) for each row with cells
+    """
+    handler = _SheetParser(workbook)
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.data
+    dimension_sent = False
+    with archive.open(path) as f:
+        while True:
+            # fed a chunk at a time, so memory stays flat however long the sheet is
+            chunk = f.read(CHUNK_BYTES)
+            parser.Parse(chunk, not chunk)
+            if handler.dimension is not None and not dimension_sent:
+                dimension_sent = True
+                yield "dimension", handler.dimension
+            rows, handler.rows = handler.rows, []
+            yield from rows
+            if not chunk:
+                return
+
+
+def xlsx_sheet_names(path: str) -> list:
+    """
+    :param path: str - Filepath of a saved .xlsx or .xlsm workbook
+    :return: list - Names of the sheets, in workbook order
+    """
+    with zipfile.ZipFile(path) as archive:
+        return [name for name, sheet_path in _Workbook(archive).sheets]
+
+
+def read_xlsx(path: str, sheet=None, cell_range: str = None):
+    """
+    Reads values straight out of a saved .xlsx (or .xlsm) file, without Excel, so it runs anywhere Python does.
+    The sheet is parsed incrementally and rows are yielded as they are read, so even very large sheets use little memory.
+    Rows come back the way `safexl.read_range` returns them from a live worksheet: a tuple per row, covering the sheet's
+    used range (or `cell_range`), with None for empty cells, floats for numbers, datetimes for cells formatted as dates,
+    bools, and Excel's integer error codes (see `ERROR_CODES`). Formulas give the result Excel saved with the file.
+        for row in safexl.read_xlsx(r"C:\\reports\\daily.xlsx", "Summary"):
+            ...
+    :param path: str - Filepath of the workbook
+    :param sheet: Optional str or int - Defaults to the first sheet. Sheet name, or its 1 based position like `Worksheets(1)`
+    :param cell_range: Optional str - A1 style address of the block to read, ex: 'A1:D100', defaults to the used range
+    :return: generator - Of tuples, one per row
+    """
+    with zipfile.ZipFile(path) as archive:
+        workbook = _Workbook(archive)
+        sheet_path = workbook.sheet_path(sheet)
+        if cell_range is not None:
+            bounds = address.parse(cell_range)
+        else:
+            bounds = _used_range(archive, sheet_path, workbook)
+            if bounds is None:
+                return
+        yield from _rows_within(_iter_rows(archive, sheet_path, workbook), bounds)
+
+
+def _used_range(archive: zipfile.ZipFile, sheet_path: str, workbook: _Workbook) -> tuple:
+    """
+    Takes the used range from the sheet's <dimension>, or, for files written without one, from a first pass over the cells
+    """
+    first_row = first_column = last_row = last_column = None
+    for row_number, values in _iter_rows(archive, sheet_path, workbook):
+        if row_number == "dimension":
+            if values and values != "A1":
+                return address.parse(values)
+            # 'A1' is also what writers put down for a sheet of unknown size, so it's checked against the cells
+            continue
+        first_row = row_number if first_row is None else first_row
+        last_row = row_number
+        first_column = min(values) if first_column is None else min(first_column, min(values))
+        last_column = max(values) if last_column is None else max(last_column, max(values))
+    if first_row is None:
+        return None
+    return first_row, first_column, last_row, last_column
+
+
+def _rows_within(rows, bounds: tuple):
+    first_row, first_column, last_row, last_column = bounds
+    columns = range(first_column, last_column + 1)
+    empty_row = (None,) * len(columns)
+    next_row = first_row
+    for row_number, values in rows:
+        if row_number == "dimension" or row_number < first_row:
+            continue
+        if row_number > last_row:
+            break
+        while next_row < row_number:
+            yield empty_row
+            next_row += 1
+        yield tuple(values.get(column) for column in columns)
+        next_row = row_number + 1
+    while next_row <= last_row:
+        yield empty_row
+        next_row += 1
+
+
+class StyledCell:
+    """
+    A value to write with `write_xlsx`, along with how to format it
+    """
+    __slots__ = ("value", "fill", "number_format", "bold")
+
+    def __init__(self, value, fill=None, number_format: str = None, bold: bool = False):
+        """
+        :param value: Anything `write_xlsx` accepts as a plain value
+        :param fill: Optional int, str or tuple - Background color, from `safexl.colors` (ex: `safexl.colors.rgbRed` or
+                                                  'rgbRed') or as a (red, green, blue) tuple
+        :param number_format: Optional str - Number format, as you would assign to `Range.NumberFormat`, ex: '#,##0.00'
+        :param bold: Optional bool - Defaults to `False`
+        """
+        self.value = value
+        self.fill = fill
+        self.number_format = number_format
+        self.bold = bold
+
+
+class _Styles:
+    """
+    Every distinct combination of number format, fill and font used in a workbook being written, each given an index
+    into <cellXfs> the first time it is seen
+    """
+    def __init__(self):
+        self.number_formats = {}
+        self.fills = {}
+        self.xfs = {(0, 0, 0): 0}
+
+    def index(self, number_format: str = None, fill=None, bold: bool = False) -> int:
+        number_format_id = 0
+        if number_format is not None:
+            number_format_id = BUILTIN_NUMBER_FORMATS.get(number_format)
+            if number_format_id is None:
+                number_format_id = self.number_formats.setdefault(number_format, 164 + len(self.number_formats))
+        fill_id = 0
+        if fill is not None:
+            # Excel colors are 0xBBGGRR, fills are written as ARGB
+            color = colors.to_color(fill)
+            argb = f"FF{color & 0xFF:02X}{color >> 8 & 0xFF:02X}{color >> 16 & 0xFF:02X}"
+            # fills 0 and 1 are reserved by Excel
+            fill_id = self.fills.setdefault(argb, 2 + len(self.fills))
+        key = (number_format_id, 1 if bold else 0, fill_id)
+        return self.xfs.setdefault(key, len(self.xfs))
+
+    def xml(self) -> str:
+        parts = [f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<styleSheet xmlns="{_MAIN_NAMESPACE}">']
+        if self.number_formats:
+            parts.append(f'<numFmts count="{len(self.number_formats)}">')
+            parts.extend(f'<numFmt numFmtId="{number_format_id}" formatCode={quoteattr(code)}/>'
+                         for code, number_format_id in self.number_formats.items())
+            parts.append('</numFmts>')
+        parts.append('<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+                     '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>')
+        parts.append(f'<fills count="{2 + len(self.fills)}"><fill><patternFill patternType="none"/></fill>'
+                     '<fill><patternFill patternType="gray125"/></fill>')
+        parts.extend(f'<fill><patternFill patternType="solid"><fgColor rgb="{argb}"/><bgColor indexed="64"/></patternFill></fill>'
+                     for argb in self.fills)
+        parts.append('</fills><borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+                     '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>')
+        parts.append(f'<cellXfs count="{len(self.xfs)}">')
+        for number_format_id, font_id, fill_id in self.xfs:
+            applied = "".join(f' {attribute}="1"' for attribute, used in (
+                ("applyNumberFormat", number_format_id), ("applyFont", font_id), ("applyFill", fill_id)) if used)
+            parts.append(f'<xf numFmtId="{number_format_id}" fontId="{font_id}" fillId="{fill_id}" borderId="0" xfId="0"'
+                         f'{applied}/>')
+        parts.append('</cellXfs><cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+                     '</styleSheet>')
+        return "".join(parts)
+
+
+def _to_serial(value) -> float:
+    if isinstance(value, datetime.datetime):
+        return (value.replace(tzinfo=None) - _EPOCH_1900) / datetime.timedelta(days=1)
+    if isinstance(value, datetime.date):
+        return float((value - _EPOCH_1900.date()).days)
+    # datetime.time
+    return (value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6) / 86400
+
+
+def _cell_xml(reference: str, value, styles: _Styles) -> str:
+    style = 0
+    number_format = fill = None
+    bold = False
+    if isinstance(value, StyledCell):
+        number_format, fill, bold = value.number_format, value.fill, value.bold
+        if number_format is not None or fill is not None or bold:
+            style = styles.index(number_format, fill, bold)
+        value = value.value
+
+    if value is None:
+        return f'<c r="{reference}" s="{style}"/>' if style else ""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        if number_format is None:
+            # without a date format Excel would show the serial number
+            if isinstance(value, datetime.datetime):
+                number_format = DEFAULT_DATETIME_FORMAT
+            elif isinstance(value, datetime.date):
+                number_format = DEFAULT_DATE_FORMAT
+            else:
+                number_format = DEFAULT_TIME_FORMAT
+            style = styles.index(number_format, fill, bold)
+        value = _to_serial(value)
+    style_attribute = f' s="{style}"' if style else ""
+    if isinstance(value, bool):
+        return f'<c r="{reference}"{style_attribute} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Integral):
+        # also numpy integers, whose repr isn't always a bare number
+        return f'<c r="{reference}"{style_attribute}><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Complex) and not isinstance(value, numbers.Real):
+        raise ValueError(f"Cell {reference}: Excel cells can't hold complex numbers, got {value!r}")
+    if isinstance(value, numbers.Number):
+        # Decimal, Fraction, numpy floats, etc. all become the double Excel stores
+        value = float(value)
+        if not math.isfinite(value):
+            return f'<c r="{reference}"{style_attribute} t="e"><v>#NUM!</v></c>'
+        return f'<c r="{reference}"{style_attribute}><v>{value!r}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARACTERS.sub("", str(value)))
+    return f'<c r="{reference}"{style_attribute} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _write_sheet(f, rows, styles: _Styles) -> None:
+    f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{_MAIN_NAMESPACE}">'
+            '<sheetData>'.encode("utf-8"))
+    column_letters = address.COLUMN_LETTERS
+    buffer = []
+    for row_number, row in enumerate(rows, 1):
+        if not isinstance(row, (list, tuple)):
+            row = list(row)
+        if len(row) > address.MAX_COLUMN:
+            raise ValueError(f"Row {row_number} has {len(row)} values, more than the {address.MAX_COLUMN} columns Excel allows")
+        cells = [_cell_xml(f"{column_letters[column]}{row_number}", value, styles)
+                 for column, value in enumerate(row, 1)]
+        if any(cells):
+            buffer.append(f'<row r="{row_number}">{"".join(cells)}</row>')
+        if len(buffer) >= ROWS_PER_WRITE:
+            f.write("".join(buffer).encode("utf-8"))
+            buffer = []
+        if row_number > address.MAX_ROW:
+            raise ValueError(f"More than the {address.MAX_ROW} rows Excel allows")
+    buffer.append('</sheetData></worksheet>')
+    f.write("".join(buffer).encode("utf-8"))
+
+
+def write_xlsx(path: str, sheets) -> None:
+    """
+    Writes an .xlsx file without Excel, for reports that are pure data and formatting (no formulas to calculate, no macros).
+    Rows are consumed one at a time and written straight into the file, so a generator of a million rows takes no more
+    memory than one of ten:
+        safexl.write_xlsx(r"C:\\reports\\daily.xlsx", {
+            "Summary": [["Region", "Sales"], ["East", 1200.5], ["West", safexl.StyledCell(-300, fill="rgbRed")]],
+            "Detail": (fetch_row(i) for i in range(1_000_000)),
+        })
+    :param path: str - Filepath of the .xlsx file to write, replaced if it exists
+    :param sheets: dict or iterable - Sheet name -> rows, or (sheet name, rows) pairs, in the order the sheets should appear.
+                                      Names are cleaned up with `safexl.worksheet_name_sanitization`. Each row is
+                                      an iterable of values: None, bool, numbers (not complex), str, datetime/date/time, or a
+                                      `StyledCell`
+    :return: None
+    """
+    sheets = list(sheets.items()) if hasattr(sheets, "items") else list(sheets)
+    if not sheets:
+        raise ValueError("A workbook needs at least one sheet")
+    names = [address.worksheet_name_sanitization(name) for name, rows in sheets]
+    seen = set()
+    for name in names:
+        if name.lower() in seen:
+            raise ValueError(f"Sheet name {name!r} is used more than once, sheet names are case insensitive")
+        seen.add(name.lower())
+
+    styles = _Styles()
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for i, (name, rows) in enumerate(sheets, 1):
+            # a sheet of a million rows can pass the 2GiB past which the zip entry needs a zip64 header, which has to be
+            # asked for up front as the size isn't known before the rows have been written
+            with archive.open(f"xl/worksheets/sheet{i}.xml", "w", force_zip64=True) as f:
+                _write_sheet(f, rows, styles)
+
+        declaration = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        archive.writestr("[Content_Types].xml", (
+            f'{declaration}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                      'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                      for i in range(1, len(sheets) + 1))
+            + '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/></Types>'
+        ))
+        archive.writestr("_rels/.rels", (
+            f'{declaration}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="xl/workbook.xml" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/></Relationships>'
+        ))
+        archive.writestr("xl/workbook.xml", (
+            f'{declaration}<workbook xmlns="{_MAIN_NAMESPACE}" xmlns:r="{_RELATIONSHIPS_NAMESPACE}"><sheets>'
+            + "".join(f'<sheet name={quoteattr(name)} sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(names, 1))
+            + '</sheets></workbook>'
+        ))
+        archive.writestr("xl/_rels/workbook.xml.rels", (
+            f'{declaration}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml" '
+                      f'Type="{_RELATIONSHIPS_NAMESPACE}/worksheet"/>' for i in range(1, len(sheets) + 1))
+            + f'<Relationship Id="rId{len(sheets) + 1}" Target="styles.xml" Type="{_RELATIONSHIPS_NAMESPACE}/styles"/>'
+            '</Relationships>'
+        ))
+        archive.writestr("xl/styles.xml", styles.xml())